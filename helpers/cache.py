@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Striped locks coalesce misses inside this process without keeping one lock per key.
+_LOCKS = [threading.Lock() for _ in range(64)]
+_ASYNC_LOCKS = [asyncio.Lock() for _ in range(64)]
+
+
+def single_flight(key: str, builder: Callable[[], Any], timeout: int) -> Any:
+    """
+    Returns the cached value of `key`, building it with `builder` on a miss. Concurrent
+    misses for the same key, in this process or in others sharing the cache, wait for a
+    single build instead of all running `builder`.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    with _LOCKS[hash(key) % len(_LOCKS)]:
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        lock_key = f'{key}:lock'
+        lock_timeout = settings.CACHE_BUILD_LOCK_TIMEOUT
+        acquired = cache.add(lock_key, True, lock_timeout)
+        if not acquired:
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(settings.CACHE_BUILD_POLL_INTERVAL)
+                value = cache.get(key)
+                if value is not None:
+                    return value
+            # The other build is taking too long (or died), build it here.
+        try:
+            value = builder()
+            cache.set(key, value, timeout)
+        finally:
+            if acquired:
+                cache.delete(lock_key)
+        return value
+
+
+async def asingle_flight(key: str, builder: Callable[[], Awaitable[Any]], timeout: int) -> Any:
+    """Async version of single_flight, `builder` returns an awaitable."""
+    value = await cache.aget(key)
+    if value is not None:
+        return value
+
+    async with _ASYNC_LOCKS[hash(key) % len(_ASYNC_LOCKS)]:
+        value = await cache.aget(key)
+        if value is not None:
+            return value
+
+        lock_key = f'{key}:lock'
+        lock_timeout = settings.CACHE_BUILD_LOCK_TIMEOUT
+        acquired = await cache.aadd(lock_key, True, lock_timeout)
+        if not acquired:
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(settings.CACHE_BUILD_POLL_INTERVAL)
+                value = await cache.aget(key)
+                if value is not None:
+                    return value
+        try:
+            value = await builder()
+            await cache.aset(key, value, timeout)
+        finally:
+            if acquired:
+                await cache.adelete(lock_key)
+        return value
+
+
+def get_version(key: str) -> int:
+    return cache.get_or_set(key, time.time_ns, None)
+
+
+async def aget_version(key: str) -> int:
+    return await cache.aget_or_set(key, time.time_ns, None)
+
+
+def bump_versions(keys: list[str]) -> None:
+    """
+    Invalidates every entry built under the versions stored in `keys`. Versions are
+    timestamps, so a lost version key can never bring an old entry back.
+    """
+    version = time.time_ns()
+    cache.set_many({key: version for key in keys}, None)
@@ -0,0 +1,188 @@
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import F, Q, QuerySet, Window
+from django.db.models.functions import RowNumber, Substr
+
+from posts.models import CommentModel
+from users.models import CustomUser
+
+from .posts import annotate_comment_stats, attach_liked_flags, get_likes_qty, is_liked_by
+
+
+CURSOR_SEPARATOR = '|'
+# CommentModel.Meta.ordering (pinned comments first, then oldest first) with the id breaking ties.
+THREAD_ORDERING = ('-fixed', 'post_date', 'id')
+# Columns a thread renders, read with values() into CommentRow objects.
+THREAD_FIELDS = (
+    'id', 'post_id', 'parent_id', 'text', 'post_date', 'fixed', 'path', 'depth', 'reply_count',
+    'likes_qty', 'user_id', 'user__username', 'user__profile_picture',
+)
+
+
+class AuthorRow:
+    __slots__ = ('id', 'username', 'profile_picture')
+
+
+    def __init__(self, user_id: int, username: str, profile_picture: str):
+        self.id = user_id
+        self.username = username
+        # The file name, what the templates print after MEDIA_URL.
+        self.profile_picture = profile_picture
+
+
+    def __str__(self):
+        return self.username
+
+
+class CommentRow:
+    """
+    Read-only comment of a thread, with only the columns the thread renders and its
+    author. Built from values() rows, so reading a thread creates no model instances.
+    """
+
+    __slots__ = (
+        'id', 'post_id', 'parent_id', 'text', 'post_date', 'fixed', 'path', 'depth', 'reply_count',
+        'likes_qty', 'user_liked', 'user', 'reply_preview',
+    )
+    # Like helpers key their state by model label.
+    _meta = CommentModel._meta
+
+
+    def __init__(self, row: dict):
+        for field in self.__slots__[:-3]:
+            setattr(self, field, row[field])
+        self.user_liked = None # Set by attach_liked_flags.
+        self.user = AuthorRow(row['user_id'], row['user__username'], row['user__profile_picture'])
+        self.reply_preview = []
+
+
+def thread_rows(comments: QuerySet) -> QuerySet:
+    """Projects comments annotated by annotate_comment_stats onto the columns of THREAD_FIELDS."""
+    return comments.values(*THREAD_FIELDS)
+
+
+def encode_comments_cursor(comment: CommentModel) -> str:
+    """Builds the opaque cursor pointing right after `comment` in its thread."""
+    raw = CURSOR_SEPARATOR.join([str(int(comment.fixed)), comment.post_date.isoformat(), str(comment.id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_comments_cursor(cursor: str) -> tuple[bool, datetime, int]:
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+        fixed, date, comment_id = raw.split(CURSOR_SEPARATOR)
+        return fixed == '1', datetime.fromisoformat(date), int(comment_id)
+    except (ValueError, UnicodeDecodeError) as err:
+        raise ValueError('Invalid comments cursor.') from err
+
+
+def get_thread_query(post_id: int, user: CustomUser, cursor: str = None, page_size: int = None) -> QuerySet:
+    """
+    The top-level comments of one page of the thread of a post, plus the first one of the
+    next page, with their stats for `user`. Read along the thread index from the cursor on,
+    so a page costs the same wherever it is in the thread.
+    """
+    page_size = page_size or settings.COMMENTS_PAGE_SIZE
+    comments = CommentModel.objects.filter(post_id=post_id, depth=0)
+    if cursor:
+        fixed, date, comment_id = decode_comments_cursor(cursor)
+        after = Q(post_date__gt=date) | Q(post_date=date, id__gt=comment_id)
+        comments = comments.filter(Q(fixed=True) & after | Q(fixed=False) if fixed else Q(fixed=False) & after)
+    return thread_rows(annotate_comment_stats(comments, user)).order_by(*THREAD_ORDERING)[:page_size + 1]
+
+
+def paginate_thread(rows: list[dict], page_size: int = None) -> tuple[list[CommentRow], str | None]:
+    """Splits the rows of get_thread_query into the page and the cursor of the next one."""
+    page_size = page_size or settings.COMMENTS_PAGE_SIZE
+    page = [CommentRow(row) for row in rows[:page_size]]
+    if len(rows) > page_size:
+        return page, encode_comments_cursor(page[-1])
+    return page, None
+
+
+def get_thread_page(post_id: int, user: CustomUser, cursor: str = None, page_size: int = None) -> tuple[list[CommentRow], str | None]:
+    """
+    One page of the top-level comments of a post, each with its first replies in
+    `reply_preview`, and the cursor of the next page (None on the last page).
+    """
+    comments, next_cursor = paginate_thread(list(get_thread_query(post_id, user, cursor, page_size)), page_size)
+    attach_reply_previews(comments, user)
+    attach_thread_likes(comments, user)
+    return comments, next_cursor
+
+
+def subtree(path: str) -> Q:
+    """Matches the replies under the comment with `path`, at any depth: a range of the path index."""
+    # Segments are digits and ':' sorts right after '9', so this bounds every path starting with `path`.
+    return Q(path__gt=path, path__lt=f'{path}:')
+
+
+def attach_reply_previews(comments: list[CommentRow], user: CustomUser, limit: int = None) -> None:
+    """
+    Sets `reply_preview` of each comment to its first `limit` direct replies (COMMENT_REPLY_PREVIEWS
+    by default) in path order, read for all the comments in one query. Deeper replies are
+    left to the replies link of each preview, as `reply_count` only counts direct replies.
+    """
+    limit = limit or settings.COMMENT_REPLY_PREVIEWS
+    previews = {comment.path: [] for comment in comments}
+    for comment in comments:
+        comment.reply_preview = previews[comment.path]
+    parents = [comment for comment in comments if comment.reply_count]
+    if not parents:
+        return
+    match = Q()
+    for comment in parents:
+        match |= subtree(comment.path)
+    # The comments of a page share their depth, so the path prefix of that length tells whose reply it is.
+    prefix_length = (parents[0].depth + 1) * CommentModel.PATH_STEP
+    replies = (annotate_comment_stats(CommentModel.objects.filter(match, depth=parents[0].depth + 1), user)
+        .annotate(root=Substr('path', 1, prefix_length))
+        .annotate(position=Window(RowNumber(), partition_by=F('root'), order_by=F('path').asc()))
+        .filter(position__lte=limit)
+        .values(*THREAD_FIELDS, 'root')
+        .order_by('path'))
+    for reply in replies:
+        previews[reply['root']].append(CommentRow(reply))
+
+
+def attach_thread_likes(comments: list[CommentRow], user: CustomUser) -> None:
+    """Sets the liked flag of the comments of a page and of their reply previews at once."""
+    attach_liked_flags([*comments, *(reply for comment in comments for reply in comment.reply_preview)], user)
+
+
+def get_replies_page(comment: CommentModel, user: CustomUser, cursor: str = None, page_size: int = None) -> tuple[list[CommentRow], str | None]:
+    """
+    One page of the whole subtree of `comment`, depth first and oldest first at each level,
+    and the cursor of the next page (the path of its last reply, None on the last page).
+    """
+    page_size = page_size or settings.COMMENTS_PAGE_SIZE
+    replies = CommentModel.objects.filter(subtree(comment.path))
+    if cursor:
+        replies = replies.filter(path__gt=cursor)
+    replies = [CommentRow(row) for row in thread_rows(annotate_comment_stats(replies, user)).order_by('path')[:page_size + 1]]
+    attach_liked_flags(replies, user)
+    if len(replies) > page_size:
+        return replies[:page_size], replies[page_size - 1].path
+    return replies, None
+
+
+def serialize_comment(comment: CommentRow, username: str) -> dict:
+    """The comment as the thread script renders it, with the like state `username` sees."""
+    return {
+        'id': comment.id,
+        'text': comment.text,
+        'post_date': comment.post_date,
+        'fixed': comment.fixed,
+        'parent': comment.parent_id,
+        'depth': comment.depth,
+        'reply_count': comment.reply_count,
+        'replies': [serialize_comment(reply, username) for reply in comment.reply_preview],
+        'liked': is_liked_by(comment, username),
+        'likes_qty': get_likes_qty(comment),
+        'username': comment.user.username,
+        'user_pic': default_storage.url(comment.user.profile_picture),
+    }
@@ -0,0 +1,183 @@
+import random
+import time
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Expression, F, Model, OuterRef, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from posts.models import PostModel, CommentModel, LikeShardModel
+from users.models import CustomUser
+
+
+def _count_related(queryset: QuerySet, field: str) -> Coalesce:
+    counts = (queryset
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(qty=Count('*'))
+        .values('qty'))
+    return Coalesce(Subquery(counts), 0)
+
+
+def apply_count_deltas(model: type[Model], field: str, deltas: Counter) -> None:
+    """Adds each delta to `field` of the row with that id, one UPDATE per distinct delta."""
+    ids_by_delta = defaultdict(list)
+    for obj_id, delta in deltas.items():
+        if delta:
+            ids_by_delta[delta].append(obj_id)
+    for delta, ids in ids_by_delta.items():
+        model.objects.filter(id__in=ids).update(**{field: F(field) + delta})
+
+
+def existing_likes(through: type[Model], liked_field: str, user_ids: list[int] = None, liked_ids: list[int] = None) -> list[tuple[int, int]]:
+    """(liked object id, user id) of the like rows matching the filters."""
+    rows = through.objects.all()
+    if user_ids is not None:
+        rows = rows.filter(customuser__in=user_ids)
+    if liked_ids is not None:
+        rows = rows.filter(**{f'{liked_field}__in': liked_ids})
+    return list(rows.values_list(liked_field, 'customuser'))
+
+
+def reconcile_counts(queryset: QuerySet, counters: dict[str, Expression], batch_size: int = 1000) -> int:
+    """
+    Recounts `counters` (field name -> exact count expression) for every row of `queryset`
+    in batches of `batch_size` and saves the ones that drifted. Returns how many rows changed.
+    """
+    fields = list(counters)
+    ids = queryset.order_by('id').values_list('id', flat=True).iterator(chunk_size=batch_size)
+    fixed = 0
+    while batch := list(islice(ids, batch_size)):
+        rows = (queryset.model.objects
+            .filter(id__in=batch)
+            .annotate(**{f'actual_{field}': expression for field, expression in counters.items()})
+            .only('id', *fields))
+        drifted = []
+        for row in rows:
+            if any(getattr(row, field) != getattr(row, f'actual_{field}') for field in fields):
+                for field in fields:
+                    setattr(row, field, getattr(row, f'actual_{field}'))
+                drifted.append(row)
+        queryset.model.objects.bulk_update(drifted, fields)
+        fixed += len(drifted)
+    return fixed
+
+
+def reconcile_post_counts(batch_size: int = 1000, post_ids: list[int] = None) -> int:
+    fold_like_shards(batch_size)
+    posts = PostModel.objects.all() if post_ids is None else PostModel.objects.filter(id__in=post_ids)
+    return reconcile_counts(posts, {
+        'like_count': _count_related(PostModel.likes.through.objects, 'postmodel'),
+        'comment_count': _count_related(CommentModel.objects, 'post'),
+    }, batch_size)
+
+
+def reconcile_comment_counts(batch_size: int = 1000) -> int:
+    return reconcile_counts(CommentModel.objects.all(), {
+        'like_count': _count_related(CommentModel.likes.through.objects, 'commentmodel'),
+        'reply_count': _count_related(CommentModel.objects, 'parent'),
+    }, batch_size)
+
+
+def reconcile_user_counts(batch_size: int = 1000) -> int:
+    follows = CustomUser.following.through.objects
+    return reconcile_counts(CustomUser.objects.all(), {
+        'followers_count': _count_related(follows, 'to_customuser'),
+        'following_count': _count_related(follows, 'from_customuser'),
+    }, batch_size)
+
+
+def hot_post_key(post_id: int) -> str:
+    return f'hot-post:{post_id}'
+
+
+def like_total_key(post_id: int) -> str:
+    return f'like-total:{post_id}'
+
+
+def is_hot_post(post_id: int) -> bool:
+    """
+    Counts a like write of the post and tells if its rate crossed HOT_POST_WRITES_PER_MINUTE.
+    Hot posts keep writing to shards for HOT_POST_TIMEOUT after the last time they crossed it.
+    """
+    if cache.get(hot_post_key(post_id)):
+        return True
+    rate_key = f'like-rate:{post_id}:{int(time.time() // 60)}'
+    cache.add(rate_key, 0, 60)
+    try:
+        writes = cache.incr(rate_key)
+    except ValueError: # Expired between add and incr.
+        return False
+    if writes >= settings.HOT_POST_WRITES_PER_MINUTE:
+        cache.set(hot_post_key(post_id), True, settings.HOT_POST_TIMEOUT)
+        return True
+    return False
+
+
+def add_to_like_count(model: type[Model], obj_id: int, delta: int) -> None:
+    """Adds `delta` to the like count of the object, in a random shard if it is a hot post."""
+    if model is not PostModel or not is_hot_post(obj_id):
+        model.objects.filter(id=obj_id).update(like_count=F('like_count') + delta)
+        return
+    shard = random.randrange(settings.LIKE_COUNTER_SHARDS)
+    shards = LikeShardModel.objects.filter(post_id=obj_id, shard=shard)
+    if not shards.update(delta=F('delta') + delta):
+        try:
+            with transaction.atomic():
+                LikeShardModel.objects.create(post_id=obj_id, shard=shard, delta=delta)
+        except IntegrityError:
+            shards.update(delta=F('delta') + delta)
+    try:
+        cache.incr(like_total_key(obj_id), delta)
+    except ValueError:
+        pass
+
+
+def sharded_likes() -> Coalesce:
+    """Likes of the post still in shards, for annotations."""
+    totals = (LikeShardModel.objects
+        .filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=Sum('delta'))
+        .values('total'))
+    return Coalesce(Subquery(totals), 0)
+
+
+def get_like_count(model: type[Model], obj_id: int) -> int:
+    """Current like count, the total of hot posts is cached for LIKE_TOTAL_CACHE_TIMEOUT."""
+    if model is not PostModel:
+        return model.objects.values_list('like_count', flat=True).get(id=obj_id)
+    if cache.get(hot_post_key(obj_id)):
+        return cache.get_or_set(
+            like_total_key(obj_id),
+            lambda: sum_like_count(obj_id),
+            settings.LIKE_TOTAL_CACHE_TIMEOUT,
+        )
+    return sum_like_count(obj_id)
+
+
+def sum_like_count(post_id: int) -> int:
+    return PostModel.objects.annotate(total=F('like_count') + sharded_likes()).values_list('total', flat=True).get(id=post_id)
+
+
+def fold_like_shards(batch_size: int = 1000) -> int:
+    """Adds the shards of every post to PostModel.like_count and deletes them. Returns how many posts were folded."""
+    post_ids = LikeShardModel.objects.order_by('post').values_list('post', flat=True).distinct().iterator(chunk_size=batch_size)
+    folded = 0
+    while batch := list(islice(post_ids, batch_size)):
+        with transaction.atomic():
+            # Writers blocked on these rows create new shards once they are deleted.
+            shards = list(LikeShardModel.objects.select_for_update().filter(post__in=batch).values_list('id', 'post', 'delta'))
+            deltas = Counter()
+            for _, post_id, delta in shards:
+                deltas[post_id] += delta
+            LikeShardModel.objects.filter(id__in=[shard_id for shard_id, _, _ in shards]).delete()
+            apply_count_deltas(PostModel, 'like_count', deltas)
+        cache.delete_many([like_total_key(post_id) for post_id in deltas])
+        folded += len(deltas)
+    return folded
@@ -0,0 +1,44 @@
+from collections.abc import Iterable, Iterator
+
+from django.conf import settings
+
+from home.models import InteractionEventModel
+from posts.models import PostModel, CommentModel
+
+
+Kind = InteractionEventModel.Kind
+
+LIKE_KINDS = {
+    (PostModel, True): Kind.POST_LIKE,
+    (PostModel, False): Kind.POST_UNLIKE,
+    (CommentModel, True): Kind.COMMENT_LIKE,
+    (CommentModel, False): Kind.COMMENT_UNLIKE,
+}
+
+
+def log_events(kind: Kind, pairs: Iterable[tuple[int, int]]) -> None:
+    """Appends one event per (actor, target) pair, in the transaction of the change they record."""
+    if not settings.INTERACTION_LOG:
+        return
+    InteractionEventModel.objects.bulk_create(
+        [InteractionEventModel(kind=kind, actor=actor, target=target) for actor, target in pairs],
+        batch_size=settings.INTERACTION_LOG_BATCH_SIZE,
+    )
+
+
+def log_like_events(model: type[PostModel | CommentModel], liked: bool, likes: Iterable[tuple[int, int]]) -> None:
+    """Logs likes given as (liked object id, user id) pairs."""
+    log_events(LIKE_KINDS[model, liked], ((user_id, obj_id) for obj_id, user_id in likes))
+
+
+def iter_events(after_id: int = 0, chunk_size: int = 1000) -> Iterator[list[tuple[int, int, int, int]]]:
+    """Streams (id, kind, actor, target) of the events after `after_id`, in id order and chunks of `chunk_size`."""
+    while True:
+        chunk = list(InteractionEventModel.objects
+            .filter(id__gt=after_id)
+            .order_by('id')
+            .values_list('id', 'kind', 'actor', 'target')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        after_id = chunk[-1][0]
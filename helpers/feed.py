@@ -0,0 +1,221 @@
+import asyncio
+import base64
+import heapq
+from datetime import datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F, Q, QuerySet, Window
+from django.db.models.functions import RowNumber
+from django.urls import reverse
+
+from posts.models import PostModel, CommentModel
+from home.models import TimelineModel
+from users.models import CustomUser
+
+from .aio import alist
+from .cache import single_flight, asingle_flight, get_version, aget_version, bump_versions
+from .posts import annotate_post_stats, attach_liked_flags, get_likes_qty, is_liked_by
+from .timeline import get_pull_authors
+
+
+CURSOR_SEPARATOR = '|'
+FEED_FIELDS = ('id', 'url', 'author', 'img', 'description', 'date', 'likes', 'comments', 'liked', 'comment_preview')
+
+
+def encode_cursor(date: datetime | None, post_id: int | None, skip_ids: tuple[int, ...] = ()) -> str:
+    """
+    Builds the opaque cursor pointing right after the post (`date`, `post_id`) in the feed,
+    or at its start when both are None. Posts of `skip_ids`, already shown on the ranked
+    page, are left out of every page from there on.
+    """
+    position = f'{date.isoformat()}{CURSOR_SEPARATOR}{post_id}' if date else CURSOR_SEPARATOR
+    raw = f'{position}{CURSOR_SEPARATOR}{",".join(map(str, skip_ids))}' if skip_ids else position
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[datetime | None, int | None, tuple[int, ...]]:
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+        date, post_id, *skip_ids = raw.split(CURSOR_SEPARATOR)
+        if len(skip_ids) > 1 or bool(date) != bool(post_id):
+            raise ValueError(raw)
+        skip_ids = tuple(int(skip_id) for skip_id in skip_ids[0].split(',')) if skip_ids else ()
+        if not date:
+            return None, None, skip_ids
+        return datetime.fromisoformat(date), int(post_id), skip_ids
+    except (ValueError, UnicodeDecodeError) as err:
+        raise ValueError('Invalid feed cursor.') from err
+
+
+def get_feed_page(user: CustomUser, cursor: str = None, page_size: int = None) -> tuple[list[PostModel], str | None]:
+    """
+    Returns one page of the posts published by the users `user` follows, newest first,
+    and the cursor for the next page (None on the last page).
+    """
+    post_ids, next_cursor = get_feed_page_ids(user, cursor, page_size)
+    return get_posts_in_order(post_ids, user), next_cursor
+
+
+def feed_version_key(user_id: int) -> str:
+    return f'feed-version:{user_id}'
+
+
+def invalidate_feeds(user_ids: list[int]) -> None:
+    bump_versions([feed_version_key(user_id) for user_id in user_ids])
+
+
+def get_feed_page_ids(user: CustomUser, cursor: str = None, page_size: int = None) -> tuple[list[int], str | None]:
+    """The first page of each feed is cached until the feed changes or FEED_CACHE_TIMEOUT runs out."""
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    if cursor or page_size != settings.FEED_PAGE_SIZE:
+        return _query_feed_page_ids(user, cursor, page_size)
+    key = f'feed:{user.id}:{page_size}:{get_version(feed_version_key(user.id))}'
+    return single_flight(
+        key,
+        lambda: _query_feed_page_ids(user, None, page_size),
+        settings.FEED_CACHE_TIMEOUT,
+    )
+
+
+def _query_feed_page_ids(user: CustomUser, cursor: str | None, page_size: int) -> tuple[list[int], str | None]:
+    pull_author_ids = list(get_pull_authors(user).values_list('id', flat=True))
+    entries, pulled = _feed_sources(user, pull_author_ids, cursor, page_size)
+    return _paginate(_merge_rows(entries, pulled, limit=page_size + 1), page_size, cursor)
+
+
+def _feed_sources(user: CustomUser, pull_author_ids: list[int], cursor: str | None, page_size: int) -> tuple[QuerySet, QuerySet]:
+    """(post_id, date) rows of the stored timeline and of the pull authors, newest first."""
+    # Posts of pull authors stored before they crossed the fan-out limit come from the pull side.
+    entries = (TimelineModel.objects
+        .filter(owner=user)
+        .exclude(author__in=pull_author_ids)
+        .order_by('-date', '-post'))
+    pulled = (PostModel.objects
+        .filter(user__in=pull_author_ids, published=True)
+        .order_by('-date', '-id'))
+    if cursor:
+        date, post_id, skip_ids = decode_cursor(cursor)
+        if date:
+            entries = entries.filter(Q(date__lt=date) | Q(date=date, post__lt=post_id))
+            pulled = pulled.filter(Q(date__lt=date) | Q(date=date, id__lt=post_id))
+        if skip_ids:
+            entries = entries.exclude(post__in=skip_ids)
+            pulled = pulled.exclude(id__in=skip_ids)
+    return (
+        entries.values_list('post', 'date')[:page_size + 1],
+        pulled.values_list('id', 'date')[:page_size + 1],
+    )
+
+
+def _paginate(rows: list[tuple[int, datetime]], page_size: int, cursor: str = None) -> tuple[list[int], str | None]:
+    page, has_next = rows[:page_size], len(rows) > page_size
+    post_ids = [post_id for post_id, _ in page]
+    if has_next:
+        last_id, last_date = page[-1]
+        skip_ids = decode_cursor(cursor)[2] if cursor else ()
+        return post_ids, encode_cursor(last_date, last_id, skip_ids)
+    return post_ids, None
+
+
+def _merge_rows(*sources, limit: int) -> list[tuple[int, datetime]]:
+    """Merges (post_id, date) rows already sorted newest first."""
+    merged = heapq.merge(*sources, key=lambda row: (row[1], row[0]), reverse=True)
+    return list(islice(merged, limit))
+
+
+def get_posts_in_order(post_ids: list[int], user: CustomUser) -> list[PostModel]:
+    posts = PostModel.objects.filter(id__in=post_ids).select_related('user')
+    posts = annotate_post_stats(posts, user).in_bulk()
+    return attach_liked_flags([posts[post_id] for post_id in post_ids if post_id in posts], user)
+
+
+async def aget_feed_page(user: CustomUser, cursor: str = None, page_size: int = None) -> tuple[list[PostModel], str | None]:
+    """Async version of get_feed_page, built on the async queryset API."""
+    post_ids, next_cursor = await aget_feed_page_ids(user, cursor, page_size)
+    return await aget_posts_in_order(post_ids, user), next_cursor
+
+
+async def aget_feed_page_ids(user: CustomUser, cursor: str = None, page_size: int = None) -> tuple[list[int], str | None]:
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    if cursor or page_size != settings.FEED_PAGE_SIZE:
+        return await _aquery_feed_page_ids(user, cursor, page_size)
+    key = f'feed:{user.id}:{page_size}:{await aget_version(feed_version_key(user.id))}'
+    return await asingle_flight(
+        key,
+        lambda: _aquery_feed_page_ids(user, None, page_size),
+        settings.FEED_CACHE_TIMEOUT,
+    )
+
+
+async def _aquery_feed_page_ids(user: CustomUser, cursor: str | None, page_size: int) -> tuple[list[int], str | None]:
+    pull_author_ids = await alist(get_pull_authors(user).values_list('id', flat=True))
+    entries, pulled = _feed_sources(user, pull_author_ids, cursor, page_size)
+    entries, pulled = await asyncio.gather(alist(entries), alist(pulled))
+    return _paginate(_merge_rows(entries, pulled, limit=page_size + 1), page_size, cursor)
+
+
+async def aget_posts_in_order(post_ids: list[int], user: CustomUser) -> list[PostModel]:
+    posts = PostModel.objects.filter(id__in=post_ids).select_related('user')
+    posts = await annotate_post_stats(posts, user).ain_bulk()
+    return await sync_to_async(attach_liked_flags)([posts[post_id] for post_id in post_ids if post_id in posts], user)
+
+
+def parse_feed_fields(fields: str = None) -> tuple[str, ...]:
+    """Parses the comma separated sparse fieldset of the feed API; all fields when empty."""
+    if not fields:
+        return FEED_FIELDS
+    requested = tuple(field.strip() for field in fields.split(',') if field.strip())
+    invalid = set(requested) - set(FEED_FIELDS)
+    if invalid:
+        raise ValueError(f"Invalid feed fields: {', '.join(sorted(invalid))}.")
+    return requested
+
+
+def get_comment_previews(post_ids: list[int]) -> dict[int, list[dict]]:
+    """First comments of each post, pinned ones first, fetched in a single query."""
+    comments = (CommentModel.objects
+        .filter(post__in=post_ids, depth=0)
+        .annotate(position=Window(
+            RowNumber(),
+            partition_by=F('post'),
+            order_by=[F('fixed').desc(), F('post_date').asc(), F('id').asc()],
+        ))
+        .filter(position__lte=settings.FEED_COMMENT_PREVIEW_SIZE)
+        .values('id', 'post', 'text', 'user__username')
+        .order_by('post', 'position'))
+    previews = {post_id: [] for post_id in post_ids}
+    for comment in comments:
+        previews[comment['post']].append({
+            'id': comment['id'],
+            'username': comment['user__username'],
+            'text': comment['text'],
+        })
+    return previews
+
+
+def serialize_posts(posts: list[PostModel], username: str, fields: tuple[str, ...] = FEED_FIELDS) -> list[dict]:
+    """
+    Compact records of feed posts annotated by annotate_post_stats, limited to `fields`,
+    with the like state `username` sees, pending likes included.
+    """
+    previews = get_comment_previews([p.id for p in posts]) if 'comment_preview' in fields else {}
+    serializers = {
+        'id': lambda post: post.id,
+        'url': lambda post: reverse('posts:post', kwargs={'post_id': post.id}),
+        'author': lambda post: {
+            'username': post.user.username,
+            'user_pic': post.user.profile_picture.url,
+            'profile_url': reverse('users:profile', kwargs={'username': post.user.username}),
+        },
+        'img': lambda post: post.img.url if post.img else None,
+        'description': lambda post: post.description,
+        'date': lambda post: post.date.isoformat(),
+        'likes': get_likes_qty,
+        'comments': lambda post: post.comments_qty,
+        'liked': lambda post: is_liked_by(post, username),
+        'comment_preview': lambda post: previews[post.id],
+    }
+    return [{field: serializers[field](post) for field in fields} for post in posts]
@@ -0,0 +1,59 @@
+import re
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import SafeString, mark_safe
+
+from posts.models import PostModel
+
+from .posts import get_likes_qty, get_comments_qty, is_liked_by
+
+
+SLOT_PATTERN = re.compile(r'<!--(like-status|not-liked-class|liked-class|likes-qty|comments-label)-->')
+
+
+def post_fragment_key(post: PostModel) -> str:
+    # The markup also shows the author, a rename or new picture must not be served stale.
+    author = zlib.crc32(f'{post.user.username}:{post.user.profile_picture}'.encode())
+    return f'post-fragment:{post.id}:{post.version}:{author:x}'
+
+
+def get_post_fragment(post: PostModel) -> list[str]:
+    """
+    Markup of `post` shared by every viewer, split around its slots: even items are
+    markup, odd items are slot names. Cached until the post version or its author changes.
+    """
+    key = post_fragment_key(post)
+    fragment = cache.get(key)
+    if fragment is None:
+        html = render_to_string('parciais/_post.html', {'post': post, 'MEDIA_URL': settings.MEDIA_URL})
+        fragment = SLOT_PATTERN.split(html)
+        cache.set(key, fragment, settings.POST_FRAGMENT_TIMEOUT)
+    return fragment
+
+
+def get_comments_label(comments_qty: int) -> str:
+    if comments_qty > 1:
+        return f'Ver todos os {comments_qty} comentários'
+    if comments_qty == 1:
+        return 'Ver comentário'
+    return 'Sem comentários'
+
+
+def render_post(post: PostModel, username: str) -> SafeString:
+    """Renders a feed post from its cached fragment, filling the slots for the viewer."""
+    liked = is_liked_by(post, username)
+    slots = {
+        'like-status': 'liked' if liked else 'not-liked',
+        'not-liked-class': 'hide-icon' if liked else '',
+        'liked-class': '' if liked else 'hide-icon',
+        'likes-qty': str(get_likes_qty(post)),
+        'comments-label': get_comments_label(get_comments_qty(post)),
+    }
+    fragment = get_post_fragment(post)
+    return mark_safe(''.join(
+        slots[part] if i % 2 else part
+        for i, part in enumerate(fragment)
+    ))
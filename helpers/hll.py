@@ -0,0 +1,62 @@
+import math
+from hashlib import blake2b
+
+
+class HyperLogLog:
+    """
+    Approximate distinct counter. With the default precision it keeps 4096 one-byte
+    registers (4 KB) and estimates any number of distinct items with ~1.6% error.
+    Sketches of the same precision merge by taking the highest register of each.
+    """
+
+    __slots__ = ('p', 'm', 'registers')
+
+
+    def __init__(self, p: int = 12, registers: bytes = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers else bytearray(self.m)
+        if len(self.registers) != self.m:
+            raise ValueError(f'Expected {self.m} registers, got {len(self.registers)}.')
+
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'HyperLogLog':
+        return cls(p=len(data).bit_length() - 1, registers=data)
+
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+
+    def add(self, item) -> bool:
+        """Adds `item`, returns True if the sketch changed."""
+        h = int.from_bytes(blake2b(str(item).encode(), digest_size=8).digest(), 'big')
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+
+    def merge(self, other: 'HyperLogLog') -> bool:
+        """Merges `other` into this sketch, returns True if it changed."""
+        if other.p != self.p:
+            raise ValueError('Only sketches of the same precision can be merged.')
+        merged = bytearray(map(max, self.registers, other.registers))
+        changed = merged != self.registers
+        self.registers = merged
+        return changed
+
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        # Linear counting is more accurate while many registers are still empty.
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
@@ -0,0 +1,128 @@
+import csv
+import json
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+from django.db import transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, LPad
+from django.utils import timezone
+
+from posts.models import PostModel, CommentModel
+from users.models import CustomUser
+
+from .counters import reconcile_post_counts
+from .events import Kind, log_events, log_like_events
+from .posts import bump_comments_version
+
+
+def read_comment_records(path: Path) -> Iterator[dict | None]:
+    """
+    Streams the comments of a .jsonl or .csv file. Records have 'username', 'post' (id),
+    'text' and optionally 'date' (ISO 8601) and 'likes' (usernames, space separated in CSV).
+    Lines that can't be parsed come out as None.
+    """
+    path = Path(path)
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.suffix == '.csv':
+            for row in csv.DictReader(file):
+                row['likes'] = (row.get('likes') or '').split()
+                yield row
+            return
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+
+def import_comments(records: Iterable[dict | None], batch_size: int = 1000) -> Counter:
+    """
+    Creates the comments of `records` and their likes with bulk inserts, one transaction
+    per batch of `batch_size` records. Authors, likers and posts are resolved once per batch.
+    Records of unknown users or posts, or without text, are skipped.
+
+    Returns how many 'comments' and 'likes' were created and how many records were 'skipped'.
+
+    Bulk inserts skip save() and the comment signals, so the batch sets the comment paths
+    and logs the events itself, and the comment counts of the posts are recounted at the end.
+    """
+    stats = Counter(comments=0, likes=0, skipped=0)
+    post_ids = set()
+    records = iter(records)
+    while batch := list(islice(records, batch_size)):
+        _import_batch(batch, stats, post_ids)
+    post_ids = sorted(post_ids)
+    for start in range(0, len(post_ids), batch_size):
+        chunk = post_ids[start:start + batch_size]
+        reconcile_post_counts(batch_size, chunk)
+        for post_id in chunk:
+            bump_comments_version(post_id)
+    return stats
+
+
+def _import_batch(batch: list[dict | None], stats: Counter, post_ids: set[int]) -> None:
+    records = [record for record in batch if _is_valid(record)]
+    stats['skipped'] += len(batch) - len(records)
+    usernames = {record['username'] for record in records}
+    usernames.update(username for record in records for username in record.get('likes') or ())
+    user_ids = dict(CustomUser.objects.filter(username__in=usernames).values_list('username', 'id'))
+    existing_posts = set(PostModel.objects.filter(id__in={int(record['post']) for record in records}).values_list('id', flat=True))
+
+    comments, likers = [], []
+    for record in records:
+        user_id, post_id = user_ids.get(record['username']), int(record['post'])
+        if user_id is None or post_id not in existing_posts:
+            stats['skipped'] += 1
+            continue
+        liker_ids = {user_ids[username] for username in record.get('likes') or () if username in user_ids}
+        comments.append(CommentModel(
+            user_id=user_id,
+            post_id=post_id,
+            text=record['text'],
+            post_date=_parse_date(record.get('date')),
+            like_count=len(liker_ids),
+        ))
+        likers.append(liker_ids)
+    if not comments:
+        return
+
+    through = CommentModel.likes.through
+    with transaction.atomic():
+        comments = CommentModel.objects.bulk_create(comments)
+        comment_ids = [comment.id for comment in comments]
+        # Imported comments are top level, their path is their own segment.
+        CommentModel.objects.filter(id__in=comment_ids).update(
+            path=LPad(Cast('id', output_field=CharField()), CommentModel.PATH_STEP, Value('0')),
+        )
+        likes = [(comment.id, user_id) for comment, liker_ids in zip(comments, likers) for user_id in liker_ids]
+        through.objects.bulk_create([through(commentmodel_id=comment_id, customuser_id=user_id) for comment_id, user_id in likes])
+        log_events(Kind.COMMENT, [(comment.user_id, comment.post_id) for comment in comments])
+        log_like_events(CommentModel, True, likes)
+
+    stats['comments'] += len(comments)
+    stats['likes'] += len(likes)
+    post_ids.update(comment.post_id for comment in comments)
+
+
+def _is_valid(record: dict | None) -> bool:
+    if not isinstance(record, dict) or not record.get('username') or not record.get('text'):
+        return False
+    try:
+        int(record.get('post'))
+        _parse_date(record.get('date'))
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _parse_date(value: str = None) -> datetime:
+    if not value:
+        return timezone.now()
+    date = datetime.fromisoformat(value)
+    return timezone.make_aware(date) if timezone.is_naive(date) else date
@@ -0,0 +1,185 @@
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from posts.models import PostModel, CommentModel
+from users.models import CustomUser
+
+from .cache import single_flight, get_version, bump_versions
+
+
+_GOLDEN = 0x9E3779B97F4A7C15
+_MIX = 0xC2B2AE3D27D4EB4F
+_MASK = (1 << 64) - 1
+
+
+class LikerIndex:
+    """
+    Ids of the users who liked an object, as a sorted int array. Sets of at least
+    LIKER_BLOOM_MIN_SIZE ids get a Bloom filter in front, which answers most "no"
+    lookups without the binary search.
+    """
+
+    __slots__ = ('ids', 'bloom', 'bloom_bits', 'bloom_capacity')
+
+
+    def __init__(self, ids=()):
+        self.ids = array('q', sorted(set(ids)))
+        self._build_bloom()
+
+
+    def __contains__(self, user_id: int) -> bool:
+        if self.bloom is not None and not all(self.bloom[bit >> 3] & (1 << (bit & 7)) for bit in self._bits(user_id)):
+            return False
+        i = bisect_left(self.ids, user_id)
+        return i < len(self.ids) and self.ids[i] == user_id
+
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+    def add(self, user_id: int) -> None:
+        i = bisect_left(self.ids, user_id)
+        if i < len(self.ids) and self.ids[i] == user_id:
+            return
+        self.ids.insert(i, user_id)
+        if self.bloom is None or len(self.ids) > self.bloom_capacity:
+            self._build_bloom()
+        else:
+            for bit in self._bits(user_id):
+                self.bloom[bit >> 3] |= 1 << (bit & 7)
+
+
+    def discard(self, user_id: int) -> None:
+        # Bloom bits stay set, a false positive only costs the binary search.
+        i = bisect_left(self.ids, user_id)
+        if i < len(self.ids) and self.ids[i] == user_id:
+            del self.ids[i]
+
+
+    def _build_bloom(self) -> None:
+        if len(self.ids) < settings.LIKER_BLOOM_MIN_SIZE:
+            self.bloom, self.bloom_bits, self.bloom_capacity = None, 0, 0
+            return
+        # Room for twice the current size before the filter is rebuilt.
+        self.bloom_capacity = 2 * len(self.ids)
+        self.bloom_bits = self.bloom_capacity * settings.LIKER_BLOOM_BITS_PER_ID
+        self.bloom = bytearray((self.bloom_bits + 7) // 8)
+        for user_id in self.ids:
+            for bit in self._bits(user_id):
+                self.bloom[bit >> 3] |= 1 << (bit & 7)
+
+
+    def _bits(self, user_id: int):
+        # Double hashing: k positions out of two multiplicative hashes.
+        h1 = (user_id * _GOLDEN) & _MASK
+        h2 = ((user_id * _MIX) & _MASK) | 1
+        return ((h1 + i * h2) % self.bloom_bits for i in range(settings.LIKER_BLOOM_HASHES))
+
+
+    def __getstate__(self):
+        return (self.ids, self.bloom, self.bloom_bits, self.bloom_capacity)
+
+
+    def __setstate__(self, state):
+        self.ids, self.bloom, self.bloom_bits, self.bloom_capacity = state
+
+
+def liker_index_key(obj: PostModel | CommentModel) -> str:
+    """Cache key of the current index of `obj`, the key changes with every like change."""
+    model = obj._meta.model
+    return f'{_index_key(model, obj.id)}:{get_version(_generation_key(model, obj.id))}'
+
+
+def _index_key(model: type[PostModel | CommentModel], obj_id: int) -> str:
+    return f'likers:{model._meta.label_lower}:{obj_id}'
+
+
+def _generation_key(model: type[PostModel | CommentModel], obj_id: int) -> str:
+    return f'{_index_key(model, obj_id)}:generation'
+
+
+def get_liker_index(obj: PostModel | CommentModel) -> LikerIndex:
+    """
+    The liker index of `obj`, built from the database on a miss. The index is stored
+    under the generation read before the build, so a build that overlapped a like change
+    lands under a generation nobody reads anymore.
+    """
+    model = obj._meta.model
+    return single_flight(
+        liker_index_key(obj),
+        lambda: LikerIndex(model.likes.through.objects
+            .filter(**{model._meta.model_name: obj.id})
+            .values_list('customuser', flat=True)),
+        settings.LIKER_INDEX_TIMEOUT,
+    )
+
+
+def uses_liker_index(obj: PostModel | CommentModel) -> bool:
+    """Objects with at least LIKER_INDEX_MIN_LIKES likes answer liked checks from their index."""
+    like_count = obj.likes_qty if hasattr(obj, 'likes_qty') else obj.like_count
+    return like_count >= settings.LIKER_INDEX_MIN_LIKES
+
+
+def has_liked(obj: PostModel | CommentModel, user_id: int) -> bool:
+    """
+    Tells if the user liked `obj`, from its cached liker index when uses_liker_index(obj),
+    with an EXISTS on the like table otherwise.
+    """
+    if uses_liker_index(obj):
+        return user_id in get_liker_index(obj)
+    model = obj._meta.model
+    return model.likes.through.objects.filter(**{model._meta.model_name: obj.id, 'customuser': user_id}).exists()
+
+
+def update_liker_index(obj: PostModel | CommentModel, user_id: int, liked: bool) -> None:
+    """Applies a like change to the cached index of `obj` once the transaction commits."""
+    transaction.on_commit(lambda: _update_liker_index(type(obj), obj.id, user_id, liked))
+
+
+def invalidate_liker_indexes(model: type[PostModel | CommentModel], obj_ids) -> None:
+    keys = [_generation_key(model, obj_id) for obj_id in obj_ids]
+    transaction.on_commit(lambda: bump_versions(keys))
+
+
+def _update_liker_index(model: type[PostModel | CommentModel], obj_id: int, user_id: int, liked: bool) -> None:
+    """
+    Moves the index to a new generation with the change applied. Each change takes its own
+    generation, and only carries the index over from the generation right before it: when
+    changes race, the later one finds no index there and the next lookup rebuilds it.
+    """
+    generation_key = _generation_key(model, obj_id)
+    get_version(generation_key)
+    try:
+        generation = cache.incr(generation_key)
+    except ValueError:
+        # The generation was evicted in between, a new one already misses every index.
+        get_version(generation_key)
+        return
+    index = cache.get(f'{_index_key(model, obj_id)}:{generation - 1}')
+    if index is None:
+        return
+    if liked:
+        index.add(user_id)
+    else:
+        index.discard(user_id)
+    cache.set(f'{_index_key(model, obj_id)}:{generation}', index, settings.LIKER_INDEX_TIMEOUT)
+
+
+def user_id_key(username: str) -> str:
+    return f'user-id:{username}'
+
+
+def get_user_id(username: str) -> int | None:
+    """Id of the user with `username`, cached until the user is saved or deleted."""
+    key = user_id_key(username)
+    user_id = cache.get(key)
+    if user_id is None:
+        user_id = CustomUser.objects.filter(username=username).values_list('id', flat=True).first()
+        if user_id is not None:
+            cache.set(key, user_id, settings.LIKER_INDEX_TIMEOUT)
+    return user_id
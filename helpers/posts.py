@@ -1,49 +1,244 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, QuerySet
 from django.http import HttpRequest, JsonResponse
-from django.shortcuts import get_object_or_404
 
 from posts.models import PostModel, CommentModel
 from users.models import CustomUser
 
+from .cache import get_version, bump_versions
+from .counters import add_to_like_count, get_like_count, sharded_likes, sum_like_count
+from .events import log_like_events
+from .likers import has_liked, uses_liker_index, update_liker_index, get_user_id
+from .write_behind import get_like_buffer
+
 
 def like_dislike(obj: CommentModel | PostModel, user: CustomUser) -> bool:
-    if obj.likes.filter(id=user.id).exists():
-        obj.likes.remove(user)
-        return False
-    obj.likes.add(user)
-    return True
+    liked, _ = toggle_like(obj, user)
+    return liked
+
+
+def toggle_like(obj: CommentModel | PostModel, user: CustomUser) -> tuple[bool, int]:
+    """
+    Likes `obj` if `user` doesn't like it yet, otherwise removes the like, in a single
+    transaction. Returns the new liked flag and like count.
+
+    The like row decides: deleting it tells if it existed, and the unique constraint of
+    the M2M table makes a concurrent second like fail instead of counting twice.
+    With LIKES_WRITE_BEHIND the change is buffered and written later instead.
+    """
+    if settings.LIKES_WRITE_BEHIND:
+        return get_like_buffer().toggle(obj, user)
+    model = type(obj)
+    through = model.likes.through
+    liked_field = model._meta.model_name
+    row = {f'{liked_field}_id': obj.id, 'customuser_id': user.id}
+    with transaction.atomic():
+        deleted, _ = through.objects.filter(**row).delete()
+        if deleted:
+            liked, delta = False, -1
+        else:
+            try:
+                with transaction.atomic():
+                    through.objects.create(**row)
+                liked, delta = True, 1
+            except IntegrityError:
+                # A concurrent toggle of the same user liked it first.
+                liked, delta = True, 0
+        if delta:
+            add_to_like_count(model, obj.id, delta)
+            update_liker_index(obj, user.id, liked)
+            log_like_events(model, liked, [(obj.id, user.id)])
+        like_count = get_like_count(model, obj.id)
+    return liked, like_count
+
+
+def comments_version_key(post_id: int) -> str:
+    return f'comments-version:{post_id}'
+
+
+def get_comments_version(post_id: int) -> int:
+    return get_version(comments_version_key(post_id))
 
 
-def create_new_comment(user: CustomUser, post: PostModel, text: str) -> dict:
-    
+def bump_comments_version(post_id: int) -> None:
+    bump_versions([comments_version_key(post_id)])
+
+
+def create_new_comment(user: CustomUser, post: PostModel, text: str, parent: CommentModel = None) -> dict:
+    """
+    Adds a comment to `post`, or a reply to `parent`, and returns it with the thread version
+    before and after it. A client showing the thread at the previous version only has to
+    append the comment, any other version means it missed comments and should reload the thread.
+    Replies deeper than COMMENT_MAX_DEPTH go to the deepest ancestor allowed instead.
+    """
+    while parent is not None and parent.depth >= settings.COMMENT_MAX_DEPTH:
+        parent = parent.parent
+    previous_version = get_comments_version(post.id)
     new_comment = CommentModel.objects.create(
         user = user,
         post = post,
         text = text,
+        parent = parent,
     )
-    new_comment.save()
-    # TODO: Melhorar esse loop - Talvez tenha maneira melhor de adicionar essas informações sem ter que
-    #       pegar obj do comentário dnv 
-    comments = list(CommentModel.objects.filter(post=post).order_by('-fixed', 'post_date').values())
-    for comment in comments:
-            comment_obj = get_object_or_404(CommentModel, id=comment['id'])
-            comment['liked'] = check_user_like(comment_obj, user.username)
-            comment['likes_qty'] = get_total_likes(comment_obj)
-            comment['username'] = comment_obj.user.username
-            comment['user_pic'] = comment_obj.user.profile_picture.url
-
-    return {'comments': comments}
+    return {
+        'comment': {
+            'id': new_comment.id,
+            'text': new_comment.text,
+            'post_date': new_comment.post_date,
+            'fixed': new_comment.fixed,
+            'parent': new_comment.parent_id,
+            'depth': new_comment.depth,
+            'reply_count': 0,
+            'liked': False,
+            'likes_qty': 0,
+            'username': user.username,
+            'user_pic': user.profile_picture.url,
+        },
+        'previous_version': previous_version,
+        'version': get_comments_version(post.id),
+    }
 
 
 def get_total_likes(obj: PostModel | CommentModel) -> int:
-    return obj.likes.all().count()
+    # Read from the database, `obj` may be older than the last like.
+    if isinstance(obj, PostModel):
+        return sum_like_count(obj.id)
+    return CommentModel.objects.values_list('like_count', flat=True).get(id=obj.id)
 
 
 def get_total_comments(obj: PostModel) -> int:
-    return obj.comment.all().count()
+    return PostModel.objects.values_list('comment_count', flat=True).get(id=obj.id)
+
+
+def check_user_like(obj: PostModel | CommentModel, user: CustomUser | str) -> bool:
+    user_id = user.id if isinstance(user, CustomUser) else get_user_id(user)
+    return user_id is not None and has_liked(obj, user_id)
+
+
+def annotate_post_stats(posts: QuerySet, user: CustomUser) -> QuerySet:
+    """
+    Adds 'likes_qty' and 'comments_qty' to every post, so templates don't need one query
+    per post to show them. The liked flag is set by attach_liked_flags once they are read.
+    """
+    return posts.annotate(
+        likes_qty=F('like_count') + sharded_likes(),
+        comments_qty=F('comment_count'),
+    )
+
+
+def annotate_comment_stats(comments: QuerySet, user: CustomUser) -> QuerySet:
+    """Adds 'likes_qty' to every comment."""
+    return comments.annotate(likes_qty=F('like_count'))
+
+
+def attach_liked_flags(objs: list, user: CustomUser) -> list:
+    """
+    Sets `user_liked` of each post or comment of `objs` (all of one kind) for `user`.
+    Objects with at least LIKER_INDEX_MIN_LIKES likes answer from their cached liker index,
+    the others from one query on the like table for all of them.
+    """
+    cold = []
+    for obj in objs:
+        if uses_liker_index(obj):
+            obj.user_liked = has_liked(obj, user.id)
+        else:
+            cold.append(obj)
+    if cold:
+        model = cold[0]._meta.model
+        liked_field = model._meta.model_name
+        liked = set(model.likes.through.objects
+            .filter(**{f'{liked_field}__in': [obj.id for obj in cold], 'customuser': user.id})
+            .values_list(liked_field, flat=True))
+        for obj in cold:
+            obj.user_liked = obj.id in liked
+    return objs
+
+
+def parse_ids(value: str = None) -> list[int]:
+    """Parses a comma separated list of ids, at most LIKE_STATE_MAX_IDS of them."""
+    if not value:
+        return []
+    try:
+        ids = list(dict.fromkeys(int(item) for item in value.split(',')))
+    except ValueError:
+        raise ValueError(f'Invalid id list: {value}.')
+    if len(ids) > settings.LIKE_STATE_MAX_IDS:
+        raise ValueError(f'At most {settings.LIKE_STATE_MAX_IDS} ids are allowed per request.')
+    return ids
+
+
+def parse_likers_cursor(cursor: str = None) -> int | None:
+    if not cursor:
+        return None
+    try:
+        return int(cursor)
+    except ValueError:
+        raise ValueError(f'Invalid likers cursor: {cursor}.')
+
+
+def get_likers_page(obj: PostModel | CommentModel, viewer: CustomUser, cursor: int = None, page_size: int = None) -> tuple[list[tuple[CustomUser, bool]], int | None]:
+    """
+    One page of the users who liked `obj`, each with whether `viewer` follows them, and
+    the cursor of the next page (None on the last page). Pages are ordered by user id and
+    read after the cursor along the unique (object, user) index of the like table, and the
+    follow flags of the whole page come from one query, so every page costs the same.
+    """
+    page_size = page_size or settings.LIKERS_PAGE_SIZE
+    model = type(obj)
+    rows = (model.likes.through.objects
+        .filter(**{model._meta.model_name: obj.id})
+        .select_related('customuser')
+        .order_by('customuser_id'))
+    if cursor is not None:
+        rows = rows.filter(customuser_id__gt=cursor)
+    likers = [row.customuser for row in rows[:page_size + 1]]
+    next_cursor = likers[page_size - 1].id if len(likers) > page_size else None
+    likers = likers[:page_size]
+    following = set(viewer.following.filter(id__in=[u.id for u in likers]).values_list('id', flat=True))
+    return [(u, u.id in following) for u in likers], next_cursor
+
+
+def get_like_states(user: CustomUser, post_ids: list[int], comment_ids: list[int]) -> dict:
+    """
+    Liked flag and like count of each post and comment for `user`, one query per kind.
+    Unknown ids and unpublished posts are left out.
+    """
+    posts = attach_liked_flags(list(annotate_post_stats(
+        PostModel.objects.filter(id__in=post_ids, published=True).only('id', 'like_count'),
+        user,
+    )), user) if post_ids else []
+    comments = attach_liked_flags(list(annotate_comment_stats(
+        CommentModel.objects.filter(id__in=comment_ids, post__published=True).only('id', 'like_count'),
+        user,
+    )), user) if comment_ids else []
+    return {
+        kind: {obj.id: {'liked': is_liked_by(obj, user.username), 'qty': get_likes_qty(obj)} for obj in objs}
+        for kind, objs in (('posts', posts), ('comments', comments))
+    }
+
+
+def get_likes_qty(obj: PostModel | CommentModel) -> int:
+    qty = obj.likes_qty if hasattr(obj, 'likes_qty') else obj.like_count
+    if settings.LIKES_WRITE_BEHIND:
+        qty += get_like_buffer().pending_delta(obj)
+    return qty
+
+
+def get_comments_qty(obj: PostModel) -> int:
+    if hasattr(obj, 'comments_qty'):
+        return obj.comments_qty
+    return obj.comment_count
 
 
-def check_user_like(obj: PostModel | CommentModel, username: str) -> bool:
-    return True if obj.likes.filter(username=username) else False
+def is_liked_by(obj: PostModel | CommentModel, username: str) -> bool:
+    if settings.LIKES_WRITE_BEHIND:
+        pending = get_like_buffer().pending_state(obj, username)
+        if pending is not None:
+            return pending
+    if getattr(obj, 'user_liked', None) is not None:
+        return obj.user_liked
+    return check_user_like(obj, username)
 
 
 def is_ajax(request: HttpRequest) -> bool:
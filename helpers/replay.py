@@ -0,0 +1,97 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from posts.models import PostModel, CommentModel, LikeShardModel
+from users.models import CustomUser
+
+from .counters import apply_count_deltas
+from .events import Kind, iter_events
+from .timeline import rebuild_timeline
+from .write_behind import apply_like_states
+
+
+# kind -> (model, field, sign, counted id: 'actor' or 'target')
+COUNTER_EVENTS = {
+    Kind.POST_LIKE: [(PostModel, 'like_count', 1, 'target')],
+    Kind.POST_UNLIKE: [(PostModel, 'like_count', -1, 'target')],
+    Kind.COMMENT_LIKE: [(CommentModel, 'like_count', 1, 'target')],
+    Kind.COMMENT_UNLIKE: [(CommentModel, 'like_count', -1, 'target')],
+    Kind.COMMENT: [(PostModel, 'comment_count', 1, 'target')],
+    Kind.COMMENT_DELETE: [(PostModel, 'comment_count', -1, 'target')],
+    Kind.FOLLOW: [(CustomUser, 'following_count', 1, 'actor'), (CustomUser, 'followers_count', 1, 'target')],
+    Kind.UNFOLLOW: [(CustomUser, 'following_count', -1, 'actor'), (CustomUser, 'followers_count', -1, 'target')],
+}
+
+LIKE_EVENTS = {
+    Kind.POST_LIKE: (PostModel, True),
+    Kind.POST_UNLIKE: (PostModel, False),
+    Kind.COMMENT_LIKE: (CommentModel, True),
+    Kind.COMMENT_UNLIKE: (CommentModel, False),
+}
+
+
+def replay_counters(after_id: int = 0, chunk_size: int = 1000) -> tuple[int, int]:
+    """
+    Adds the counter changes of the events after `after_id` to the counters. From the
+    start of the log (`after_id` 0) every counter is zeroed first, so they are rebuilt
+    from the log alone. Returns how many events were replayed and the last event id.
+    """
+    replayed, last_id = 0, after_id
+    with transaction.atomic():
+        if not after_id:
+            PostModel.objects.update(like_count=0, comment_count=0)
+            LikeShardModel.objects.all().delete()
+            CommentModel.objects.update(like_count=0)
+            CustomUser.objects.update(following_count=0, followers_count=0)
+        for chunk in iter_events(after_id, chunk_size):
+            deltas = defaultdict(Counter)
+            for _, kind, actor, target in chunk:
+                for model, field, sign, counted in COUNTER_EVENTS[kind]:
+                    deltas[model, field][actor if counted == 'actor' else target] += sign
+            for (model, field), counter in deltas.items():
+                apply_count_deltas(model, field, counter)
+            replayed += len(chunk)
+            last_id = chunk[-1][0]
+    return replayed, last_id
+
+
+def replay_likes(after_id: int = 0, chunk_size: int = 1000) -> tuple[int, int]:
+    """
+    Brings the like rows to the state the events after `after_id` left them in, chunk by
+    chunk, without logging the changes again. Returns how many events were replayed and the last event id.
+    """
+    replayed, last_id = 0, after_id
+    for chunk in iter_events(after_id, chunk_size):
+        wanted = defaultdict(dict)
+        for _, kind, actor, target in chunk:
+            if kind in LIKE_EVENTS:
+                model, liked = LIKE_EVENTS[kind]
+                wanted[model][target, actor] = liked
+        apply_like_states(wanted, log=False)
+        replayed += len(chunk)
+        last_id = chunk[-1][0]
+    return replayed, last_id
+
+
+def replay_timelines(after_id: int = 0, chunk_size: int = 1000) -> tuple[int, int]:
+    """
+    Rebuilds the timelines of the users who followed or unfollowed someone in the events
+    after `after_id`. Returns how many events were replayed and the last event id.
+    """
+    replayed, last_id = 0, after_id
+    owner_ids = set()
+    for chunk in iter_events(after_id, chunk_size):
+        owner_ids.update(actor for _, kind, actor, _ in chunk if kind in (Kind.FOLLOW, Kind.UNFOLLOW))
+        replayed += len(chunk)
+        last_id = chunk[-1][0]
+    for user in CustomUser.objects.filter(id__in=owner_ids).iterator(chunk_size=chunk_size):
+        rebuild_timeline(user)
+    return replayed, last_id
+
+
+REPLAYS = {
+    'counters': replay_counters,
+    'likes': replay_likes,
+    'timelines': replay_timelines,
+}
@@ -1,6 +1,7 @@
 from django import template
 
-from .posts import get_total_likes, check_user_like, get_total_comments
+from .fragments import render_post
+from .posts import get_total_likes, check_user_like, get_total_comments, get_likes_qty, get_comments_qty, is_liked_by
 
 
 register = template.Library()
@@ -9,3 +10,8 @@ register = template.Library()
 register.filter('get_total_likes', get_total_likes)
 register.filter('get_total_comments', get_total_comments)
 register.filter('check_user_like', check_user_like)
+register.filter('likes_qty', get_likes_qty)
+register.filter('comments_qty', get_comments_qty)
+register.filter('is_liked_by', is_liked_by)
+
+register.simple_tag(render_post, name='feed_post')
@@ -0,0 +1,97 @@
+from collections import Counter
+from collections.abc import Iterable
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+
+from home.models import TimelineModel
+from posts.models import PostModel
+from users.models import CustomUser
+
+
+def _insert_entries(entries: Iterable[TimelineModel]) -> None:
+    entries = iter(entries)
+    while batch := list(islice(entries, settings.TIMELINE_BATCH_SIZE)):
+        TimelineModel.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_pull_author(user_id: int) -> bool:
+    """
+    Authors with more followers than FEED_FANOUT_FOLLOWER_LIMIT are not fanned out,
+    their posts are merged into the feed at read time instead.
+    """
+    return CustomUser.objects.filter(id=user_id, followers_count__gt=settings.FEED_FANOUT_FOLLOWER_LIMIT).exists()
+
+
+def get_pull_authors(user: CustomUser) -> QuerySet:
+    return user.following.filter(followers_count__gt=settings.FEED_FANOUT_FOLLOWER_LIMIT)
+
+
+def fan_out_post(post: PostModel) -> None:
+    """Pushes a published post into the timeline of every follower of its author."""
+    if not post.published:
+        remove_post(post)
+        return
+    if is_pull_author(post.user_id):
+        return
+    follower_ids = CustomUser.objects.filter(following=post.user_id).values_list('id', flat=True)
+    _insert_entries(
+        TimelineModel(owner_id=follower_id, post_id=post.id, author_id=post.user_id, date=post.date)
+        for follower_id in follower_ids.iterator(chunk_size=settings.TIMELINE_BATCH_SIZE)
+    )
+    # Entries created before an edit keep pointing to the old date otherwise.
+    TimelineModel.objects.filter(post=post).exclude(date=post.date).update(date=post.date)
+
+
+def remove_post(post: PostModel) -> None:
+    TimelineModel.objects.filter(post=post).delete()
+
+
+def backfill_timeline(owner_id: int, author_ids: Iterable[int]) -> None:
+    """Copies the latest published posts of `author_ids` into the timeline of `owner_id`."""
+    for author_id in author_ids:
+        if is_pull_author(author_id):
+            continue
+        posts = (PostModel.objects
+            .filter(user_id=author_id, published=True)
+            .order_by('-date', '-id')
+            .values_list('id', 'date')[:settings.TIMELINE_BACKFILL_SIZE])
+        _insert_entries(
+            TimelineModel(owner_id=owner_id, post_id=post_id, author_id=author_id, date=date)
+            for post_id, date in posts
+        )
+
+
+def backfill_former_pull_authors(removed: Counter) -> None:
+    """
+    Authors that just lost `removed[author id]` followers and dropped to the follower limit
+    were pulled until now, so their posts never reached the stored timelines. They are
+    copied into the timeline of every remaining follower.
+    """
+    limit = settings.FEED_FANOUT_FOLLOWER_LIMIT
+    counts = CustomUser.objects.filter(id__in=list(removed)).values_list('id', 'followers_count')
+    for author_id, followers_count in counts:
+        if not followers_count <= limit < followers_count + removed[author_id]:
+            continue
+        posts = list(PostModel.objects
+            .filter(user_id=author_id, published=True)
+            .order_by('-date', '-id')
+            .values_list('id', 'date')[:settings.TIMELINE_BACKFILL_SIZE])
+        follower_ids = CustomUser.objects.filter(following=author_id).values_list('id', flat=True)
+        _insert_entries(
+            TimelineModel(owner_id=follower_id, post_id=post_id, author_id=author_id, date=date)
+            for follower_id in follower_ids.iterator(chunk_size=settings.TIMELINE_BATCH_SIZE)
+            for post_id, date in posts
+        )
+
+
+def prune_timeline(owner_id: int, author_ids: Iterable[int]) -> None:
+    TimelineModel.objects.filter(owner_id=owner_id, author_id__in=list(author_ids)).delete()
+
+
+def rebuild_timeline(user: CustomUser) -> None:
+    with transaction.atomic():
+        TimelineModel.objects.filter(owner=user).delete()
+        backfill_timeline(user.id, user.following.values_list('id', flat=True))
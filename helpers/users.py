@@ -83,8 +83,9 @@ def search_user(substring: str, logged_user: CustomUser, search_in: str = ALL_US
 
 
 def get_total_following(user: CustomUser) -> int:
-    return user.following.all().count()
+    # Read from the database, `user` may be older than the last follow.
+    return CustomUser.objects.values_list('following_count', flat=True).get(id=user.id)
 
 
 def get_total_followers(user: CustomUser) -> int:
-    return CustomUser.objects.filter(following=user).count()
\ No newline at end of file
+    return CustomUser.objects.values_list('followers_count', flat=True).get(id=user.id)
\ No newline at end of file
@@ -0,0 +1,133 @@
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from posts.models import PostModel, PostViewersModel
+
+from .hll import HyperLogLog
+
+
+logger = logging.getLogger(__name__)
+
+# Striped locks keep the read-modify-write of a sketch consistent inside this process.
+_LOCKS = [threading.Lock() for _ in range(64)]
+# Every process writes its own sketch of each post, under the worker slot it leases, so
+# processes sharing the cache never overwrite each other's registers.
+_WORKER = f'{socket.gethostname()}:{os.getpid()}'
+_slot = None
+_slot_renewed = 0.0
+_slot_lock = threading.Lock()
+
+
+def viewers_key(post_id: int, slot: int) -> str:
+    return f'post-viewers:{post_id}:{slot}'
+
+
+def _slot_key(slot: int) -> str:
+    return f'post-viewers-worker:{slot}'
+
+
+def get_worker_slot() -> int | None:
+    """
+    The slot of this process, out of POST_VIEWERS_WORKER_SLOTS, leased for
+    POST_VIEWERS_WORKER_LEASE seconds and renewed at half of it. None when every slot is leased.
+    """
+    global _slot, _slot_renewed
+    lease = settings.POST_VIEWERS_WORKER_LEASE
+    with _slot_lock:
+        now = time.monotonic()
+        if _slot is not None and now - _slot_renewed < lease / 2:
+            return _slot
+        if _slot is not None and cache.get(_slot_key(_slot)) == _WORKER and cache.touch(_slot_key(_slot), lease):
+            _slot_renewed = now
+            return _slot
+        _slot = None
+        for slot in range(settings.POST_VIEWERS_WORKER_SLOTS):
+            if cache.add(_slot_key(slot), _WORKER, lease):
+                _slot, _slot_renewed = slot, now
+                break
+        return _slot
+
+
+def _cached_sketches(post_ids: list[int]) -> dict[int, HyperLogLog]:
+    """
+    The sketches of every worker slot of the posts, merged register-wise per post. Slots
+    whose lease expired are read too, their sketches live until POST_VIEWERS_TIMEOUT.
+    """
+    keys = {
+        viewers_key(post_id, slot): post_id
+        for post_id in post_ids
+        for slot in range(settings.POST_VIEWERS_WORKER_SLOTS)
+    }
+    sketches = {}
+    for key, data in cache.get_many(list(keys)).items():
+        sketch = HyperLogLog.from_bytes(data)
+        if keys[key] in sketches:
+            sketches[keys[key]].merge(sketch)
+        else:
+            sketches[keys[key]] = sketch
+    return sketches
+
+
+def record_post_view(post: PostModel, viewer_id: int) -> None:
+    """
+    Adds the viewer to the cached sketch this process keeps of the post. The cache is
+    written only when the sketch changes, and the sketches are merged into the post every
+    POST_VIEWERS_MERGE_INTERVAL seconds at most.
+    """
+    slot = get_worker_slot()
+    if slot is None:
+        logger.warning('Every post viewers worker slot is leased, raise POST_VIEWERS_WORKER_SLOTS.')
+        return
+    key = viewers_key(post.id, slot)
+    with _LOCKS[post.id % len(_LOCKS)]:
+        data = cache.get(key)
+        sketch = HyperLogLog.from_bytes(data) if data else HyperLogLog(settings.POST_VIEWERS_PRECISION)
+        if sketch.add(viewer_id):
+            cache.set(key, sketch.to_bytes(), settings.POST_VIEWERS_TIMEOUT)
+    if cache.add(f'post-viewers:{post.id}:merged', True, settings.POST_VIEWERS_MERGE_INTERVAL):
+        merge_post_viewers([post.id])
+
+
+def merge_post_viewers(post_ids: list[int]) -> int:
+    """Merges the cached sketches of the posts into their PostViewersModel. Returns how many changed."""
+    cached = _cached_sketches(post_ids)
+    if not cached:
+        return 0
+    sketches = {
+        post_id: cached[post_id]
+        for post_id in PostModel.objects.filter(id__in=list(cached)).values_list('id', flat=True)
+    }
+    with transaction.atomic():
+        rows = PostViewersModel.objects.select_for_update().in_bulk(list(sketches))
+        to_create, to_update = [], []
+        for post_id, sketch in sketches.items():
+            row = rows.get(post_id)
+            if row is None:
+                to_create.append(PostViewersModel(post_id=post_id, sketch=sketch.to_bytes(), count=sketch.count()))
+            else:
+                sketch.merge(HyperLogLog.from_bytes(row.sketch))
+                if sketch.to_bytes() != bytes(row.sketch):
+                    row.sketch, row.count = sketch.to_bytes(), sketch.count()
+                    to_update.append(row)
+        # A row created meanwhile by another process gets these views on the next merge.
+        PostViewersModel.objects.bulk_create(to_create, ignore_conflicts=True)
+        PostViewersModel.objects.bulk_update(to_update, ['sketch', 'count'])
+    return len(to_create) + len(to_update)
+
+
+def get_unique_viewers(post: PostModel) -> int:
+    """Approximate number of distinct users who viewed the post, including the views not merged yet."""
+    row = PostViewersModel.objects.filter(post=post.id).first()
+    sketch = _cached_sketches([post.id]).get(post.id)
+    if sketch is None:
+        return row.count if row else 0
+    if row is not None:
+        sketch.merge(HyperLogLog.from_bytes(row.sketch))
+    return sketch.count()
@@ -0,0 +1,324 @@
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Model, Q
+
+try:
+    import fcntl
+except ImportError: # Windows, journals of other processes are left alone.
+    fcntl = None
+
+from posts.models import PostModel, CommentModel
+from users.models import CustomUser
+
+from .counters import apply_count_deltas, get_like_count
+from .events import log_like_events
+from .likers import invalidate_liker_indexes
+
+
+logger = logging.getLogger(__name__)
+
+# (model label, liked object id, user id)
+LikeKey = tuple[str, int, int]
+
+
+class LikeBuffer:
+    """
+    Buffers like toggles of this process and writes them behind the request.
+
+    Every toggle appends the new state of the like to a local journal and keeps it in
+    memory. flush(), called every LIKES_FLUSH_INTERVAL_MS by the flusher thread, writes
+    only the last state of each like, so like/unlike pairs cost nothing.
+
+    Each process journals to `{journal_path}.{pid}` and holds a lock on it while it runs.
+    On start the journals of processes that died before flushing, whose lock is free, are
+    replayed, so their likes are not lost.
+    """
+
+    def __init__(self, journal_path: Path, interval_ms: int = 200):
+        self.base_path = Path(journal_path)
+        self.journal_path = self.base_path.with_name(f'{self.base_path.name}.{os.getpid()}')
+        self.interval = interval_ms / 1000
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # key -> [liked in the database when first buffered (None if unknown), liked now]
+        self._pending: dict[LikeKey, list[bool | None]] = {}
+        self._flushing: dict[LikeKey, list[bool | None]] = {}
+        self._deltas: Counter = Counter()
+        self._user_ids: dict[str, int] = {}
+        self._segment = 0
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self._owner_lock = _lock_journal(self.journal_path)
+        if self._owner_lock is None:
+            raise RuntimeError(f'The like journal {self.journal_path} is used by another buffer.')
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._replay()
+
+
+    def toggle(self, obj: PostModel | CommentModel, user: CustomUser) -> tuple[bool, int]:
+        """Same contract as helpers.posts.toggle_like."""
+        key = (obj._meta.label_lower, obj.id, user.id)
+        in_db = None
+        while True:
+            with self._lock:
+                state = self._pending.get(key)
+                if state is None and key in self._flushing:
+                    # Being written right now, the database will have this state.
+                    in_db = self._flushing[key][1]
+                if state is None and in_db is not None:
+                    state = [in_db, in_db]
+                if state is not None:
+                    liked = not state[1]
+                    self._set(key, state, liked)
+                    self._user_ids[user.username] = user.id
+                    self._write_journal([(key, liked)])
+                    delta = self._deltas[key[:2]]
+                    break
+            in_db = type(obj).likes.through.objects.filter(**_like_row(type(obj), obj.id, user.id)).exists()
+        # The written count, like shards of hot posts included, plus what is still buffered.
+        return liked, get_like_count(type(obj), obj.id) + delta
+
+
+    def pending_state(self, obj: PostModel | CommentModel, username: str) -> bool | None:
+        """Liked flag `username` set on `obj` that is not written yet, None if there is none."""
+        user_id = self._user_ids.get(username)
+        if user_id is None:
+            return None
+        key = (obj._meta.label_lower, obj.id, user_id)
+        state = self._pending.get(key) or self._flushing.get(key)
+        return None if state is None else state[1]
+
+
+    def pending_delta(self, obj: PostModel | CommentModel) -> int:
+        return self._deltas.get((obj._meta.label_lower, obj.id), 0)
+
+
+    def flush(self) -> int:
+        """Writes the buffered likes. Returns how many like rows were created or deleted."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._flushing = self._pending
+                self._pending = {}
+                self._deltas = Counter()
+                segment = self._rotate()
+            try:
+                changed = _apply(batch)
+            except Exception:
+                logger.exception('Could not flush %d buffered like(s), retrying later.', len(batch))
+                with self._lock:
+                    restored = [(key, state) for key, state in batch.items() if key not in self._pending]
+                    for key, state in restored:
+                        self._set(key, [state[0], state[0]], state[1])
+                    # The live journal takes them back, replaying the segment would undo
+                    # the likes toggled since.
+                    self._write_journal([(key, state[1]) for key, state in restored])
+                changed = 0
+            finally:
+                with self._lock:
+                    self._flushing = {}
+            segment.unlink(missing_ok=True)
+            return changed
+
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='like-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self._journal.close()
+        if not self._pending:
+            self.journal_path.unlink(missing_ok=True)
+            _lock_path(self.journal_path).unlink(missing_ok=True)
+        self._owner_lock.close()
+
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+            close_old_connections()
+
+
+    def _set(self, key: LikeKey, state: list, liked: bool) -> None:
+        # Only the transition from the database state is counted.
+        old_delta = _delta(state)
+        state[1] = liked
+        self._pending[key] = state
+        self._deltas[key[:2]] += _delta(state) - old_delta
+
+
+    def _rotate(self) -> Path:
+        """Moves the journal of the batch being flushed aside and starts a new one."""
+        self._journal.close()
+        self._segment += 1
+        segment = self.journal_path.with_name(f'{self.journal_path.name}.{self._segment}')
+        self.journal_path.rename(segment)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        return segment
+
+
+    def _write_journal(self, states: list[tuple[LikeKey, bool]]) -> None:
+        for (label, obj_id, user_id), liked in states:
+            self._journal.write(json.dumps({'m': label, 'o': obj_id, 'u': user_id, 'l': liked}) + '\n')
+        self._journal.flush()
+
+
+    def _replay(self) -> None:
+        """Loads the journals left by this pid and by dead processes, then writes them."""
+        own_pid = os.getpid()
+        claimed, locks = [], []
+        for pid, paths in self._journal_files().items():
+            if pid != own_pid:
+                lock = _lock_journal(self.base_path.with_name(f'{self.base_path.name}.{pid}'))
+                if lock is None:
+                    continue # Alive, its journal is its own.
+                locks.append(lock)
+            else:
+                segments = [path for path in paths if path != self.journal_path]
+                if segments:
+                    self._segment = max(int(path.suffix[1:]) for path in segments)
+            claimed.extend(paths)
+
+        for path in claimed:
+            if not path.exists():
+                continue
+            with open(path, encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue # Torn last line of a crashed process.
+                    self._pending[(event['m'], event['o'], event['u'])] = [None, event['l']]
+        # Replayed likes are written right away (or journaled again here if that fails),
+        # then the old journals can go.
+        if self._pending:
+            self.flush()
+        else:
+            self._journal.truncate(0) # Drops a torn line before appending to it.
+        for path in claimed:
+            if path != self.journal_path:
+                path.unlink(missing_ok=True)
+        for lock in locks:
+            Path(lock.name).unlink(missing_ok=True)
+            lock.close()
+
+
+    def _journal_files(self) -> dict[int, list[Path]]:
+        """Journals and segments in the journal directory by pid, oldest first."""
+        files = defaultdict(list)
+        prefix = f'{self.base_path.name}.'
+        for path in self.base_path.parent.glob(f'{prefix}*'):
+            pid, _, segment = path.name[len(prefix):].partition('.')
+            if pid.isdigit() and (not segment or segment.isdigit()):
+                # The live journal comes after its segments.
+                files[int(pid)].append((int(segment) if segment else float('inf'), path))
+        return {pid: [path for _, path in sorted(paths)] for pid, paths in files.items()}
+
+
+def _lock_path(journal_path: Path) -> Path:
+    return journal_path.with_name(f'{journal_path.name}.lock')
+
+
+def _lock_journal(journal_path: Path):
+    """Takes the lock of a journal, returns its open lock file or None if it is held."""
+    lock = open(_lock_path(journal_path), 'a')
+    if fcntl is None:
+        if journal_path.name.endswith(f'.{os.getpid()}'):
+            return lock
+        lock.close()
+        return None
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+def _delta(state: list) -> int:
+    if state[0] is None:
+        return 0
+    return int(state[1]) - int(state[0])
+
+
+def _like_row(model: type[Model], obj_id: int, user_id: int) -> dict:
+    return {f'{model._meta.model_name}_id': obj_id, 'customuser_id': user_id}
+
+
+def _apply(batch: dict[LikeKey, list]) -> int:
+    wanted = defaultdict(dict)
+    for (label, obj_id, user_id), state in batch.items():
+        wanted[apps.get_model(label)][(obj_id, user_id)] = state[1]
+    return apply_like_states(wanted)
+
+
+def apply_like_states(wanted: dict[type[Model], dict[tuple[int, int], bool]], log: bool = True) -> int:
+    """
+    Brings the like rows to the wanted states, given per model as (liked object id, user id)
+    -> liked, with one SELECT, INSERT and DELETE per model. Returns how many rows changed.
+    """
+    changed = 0
+    with transaction.atomic():
+        for model, states in wanted.items():
+            through = model.likes.through
+            obj_field = f'{model._meta.model_name}_id'
+            match = Q()
+            for obj_id, user_id in states:
+                match |= Q(**{obj_field: obj_id, 'customuser_id': user_id})
+            existing = set(through.objects.filter(match).values_list(obj_field, 'customuser_id'))
+
+            to_create = [key for key, liked in states.items() if liked and key not in existing]
+            to_delete = [key for key, liked in states.items() if not liked and key in existing]
+            through.objects.bulk_create(
+                [through(**_like_row(model, obj_id, user_id)) for obj_id, user_id in to_create],
+                ignore_conflicts=True,
+            )
+            if to_delete:
+                unmatch = Q()
+                for obj_id, user_id in to_delete:
+                    unmatch |= Q(**{obj_field: obj_id, 'customuser_id': user_id})
+                through.objects.filter(unmatch).delete()
+
+            deltas = Counter(obj_id for obj_id, _ in to_create)
+            deltas.subtract(obj_id for obj_id, _ in to_delete)
+            apply_count_deltas(model, 'like_count', deltas)
+            invalidate_liker_indexes(model, {obj_id for obj_id, _ in to_create + to_delete})
+            if log:
+                log_like_events(model, True, to_create)
+                log_like_events(model, False, to_delete)
+            changed += len(to_create) + len(to_delete)
+    return changed
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_like_buffer() -> LikeBuffer:
+    """The like buffer of this process, started on first use."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = LikeBuffer(settings.LIKES_JOURNAL_PATH, settings.LIKES_FLUSH_INTERVAL_MS)
+                _buffer.start()
+    return _buffer
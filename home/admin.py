@@ -1,3 +1,7 @@
 from django.contrib import admin
 
+from .models import TimelineModel, InteractionEventModel
+
 # Register your models here.
+admin.site.register(TimelineModel)
+admin.site.register(InteractionEventModel)
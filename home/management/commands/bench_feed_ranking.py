@@ -0,0 +1,38 @@
+import time
+
+import numpy as np
+
+from django.core.management.base import BaseCommand
+
+from helpers.ranking import score_posts, top_n
+
+
+class Command(BaseCommand):
+    help = 'Measures how long the feed ranking takes to score and pick the best posts of a candidate window.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=5000)
+        parser.add_argument('--top', type=int, default=25)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        size = options['candidates']
+        age_hours = rng.exponential(48, size)
+        likes = rng.pareto(1.5, size) * 10
+        comments = rng.poisson(3, size).astype(np.float64)
+        affinity = rng.poisson(1, size).astype(np.float64)
+
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            top_n(score_posts(age_hours, likes, comments, affinity), options['top'])
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings = np.asarray(timings)
+        self.stdout.write(
+            f"{size} candidates, top {options['top']}, {options['repeat']} runs: "
+            f"mean {timings.mean():.3f} ms, p95 {np.percentile(timings, 95):.3f} ms, max {timings.max():.3f} ms"
+        )
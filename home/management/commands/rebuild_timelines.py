@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import CustomUser
+
+from helpers.timeline import rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the materialized home timeline of the given users (all users if none is given).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Users whose timeline will be rebuilt.')
+
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+            missing = set(options['usernames']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+
+        total = 0
+        for user in users.iterator():
+            rebuild_timeline(user)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} timeline(s).'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from helpers.replay import REPLAYS
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams the interaction event log after --from-id and rebuilds counters, likes or timelines from it. '
+        'Prints the last event id, the checkpoint to resume from.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', choices=sorted(REPLAYS), default='counters')
+        parser.add_argument('--from-id', type=int, default=0, help='Replay the events after this id.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+
+    def handle(self, *args, **options):
+        replayed, last_id = REPLAYS[options['rebuild']](options['from_id'], options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed {replayed} event(s) into {options["rebuild"]}, checkpoint: {last_id}.'
+        ))
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('posts', '0012_postmodel_feed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.postmodel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-date', '-post'], name='timeline_feed_idx'), models.Index(fields=['owner', 'author'], name='timeline_author_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='timelinemodel',
+            constraint=models.UniqueConstraint(fields=('owner', 'post'), name='unique_timeline_entry'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:48
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0001_timelinemodel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InteractionEventModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Post Like'), (2, 'Post Unlike'), (3, 'Comment Like'), (4, 'Comment Unlike'), (5, 'Follow'), (6, 'Unfollow'), (7, 'Comment'), (8, 'Comment Delete')])),
+                ('actor', models.BigIntegerField()),
+                ('target', models.BigIntegerField()),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+# InteractionEventModel.Kind values.
+POST_LIKE, COMMENT_LIKE, FOLLOW, COMMENT = 1, 3, 5, 7
+BATCH_SIZE = 1000
+
+
+def seed_events(apps, schema_editor):
+    """
+    Logs the likes, follows and comments made before the log existed, so replaying it
+    from the start rebuilds the counters instead of zeroing them.
+    """
+    InteractionEventModel = apps.get_model('home', 'InteractionEventModel')
+    PostModel = apps.get_model('posts', 'PostModel')
+    CommentModel = apps.get_model('posts', 'CommentModel')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    sources = [
+        (POST_LIKE, PostModel._meta.get_field('likes').remote_field.through.objects
+            .order_by('id').values_list('customuser', 'postmodel')),
+        (COMMENT_LIKE, CommentModel._meta.get_field('likes').remote_field.through.objects
+            .order_by('id').values_list('customuser', 'commentmodel')),
+        (FOLLOW, CustomUser._meta.get_field('following').remote_field.through.objects
+            .order_by('id').values_list('from_customuser', 'to_customuser')),
+        (COMMENT, CommentModel.objects.order_by('id').values_list('user', 'post')),
+    ]
+    for kind, pairs in sources:
+        batch = []
+        for actor, target in pairs.iterator(chunk_size=BATCH_SIZE):
+            batch.append(InteractionEventModel(kind=kind, actor=actor, target=target))
+            if len(batch) == BATCH_SIZE:
+                InteractionEventModel.objects.bulk_create(batch)
+                batch = []
+        InteractionEventModel.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0002_interactioneventmodel'),
+        ('posts', '0018_comment_replies'),
+        ('users', '0006_follow_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def backfill_timelines(apps, schema_editor):
+    """
+    Fills the timelines of the follows made before TimelineModel existed, as the follow
+    signal does: the latest posts of every author below the fan-out limit.
+    """
+    TimelineModel = apps.get_model('home', 'TimelineModel')
+    PostModel = apps.get_model('posts', 'PostModel')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Follow = CustomUser._meta.get_field('following').remote_field.through
+    authors = (CustomUser.objects
+        .filter(followers_count__gt=0, followers_count__lte=settings.FEED_FANOUT_FOLLOWER_LIMIT)
+        .values_list('id', flat=True))
+    for author_id in authors.iterator(chunk_size=settings.TIMELINE_BATCH_SIZE):
+        posts = list(PostModel.objects
+            .filter(user_id=author_id, published=True)
+            .order_by('-date', '-id')
+            .values_list('id', 'date')[:settings.TIMELINE_BACKFILL_SIZE])
+        if not posts:
+            continue
+        follower_ids = Follow.objects.filter(to_customuser=author_id).values_list('from_customuser', flat=True)
+        batch = []
+        for follower_id in follower_ids.iterator(chunk_size=settings.TIMELINE_BATCH_SIZE):
+            batch.extend(
+                TimelineModel(owner_id=follower_id, post_id=post_id, author_id=author_id, date=date)
+                for post_id, date in posts
+            )
+            if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+                TimelineModel.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        TimelineModel.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0003_seed_interaction_events'),
+        ('posts', '0018_comment_replies'),
+        ('users', '0006_follow_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
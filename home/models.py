@@ -1,3 +1,57 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+from users.models import CustomUser
+from posts.models import PostModel
+
+
+class TimelineModel(models.Model):
+    """Materialized home feed: one row per post delivered to a follower."""
+
+    owner = models.ForeignKey(to=CustomUser, on_delete=models.CASCADE, related_name='timeline', null=False, blank=False)
+    post = models.ForeignKey(to=PostModel, on_delete=models.CASCADE, related_name='timeline_entries', null=False, blank=False)
+    author = models.ForeignKey(to=CustomUser, on_delete=models.CASCADE, related_name='+', null=False, blank=False)
+    date = models.DateTimeField()
+
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-date', '-post'], name='timeline_feed_idx'),
+            models.Index(fields=['owner', 'author'], name='timeline_author_idx'),
+        ]
+
+
+    def __str__(self):
+        return f'{str(self.owner)} - {str(self.post)}'
+
+
+class InteractionEventModel(models.Model):
+    """
+    Append-only log of likes, follows and comments. Ids are plain integers instead of
+    foreign keys, so events outlive what they point to and cost no constraint checks.
+    The id is the checkpoint replay_events resumes from.
+    """
+
+    class Kind(models.IntegerChoices):
+        POST_LIKE = 1
+        POST_UNLIKE = 2
+        COMMENT_LIKE = 3
+        COMMENT_UNLIKE = 4
+        FOLLOW = 5
+        UNFOLLOW = 6
+        COMMENT = 7
+        COMMENT_DELETE = 8
+
+    kind = models.PositiveSmallIntegerField(choices=Kind.choices)
+    # The user who acted, and the post, comment or user acted upon (the post for comment events).
+    actor = models.BigIntegerField()
+    target = models.BigIntegerField()
+    date = models.DateTimeField(default=timezone.now)
+
+
+    def __str__(self):
+        return f'#{self.id} {self.get_kind_display()} - {self.actor} -> {self.target}'
@@ -0,0 +1,61 @@
+from collections import Counter
+
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from posts.models import PostModel
+from users.models import CustomUser
+from home.models import TimelineModel
+
+from helpers.feed import invalidate_feeds
+from helpers.timeline import (
+    fan_out_post, backfill_timeline, backfill_former_pull_authors, prune_timeline, is_pull_author,
+)
+
+
+@receiver(post_save, sender=PostModel)
+def deliver_post(sender, instance: PostModel, **kwargs):
+    fan_out_post(instance)
+
+
+@receiver(post_save, sender=PostModel)
+@receiver(post_delete, sender=PostModel)
+def invalidate_followers_feeds(sender, instance: PostModel, **kwargs):
+    # Feeds of followers of pull authors are left to expire, there are too many of them.
+    if is_pull_author(instance.user_id):
+        return
+    invalidate_feeds(list(CustomUser.objects.filter(following=instance.user_id).values_list('id', flat=True)))
+
+
+@receiver(m2m_changed, sender=CustomUser.following.through)
+def sync_timelines(sender, instance: CustomUser, action: str, reverse: bool, pk_set: set, **kwargs):
+    # reverse=True means the change came from the 'followers' side of the relation.
+    if action == 'post_add':
+        if reverse:
+            for follower_id in pk_set:
+                backfill_timeline(follower_id, [instance.id])
+        else:
+            backfill_timeline(instance.id, pk_set)
+    elif action == 'post_remove':
+        if reverse:
+            TimelineModel.objects.filter(owner_id__in=pk_set, author=instance).delete()
+            backfill_former_pull_authors(Counter({instance.id: len(pk_set)}))
+        else:
+            prune_timeline(instance.id, pk_set)
+            backfill_former_pull_authors(Counter(pk_set))
+    elif action == 'post_clear':
+        if reverse:
+            entries = TimelineModel.objects.filter(author=instance)
+            invalidate_feeds(list(entries.values_list('owner', flat=True).distinct()))
+            entries.delete()
+        else:
+            TimelineModel.objects.filter(owner=instance).delete()
+
+
+@receiver(m2m_changed, sender=CustomUser.following.through)
+def invalidate_follower_feed(sender, instance: CustomUser, action: str, reverse: bool, pk_set: set, **kwargs):
+    # Runs after sync_timelines, so a rebuilt page already sees the new timeline.
+    if action in ('post_add', 'post_remove'):
+        invalidate_feeds(list(pk_set) if reverse else [instance.id])
+    elif action == 'post_clear' and not reverse:
+        invalidate_feeds([instance.id])
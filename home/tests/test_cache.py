@@ -0,0 +1,84 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from factories import factories as f
+from helpers.cache import single_flight
+
+
+class TestSingleFlight(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+
+    def test_concurrent_misses_build_once(self):
+        """
+        Test if concurrent misses for the same key run the builder only once and all
+        get its value.
+        """
+        calls = []
+
+        def builder():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'page'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(single_flight('test-key', builder, 60)))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(calls))
+        self.assertEqual(['page'] * 10, results)
+
+
+class TestFeedCache(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = f.create_test_user()
+        self.author = f.create_test_user(username='author')
+        self.posts = [f.create_test_post(user=self.author) for _ in range(3)]
+        self.user.following.add(self.author)
+        self.client.login(username=f.STD_TEST_USERNAME, password=f.STD_TEST_PASSWORD)
+
+
+    def test_first_page_is_cached(self):
+        """
+        Test if a second load of the feed skips the timeline query.
+        """
+        self.client.get(reverse('users:home:home'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('users:home:home'))
+        self.assertFalse(any('home_timelinemodel' in q['sql'] for q in queries))
+        self.assertEqual(3, len(response.context['posts']))
+
+
+    def test_new_post_invalidates_followers_feed(self):
+        """
+        Test if a new post of a followed user shows up right away.
+        """
+        self.client.get(reverse('users:home:home'))
+        new_post = f.create_test_post(user=self.author)
+        response = self.client.get(reverse('users:home:home'))
+        self.assertEqual(new_post.id, response.context['posts'][0].id)
+
+
+    def test_unfollow_invalidates_feed(self):
+        """
+        Test if unfollowing a user removes the posts of that user right away.
+        """
+        self.client.get(reverse('users:home:home'))
+        self.user.following.remove(self.author)
+        response = self.client.get(reverse('users:home:home'))
+        self.assertEqual(0, len(response.context['posts']))
@@ -0,0 +1,160 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from home.models import InteractionEventModel, TimelineModel
+from posts.models import PostModel, CommentModel
+from users.models import CustomUser
+from factories import factories as f
+from helpers.posts import toggle_like
+
+
+Kind = InteractionEventModel.Kind
+
+
+class TestInteractionLog(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = f.create_test_user()
+        self.author = f.create_test_user(username='author')
+        self.post = f.create_test_post(user=self.author)
+        self.comment = f.create_test_comment(user=self.author, post=self.post)
+
+
+    def events(self):
+        return list(InteractionEventModel.objects.order_by('id').values_list('kind', 'actor', 'target'))
+
+
+    def replay(self, rebuild, from_id=0):
+        out = StringIO()
+        call_command('replay_events', rebuild=rebuild, from_id=from_id, chunk_size=2, stdout=out)
+        return out.getvalue()
+
+
+    def test_interactions_are_logged(self):
+        """
+        Test if likes, follows and comments append their events in order.
+        """
+        toggle_like(self.post, self.user)
+        toggle_like(self.post, self.user)
+        toggle_like(self.comment, self.user)
+        self.user.following.add(self.author)
+        self.user.following.remove(self.author)
+        self.assertEqual([
+            (Kind.COMMENT, self.author.id, self.post.id),
+            (Kind.POST_LIKE, self.user.id, self.post.id),
+            (Kind.POST_UNLIKE, self.user.id, self.post.id),
+            (Kind.COMMENT_LIKE, self.user.id, self.comment.id),
+            (Kind.FOLLOW, self.user.id, self.author.id),
+            (Kind.UNFOLLOW, self.user.id, self.author.id),
+        ], self.events())
+
+
+    @override_settings(INTERACTION_LOG=False)
+    def test_log_can_be_disabled(self):
+        """
+        Test if nothing is logged with INTERACTION_LOG off.
+        """
+        InteractionEventModel.objects.all().delete()
+        toggle_like(self.post, self.user)
+        self.user.following.add(self.author)
+        self.assertEqual([], self.events())
+
+
+    def test_replay_rebuilds_counters(self):
+        """
+        Test if replaying the log from the start restores counters that drifted.
+        """
+        toggle_like(self.post, self.user)
+        toggle_like(self.comment, self.user)
+        self.user.following.add(self.author)
+        PostModel.objects.update(like_count=7, comment_count=7)
+        CommentModel.objects.update(like_count=7)
+        CustomUser.objects.update(following_count=7, followers_count=7)
+
+        out = self.replay('counters')
+
+        last_id = InteractionEventModel.objects.latest('id').id
+        self.assertIn(f'Replayed 4 event(s) into counters, checkpoint: {last_id}.', out)
+        post = PostModel.objects.get(id=self.post.id)
+        self.assertEqual((1, 1), (post.like_count, post.comment_count))
+        self.assertEqual(1, CommentModel.objects.get(id=self.comment.id).like_count)
+        user, author = CustomUser.objects.get(id=self.user.id), CustomUser.objects.get(id=self.author.id)
+        self.assertEqual((1, 0), (user.following_count, user.followers_count))
+        self.assertEqual((0, 1), (author.following_count, author.followers_count))
+
+
+    def test_seeded_log_keeps_counters_on_replay(self):
+        """
+        Test if the interactions made before the log existed are seeded into it, so a replay
+        from the start keeps their counts.
+        """
+        toggle_like(self.post, self.user)
+        toggle_like(self.comment, self.user)
+        self.user.following.add(self.author)
+        InteractionEventModel.objects.all().delete()
+
+        import_module('home.migrations.0003_seed_interaction_events').seed_events(apps, None)
+        self.assertCountEqual([
+            (Kind.POST_LIKE, self.user.id, self.post.id),
+            (Kind.COMMENT_LIKE, self.user.id, self.comment.id),
+            (Kind.FOLLOW, self.user.id, self.author.id),
+            (Kind.COMMENT, self.author.id, self.post.id),
+        ], self.events())
+
+        self.replay('counters')
+        post = PostModel.objects.get(id=self.post.id)
+        self.assertEqual((1, 1), (post.like_count, post.comment_count))
+        self.assertEqual(1, CommentModel.objects.get(id=self.comment.id).like_count)
+        self.assertEqual(1, CustomUser.objects.get(id=self.author.id).followers_count)
+
+
+    def test_replay_from_checkpoint(self):
+        """
+        Test if replaying from a checkpoint only applies the events after it.
+        """
+        toggle_like(self.post, self.user)
+        checkpoint = InteractionEventModel.objects.latest('id').id
+        other = f.create_test_user(username='other')
+        toggle_like(self.post, other)
+        PostModel.objects.update(like_count=1) # State saved at the checkpoint.
+
+        out = self.replay('counters', from_id=checkpoint)
+
+        self.assertIn('Replayed 1 event(s)', out)
+        self.assertEqual(2, PostModel.objects.get(id=self.post.id).like_count)
+
+
+    def test_replay_restores_likes(self):
+        """
+        Test if replaying the log restores lost like rows without logging them again.
+        """
+        toggle_like(self.post, self.user)
+        toggle_like(self.comment, self.user)
+        toggle_like(self.comment, self.user)
+        PostModel.likes.through.objects.all().delete()
+        logged = len(self.events())
+
+        self.replay('likes')
+
+        self.assertTrue(self.post.likes.filter(id=self.user.id).exists())
+        self.assertFalse(self.comment.likes.filter(id=self.user.id).exists())
+        self.assertEqual(logged, len(self.events()))
+
+
+    def test_replay_rebuilds_timelines(self):
+        """
+        Test if replaying follow events rebuilds the timelines of the followers.
+        """
+        self.user.following.add(self.author)
+        TimelineModel.objects.all().delete()
+
+        self.replay('timelines')
+
+        self.assertTrue(TimelineModel.objects.filter(owner=self.user, post=self.post).exists())
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import TestCase
+
+from posts.models import PostModel
+from users.models import CustomUser
+from factories import factories as f
+from helpers.fragments import render_post, post_fragment_key
+from helpers.posts import annotate_post_stats
+
+
+class TestPostFragments(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = f.create_test_user()
+        self.viewer = f.create_test_user(username='viewer')
+        self.post = f.create_test_post(user=self.user, desc='Shared description')
+        self.post.likes.add(self.user)
+
+
+    def annotated(self, viewer):
+        return annotate_post_stats(PostModel.objects.select_related('user'), viewer).get(id=self.post.id)
+
+
+    def test_fragment_is_shared_between_viewers(self):
+        """
+        Test if the post markup is rendered once and reused for other viewers, with
+        their own like state filled in.
+        """
+        with mock.patch('helpers.fragments.render_to_string', wraps=render_to_string) as render:
+            liked_html = render_post(self.annotated(self.user), self.user.username)
+            other_html = render_post(self.annotated(self.viewer), self.viewer.username)
+        self.assertEqual(1, render.call_count)
+        self.assertIn('value="liked"', liked_html)
+        self.assertIn('value="not-liked"', other_html)
+        self.assertIn('Shared description', other_html)
+        self.assertNotIn('<!--', other_html.replace('<!-- TODO', ''))
+
+
+    def test_edit_renders_new_version(self):
+        """
+        Test if editing a post changes its fragment key and the rendered description.
+        """
+        old_key = post_fragment_key(self.post)
+        render_post(self.annotated(self.user), self.user.username)
+        self.post.description = 'Edited description'
+        self.post.save()
+        self.assertNotEqual(old_key, post_fragment_key(self.post))
+        html = render_post(self.annotated(self.user), self.user.username)
+        self.assertIn('Edited description', html)
+
+
+    def test_author_change_renders_new_fragment(self):
+        """
+        Test if renaming the author or changing the profile picture is not served from the
+        fragment cached before.
+        """
+        render_post(self.annotated(self.viewer), self.viewer.username)
+        CustomUser.objects.filter(id=self.user.id).update(
+            username='renamed', profile_picture='images/profiles/renamed.jpg',
+        )
+        html = render_post(self.annotated(self.viewer), self.viewer.username)
+        self.assertIn('renamed</p>', html)
+        self.assertIn('images/profiles/renamed.jpg', html)
+
+
+    def test_user_content_cannot_fill_slots(self):
+        """
+        Test if slot markers typed in a description are escaped instead of being filled.
+        """
+        self.post.description = '<!--likes-qty-->'
+        self.post.save()
+        html = render_post(self.annotated(self.user), self.user.username)
+        self.assertIn('&lt;!--likes-qty--&gt;', html)
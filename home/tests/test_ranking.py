@@ -0,0 +1,108 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from factories import factories as f
+
+try:
+    import numpy as np
+    from helpers.ranking import score_posts, top_n, get_ranked_feed
+except ImportError:
+    np = None
+
+
+@skipUnless(np, 'Feed ranking needs numpy.')
+class TestScoring(SimpleTestCase):
+
+    def score(self, age_hours=1.0, likes=0.0, comments=0.0, affinity=0.0):
+        return score_posts(
+            np.array([age_hours]), np.array([likes]), np.array([comments]), np.array([affinity]),
+        )[0]
+
+
+    def test_newer_posts_score_higher(self):
+        """Test if, with the same engagement, the newer post scores higher."""
+        self.assertGreater(self.score(age_hours=1), self.score(age_hours=30))
+
+
+    def test_engagement_raises_score(self):
+        """Test if likes, comments and viewer affinity each raise the score."""
+        base = self.score()
+        self.assertGreater(self.score(likes=50), base)
+        self.assertGreater(self.score(comments=10), base)
+        self.assertGreater(self.score(affinity=3), base)
+
+
+    def test_top_n_returns_best_first(self):
+        """Test if top_n returns the indexes of the highest scores in descending order."""
+        scores = np.random.default_rng(0).random(1000)
+        best = top_n(scores, 10)
+        self.assertEqual(list(np.argsort(-scores)[:10]), list(best))
+        self.assertEqual(5, len(top_n(scores[:5], 10)))
+
+
+@skipUnless(np, 'Feed ranking needs numpy.')
+class TestRankedFeed(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = f.create_test_user()
+        self.favorite = f.create_test_user(username='favorite')
+        self.other = f.create_test_user(username='other')
+        self.user.following.add(self.favorite, self.other)
+
+
+    def test_ranked_feed_prefers_authors_the_viewer_interacts_with(self):
+        """
+        Test if a post of an author the viewer often likes outranks a slightly newer post
+        of an author the viewer never interacted with.
+        """
+        old_posts = [f.create_test_post(user=self.favorite) for _ in range(3)]
+        for post in old_posts:
+            post.likes.add(self.user)
+        favorite_post = f.create_test_post(user=self.favorite)
+        favorite_post.date = timezone.now() - timedelta(hours=2)
+        favorite_post.save()
+        other_post = f.create_test_post(user=self.other)
+
+        ranked, _ = get_ranked_feed(self.user, page_size=2)
+        self.assertEqual(2, len(ranked))
+        self.assertNotIn(other_post, ranked)
+
+
+    @override_settings(FEED_RANKING=True)
+    def test_home_view_uses_ranked_feed(self):
+        """
+        Test if the home view shows the ranked page when ranking is enabled.
+        """
+        posts = [f.create_test_post(user=self.other) for _ in range(3)]
+        self.client.login(username=f.STD_TEST_USERNAME, password=f.STD_TEST_PASSWORD)
+        response = self.client.get(reverse('users:home:home'))
+        self.assertEqual({p.id for p in posts}, {p.id for p in response.context['posts']})
+        self.assertIsNone(response.context['next_cursor'])
+
+
+    @override_settings(FEED_RANKING=True, FEED_PAGE_SIZE=4)
+    def test_rest_of_feed_follows_ranked_page(self):
+        """
+        Test if the posts left out of the ranked page are reachable from its cursor, newest
+        first and without the ranked ones.
+        """
+        posts = [f.create_test_post(user=self.other) for _ in range(10)]
+        self.client.login(username=f.STD_TEST_USERNAME, password=f.STD_TEST_PASSWORD)
+        response = self.client.get(reverse('users:home:home'))
+        ranked_ids = [p.id for p in response.context['posts']]
+        self.assertEqual(4, len(ranked_ids))
+        self.assertIsNotNone(response.context['next_cursor'])
+
+        seen, cursor = [], response.context['next_cursor']
+        while cursor:
+            page = self.client.get(reverse('users:home:feed'), {'cursor': cursor, 'fields': 'id'}).json()
+            seen += [post['id'] for post in page['posts']]
+            cursor = page['next_cursor']
+        rest = sorted(set(p.id for p in posts) - set(ranked_ids), reverse=True)
+        self.assertEqual(rest, seen)
@@ -0,0 +1,145 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from home.models import TimelineModel
+from factories import factories as f
+from helpers.feed import get_feed_page
+
+
+class TestTimeline(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = f.create_test_user()
+        self.author = f.create_test_user(username='author')
+        self.posts = [f.create_test_post(user=self.author, desc=f'Post #{i}') for i in range(3)]
+
+
+    def timeline_post_ids(self, user):
+        return set(TimelineModel.objects.filter(owner=user).values_list('post', flat=True))
+
+
+    def test_follow_backfills_timeline(self):
+        """
+        Test if following a user copies the published posts of that user to the timeline.
+        """
+        self.user.following.add(self.author)
+        self.assertEqual({p.id for p in self.posts}, self.timeline_post_ids(self.user))
+
+
+    def test_unfollow_prunes_timeline(self):
+        """
+        Test if unfollowing a user removes the posts of that user from the timeline.
+        """
+        self.user.following.add(self.author)
+        self.user.following.remove(self.author)
+        self.assertEqual(set(), self.timeline_post_ids(self.user))
+
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """
+        Test if a new post reaches the timeline of every follower of its author.
+        """
+        follower = f.create_test_user(username='follower')
+        self.user.following.add(self.author)
+        follower.following.add(self.author)
+        new_post = f.create_test_post(user=self.author)
+        self.assertIn(new_post.id, self.timeline_post_ids(self.user))
+        self.assertIn(new_post.id, self.timeline_post_ids(follower))
+
+
+    def test_unpublished_post_leaves_timelines(self):
+        """
+        Test if unpublishing a post removes it from the timelines, and publishing it again
+        brings it back.
+        """
+        self.user.following.add(self.author)
+        post = self.posts[0]
+        post.published = False
+        post.save()
+        self.assertNotIn(post.id, self.timeline_post_ids(self.user))
+        post.published = True
+        post.save()
+        self.assertIn(post.id, self.timeline_post_ids(self.user))
+
+
+    def test_rebuild_timelines_command(self):
+        """
+        Test if the rebuild_timelines command restores a lost timeline.
+        """
+        self.user.following.add(self.author)
+        TimelineModel.objects.all().delete()
+        call_command('rebuild_timelines', self.user.username, stdout=StringIO())
+        self.assertEqual({p.id for p in self.posts}, self.timeline_post_ids(self.user))
+
+
+    def test_migration_backfills_existing_follows(self):
+        """
+        Test if the timelines of follows made before the timeline table existed are filled
+        when migrating.
+        """
+        self.user.following.add(self.author)
+        TimelineModel.objects.all().delete()
+        import_module('home.migrations.0004_backfill_timelines').backfill_timelines(apps, None)
+        self.assertEqual({p.id for p in self.posts}, self.timeline_post_ids(self.user))
+        self.assertEqual(set(), self.timeline_post_ids(self.author))
+
+
+@override_settings(FEED_FANOUT_FOLLOWER_LIMIT=1)
+class TestHybridTimeline(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = f.create_test_user()
+        self.celebrity = f.create_test_user(username='celebrity')
+        self.regular = f.create_test_user(username='regular')
+        self.fan = f.create_test_user(username='fan')
+        self.fan.following.add(self.celebrity)
+        self.user.following.add(self.celebrity, self.regular)
+
+
+    def test_posts_of_large_accounts_are_not_fanned_out(self):
+        """
+        Test if posts of accounts above the follower limit stay out of the stored timelines.
+        """
+        post = f.create_test_post(user=self.celebrity)
+        self.assertFalse(TimelineModel.objects.filter(post=post).exists())
+
+
+    def test_feed_merges_pulled_posts_in_order(self):
+        """
+        Test if the feed merges the posts of large accounts with the stored timeline,
+        newest first.
+        """
+        posts = [
+            f.create_test_post(user=user, desc=f'Post #{i}')
+            for i in range(3)
+            for user in (self.celebrity, self.regular)
+        ]
+        feed, next_cursor = get_feed_page(self.user, page_size=4)
+        expected = sorted(posts, key=lambda p: (p.date, p.id), reverse=True)
+        self.assertEqual([p.id for p in expected[:4]], [p.id for p in feed])
+
+        feed, next_cursor = get_feed_page(self.user, cursor=next_cursor, page_size=4)
+        self.assertEqual([p.id for p in expected[4:]], [p.id for p in feed])
+        self.assertIsNone(next_cursor)
+
+
+    def test_posts_reach_timelines_when_author_drops_below_limit(self):
+        """
+        Test if the posts an author made while above the follower limit are copied to the
+        timelines of the remaining followers once the author drops below it.
+        """
+        post = f.create_test_post(user=self.celebrity)
+        self.fan.following.remove(self.celebrity)
+        self.assertEqual(
+            [self.user.id],
+            list(TimelineModel.objects.filter(post=post).values_list('owner', flat=True)),
+        )
+        feed, _ = get_feed_page(self.user)
+        self.assertEqual([post.id], [p.id for p in feed if p.user_id == self.celebrity.id])
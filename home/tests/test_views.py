@@ -1,8 +1,13 @@
-from django.test import TestCase
+from django.db import connection
+from django.core.cache import cache
+from django.contrib.auth.models import AnonymousUser
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import PostModel, CommentModel
 from factories import factories as f
+from home.views import home_async
 
 
 
@@ -15,6 +20,7 @@ class TestHomeView(TestCase):
 
 
     def setUp(self):
+        cache.clear()
         self.user = f.create_test_user()
         self.users = [f.create_test_user(username=f'testuser{i}') for i in range(self.USERS_QTY)]
         self.posts = []
@@ -50,3 +56,250 @@ class TestHomeView(TestCase):
         response = self.client.get(reverse('users:home:home'))
         posts_count = len(response.context['posts'])
         self.assertEqual(posts_count, self.MAX_POSTS_SHOW)
+
+
+    def test_home_view_hides_unpublished_posts(self):
+        """
+        Test if unpublished posts are left out of the feed.
+        """
+        self.client.login(username=f.STD_TEST_USERNAME, password=f.STD_TEST_PASSWORD)
+        for user in self.users:
+            self.user.following.add(user)
+        hidden_post = self.posts[0]
+        hidden_post.published = False
+        hidden_post.save()
+        response = self.client.get(reverse('users:home:home'))
+        self.assertNotIn(hidden_post.id, [p.id for p in response.context['posts']])
+
+
+    @override_settings(FEED_PAGE_SIZE=10)
+    def test_home_view_paginates_with_cursor(self):
+        """
+        Test if following the 'next_cursor' walks the whole feed, newest first,
+        without repeating posts.
+        """
+        self.client.login(username=f.STD_TEST_USERNAME, password=f.STD_TEST_PASSWORD)
+        for user in self.users:
+            self.user.following.add(user)
+        seen = []
+        cursor = None
+        while True:
+            params = {'cursor': cursor} if cursor else {}
+            response = self.client.get(reverse('users:home:home'), params)
+            self.assertLessEqual(len(response.context['posts']), 10)
+            seen += [(p.date, p.id) for p in response.context['posts']]
+            cursor = response.context['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(self.posts), len(seen))
+        self.assertEqual(sorted(seen, reverse=True), seen)
+
+
+    def test_home_view_rejects_invalid_cursor(self):
+        """
+        Test if a malformed cursor returns a bad request.
+        """
+        self.client.login(username=f.STD_TEST_USERNAME, password=f.STD_TEST_PASSWORD)
+        response = self.client.get(reverse('users:home:home'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+    def test_home_view_queries_do_not_grow_with_posts(self):
+        """
+        Test if rendering the feed runs the same number of queries for a short and a
+        long page, with likes, comments and like state precomputed.
+        """
+        self.client.login(username=f.STD_TEST_USERNAME, password=f.STD_TEST_PASSWORD)
+        for user in self.users:
+            self.user.following.add(user)
+        for post in self.posts[::2]:
+            post.likes.add(self.user)
+
+        with self.settings(FEED_PAGE_SIZE=5), CaptureQueriesContext(connection) as short_page:
+            self.client.get(reverse('users:home:home'))
+        with self.settings(FEED_PAGE_SIZE=25), CaptureQueriesContext(connection) as long_page:
+            response = self.client.get(reverse('users:home:home'))
+        self.assertEqual(len(short_page), len(long_page))
+
+        liked_ids = {p.id for p in self.posts[::2]}
+        for post in response.context['posts']:
+            self.assertEqual(post.id in liked_ids, post.user_liked)
+            self.assertEqual(self.COMMENTS_QTY, post.comments_qty)
+
+
+class TestFeedView(TestCase):
+
+    POSTS_QTY = 5
+
+
+    def setUp(self):
+        cache.clear()
+        self.user = f.create_test_user()
+        self.author = f.create_test_user(username='author')
+        self.posts = [f.create_test_post(user=self.author, desc=f'Post #{i}') for i in range(self.POSTS_QTY)]
+        for i in range(3):
+            f.create_test_comment(user=self.author, post=self.posts[0], text=f'Comment#{i}')
+        self.user.following.add(self.author)
+        self.client.login(username=f.STD_TEST_USERNAME, password=f.STD_TEST_PASSWORD)
+
+
+    def test_feed_view_blocked_for_unauthenticated_user(self):
+        """
+        Test if the feed view redirects unauthenticated users to login page.
+        """
+        self.client.logout()
+        url = reverse('users:home:feed')
+        response = self.client.get(url, follow=True)
+        self.assertRedirects(response, f'{reverse('users:login')}?next={url}')
+
+
+    def test_feed_view_returns_post_records(self):
+        """
+        Test if the feed view returns every post of the page with counts, like state and
+        comment preview.
+        """
+        self.posts[0].likes.add(self.user)
+        response = self.client.get(reverse('users:home:feed')).json()
+        self.assertEqual(self.POSTS_QTY, len(response['posts']))
+        self.assertIsNone(response['next_cursor'])
+
+        record = next(p for p in response['posts'] if p['id'] == self.posts[0].id)
+        self.assertEqual(self.author.username, record['author']['username'])
+        self.assertEqual(1, record['likes'])
+        self.assertEqual(3, record['comments'])
+        self.assertTrue(record['liked'])
+        self.assertEqual(['Comment#0', 'Comment#1'], [c['text'] for c in record['comment_preview']])
+
+
+    def test_feed_view_returns_only_requested_fields(self):
+        """
+        Test if the feed view honours the sparse fieldset passed in 'fields'.
+        """
+        response = self.client.get(reverse('users:home:feed'), {'fields': 'id,likes'}).json()
+        for record in response['posts']:
+            self.assertEqual({'id', 'likes'}, set(record))
+
+
+    def test_feed_view_rejects_invalid_fields(self):
+        """
+        Test if the feed view returns a bad request for unknown fields.
+        """
+        response = self.client.get(reverse('users:home:feed'), {'fields': 'id,password'})
+        self.assertEqual(400, response.status_code)
+
+
+    @override_settings(FEED_PAGE_SIZE=2)
+    def test_feed_view_follows_cursor(self):
+        """
+        Test if the feed view pages through the whole feed with 'next_cursor'.
+        """
+        ids = []
+        params = {'fields': 'id'}
+        while True:
+            response = self.client.get(reverse('users:home:feed'), params).json()
+            ids += [p['id'] for p in response['posts']]
+            if not response['next_cursor']:
+                break
+            params['cursor'] = response['next_cursor']
+        self.assertEqual(sorted(p.id for p in self.posts), sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+
+
+@override_settings(FEED_STREAMING=True, FEED_STREAM_CHUNK_SIZE=2)
+class TestStreamingHomeView(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = f.create_test_user()
+        self.author = f.create_test_user(username='author')
+        self.posts = [f.create_test_post(user=self.author, desc=f'Post #{i}') for i in range(5)]
+        self.user.following.add(self.author)
+        self.client.login(username=f.STD_TEST_USERNAME, password=f.STD_TEST_PASSWORD)
+
+
+    def test_home_view_streams_page(self):
+        """
+        Test if the streaming home view sends the navbar first and then every post.
+        """
+        response = self.client.get(reverse('users:home:home'))
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        self.assertIn('<nav>', chunks[0])
+        self.assertNotIn('class="post"', chunks[0])
+        page = ''.join(chunks)
+        for post in self.posts:
+            self.assertIn(reverse('posts:post', kwargs={'post_id': post.id}), page)
+        self.assertNotIn('<!--feed-stream-->', page)
+
+
+    def test_home_view_stream_rejects_invalid_cursor(self):
+        """
+        Test if the streaming home view rejects a malformed cursor before streaming.
+        """
+        response = self.client.get(reverse('users:home:home'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestAsyncHomeView(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = f.create_test_user()
+        self.author = f.create_test_user(username='author')
+        self.posts = [f.create_test_post(user=self.author, desc=f'Post #{i}') for i in range(30)]
+        self.user.following.add(self.author)
+        self.factory = AsyncRequestFactory()
+
+
+    async def test_async_home_view_shows_first_page(self):
+        """
+        Test if the async home view renders the same first page as the sync one.
+        """
+        request = self.factory.get(reverse('users:home:home'))
+        request.user = self.user
+        response = await home_async(request)
+        self.assertEqual(response.status_code, 200)
+        page = response.content.decode()
+        for post in self.posts[-25:]:
+            self.assertIn(reverse('posts:post', kwargs={'post_id': post.id}), page)
+        self.assertNotIn(reverse('posts:post', kwargs={'post_id': self.posts[0].id}) + '"', page)
+
+
+    @override_settings(FEED_STREAMING=True, FEED_STREAM_CHUNK_SIZE=10)
+    async def test_async_home_view_streams_async_iterator(self):
+        """
+        Test if the streaming async home view sends the page through an async iterator,
+        navbar first, so ASGI servers do not buffer it.
+        """
+        request = self.factory.get(reverse('users:home:home'))
+        request.user = self.user
+        response = await home_async(request)
+        self.assertTrue(response.is_async)
+        chunks = [chunk.decode() async for chunk in response]
+        self.assertIn('<nav>', chunks[0])
+        self.assertNotIn('class="post"', chunks[0])
+        page = ''.join(chunks)
+        for post in self.posts[-25:]:
+            self.assertIn(reverse('posts:post', kwargs={'post_id': post.id}), page)
+        self.assertNotIn('<!--feed-stream-->', page)
+
+
+    async def test_async_home_view_blocked_for_unauthenticated_user(self):
+        """
+        Test if the async home view redirects unauthenticated users to the login page.
+        """
+        request = self.factory.get(reverse('users:home:home'))
+        request.user = AnonymousUser()
+        response = await home_async(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse('users:login')))
+
+
+    async def test_async_home_view_rejects_invalid_cursor(self):
+        """
+        Test if the async home view answers 400 for a malformed cursor.
+        """
+        request = self.factory.get(reverse('users:home:home'), {'cursor': 'not-a-cursor'})
+        request.user = self.user
+        response = await home_async(request)
+        self.assertEqual(response.status_code, 400)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 
 
@@ -6,5 +7,6 @@ from . import views
 app_name = 'home'
 
 urlpatterns = [
-    path('', views.home, name='home')
+    path('', views.home_async if settings.ASYNC_VIEWS else views.home, name='home'),
+    path('feed/', views.feed, name='feed'),
 ]
\ No newline at end of file
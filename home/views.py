@@ -1,20 +1,124 @@
+from collections.abc import AsyncIterator, Iterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
 
-from posts.models import PostModel
 from users.models import CustomUser
 
-from helpers.posts import get_total_likes, check_user_like
+from helpers.aio import async_login_required
+from helpers.feed import (
+    decode_cursor, get_feed_page, aget_feed_page, get_feed_page_ids, aget_feed_page_ids,
+    get_posts_in_order, aget_posts_in_order, parse_feed_fields, serialize_posts,
+)
 
 # Create your views here.
 
+FEED_STREAM_MARKER = '<!--feed-stream-->'
+
 
 @login_required
 def home(request):
     if request.method == 'POST':
         return HttpResponse('Sorry. :(') # TODO: Implementar post
     logged_user = get_object_or_404(CustomUser, username=request.user)
-    following_users = logged_user.following.all()
-    posts = PostModel.objects.filter(user__in=following_users)
-    return render(request, "home/index.html", {"posts":posts, "logged_user":logged_user})
\ No newline at end of file
+    cursor = request.GET.get('cursor')
+    try:
+        if settings.FEED_STREAMING:
+            if cursor:
+                decode_cursor(cursor) # Invalid cursors must fail before the first byte is sent.
+            return StreamingHttpResponse(stream_home(request, logged_user, cursor))
+        if settings.FEED_RANKING and not cursor:
+            from helpers.ranking import get_ranked_feed # Needs numpy, only imported when ranking is on.
+            # The next pages go on newest first, leaving out the posts of the ranked page.
+            posts, next_cursor = get_ranked_feed(logged_user)
+        else:
+            posts, next_cursor = get_feed_page(logged_user, cursor)
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+    return render(request, "home/index.html", {
+        "posts": posts,
+        "logged_user": logged_user,
+        "next_cursor": next_cursor,
+    })
+
+
+@async_login_required
+async def home_async(request: HttpRequest) -> HttpResponse:
+    if request.method == 'POST':
+        return HttpResponse('Sorry. :(') # TODO: Implementar post
+    logged_user = request.user
+    cursor = request.GET.get('cursor')
+    try:
+        if settings.FEED_STREAMING:
+            if cursor:
+                decode_cursor(cursor)
+            # An async iterator, a sync one would be buffered whole by the ASGI handler.
+            return StreamingHttpResponse(astream_home(request, logged_user, cursor))
+        if settings.FEED_RANKING and not cursor:
+            from helpers.ranking import get_ranked_feed
+            posts, next_cursor = await sync_to_async(get_ranked_feed)(logged_user)
+        else:
+            posts, next_cursor = await aget_feed_page(logged_user, cursor)
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+    return await sync_to_async(render)(request, "home/index.html", {
+        "posts": posts,
+        "logged_user": logged_user,
+        "next_cursor": next_cursor,
+    })
+
+
+def stream_home(request: HttpRequest, logged_user: CustomUser, cursor: str = None) -> Iterator[str]:
+    """
+    Yields the home page piece by piece: the page head and navbar before touching the
+    feed, then the posts in chunks of FEED_STREAM_CHUNK_SIZE, then the rest of the page.
+    """
+    page = render_to_string("home/index.html", {"logged_user": logged_user, "streaming": True}, request)
+    head, tail = page.split(FEED_STREAM_MARKER)
+    yield head
+
+    post_ids, next_cursor = get_feed_page_ids(logged_user, cursor)
+    posts_template = get_template("parciais/_posts.html")
+    chunk_size = settings.FEED_STREAM_CHUNK_SIZE
+    for start in range(0, len(post_ids), chunk_size):
+        posts = get_posts_in_order(post_ids[start:start + chunk_size], logged_user)
+        yield posts_template.render({"posts": posts, "logged_user": logged_user}, request)
+
+    yield render_to_string("parciais/_feed_next.html", {"next_cursor": next_cursor}, request)
+    yield tail
+
+
+async def astream_home(request: HttpRequest, logged_user: CustomUser, cursor: str = None) -> AsyncIterator[str]:
+    """Async version of stream_home, the rendering of each piece runs off the event loop."""
+    page = await sync_to_async(render_to_string)("home/index.html", {"logged_user": logged_user, "streaming": True}, request)
+    head, tail = page.split(FEED_STREAM_MARKER)
+    yield head
+
+    post_ids, next_cursor = await aget_feed_page_ids(logged_user, cursor)
+    posts_template = get_template("parciais/_posts.html")
+    chunk_size = settings.FEED_STREAM_CHUNK_SIZE
+    for start in range(0, len(post_ids), chunk_size):
+        posts = await aget_posts_in_order(post_ids[start:start + chunk_size], logged_user)
+        yield await sync_to_async(posts_template.render)({"posts": posts, "logged_user": logged_user}, request)
+
+    yield await sync_to_async(render_to_string)("parciais/_feed_next.html", {"next_cursor": next_cursor}, request)
+    yield tail
+
+
+@login_required
+def feed(request: HttpRequest) -> JsonResponse | HttpResponseBadRequest:
+    if request.method != 'GET':
+        return HttpResponseBadRequest('Only GET requests are allowed.')
+    try:
+        fields = parse_feed_fields(request.GET.get('fields'))
+        posts, next_cursor = get_feed_page(request.user, request.GET.get('cursor'))
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+    return JsonResponse({
+        'posts': serialize_posts(posts, request.user.username, fields),
+        'next_cursor': next_cursor,
+    })
@@ -1,7 +1,9 @@
 from django.contrib import admin
 
-from .models import PostModel, CommentModel
+from .models import PostModel, CommentModel, LikeShardModel, PostViewersModel
 
 # Register your models here.
 admin.site.register(PostModel)
-admin.site.register(CommentModel)
\ No newline at end of file
+admin.site.register(CommentModel)
+admin.site.register(LikeShardModel)
+admin.site.register(PostViewersModel)
\ No newline at end of file
@@ -0,0 +1,68 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import PostModel, CommentModel
+from users.models import CustomUser
+
+from helpers.comments import THREAD_ORDERING, CommentRow, thread_rows
+from helpers.posts import annotate_comment_stats, attach_liked_flags
+
+
+class Command(BaseCommand):
+    help = 'Compares reading a comment thread as model instances with reading it as slotted rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+
+
+    def handle(self, *args, **options):
+        # Everything is created and measured inside a transaction that is rolled back.
+        with transaction.atomic():
+            authors = CustomUser.objects.bulk_create(
+                CustomUser(username=f'bench-{i}', email=f'bench-{i}@bench.test') for i in range(options['authors'])
+            )
+            post = PostModel.objects.create(user=authors[0])
+            CommentModel.objects.bulk_create(
+                (CommentModel(user=authors[i % len(authors)], post=post, text=f'Comment #{i}')
+                for i in range(options['comments'])),
+                batch_size=1000,
+            )
+            viewer = authors[0]
+            comments = annotate_comment_stats(CommentModel.objects.filter(post=post), viewer).order_by(*THREAD_ORDERING)
+
+            results = [
+                ('instances', lambda: _render_fields(comments.select_related('user'), viewer)),
+                ('rows', lambda: _render_fields((CommentRow(row) for row in thread_rows(comments)), viewer)),
+            ]
+            lines = []
+            for name, read in results:
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    read()
+                    timings.append((time.perf_counter() - start) * 1000)
+                tracemalloc.start()
+                kept = read()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                lines.append(
+                    f"{name + ':':11}best {min(timings):.1f} ms, mean {sum(timings) / len(timings):.1f} ms, "
+                    f"peak {peak / 2 ** 20:.1f} MiB for {len(kept)} comment(s)"
+                )
+            transaction.set_rollback(True)
+
+        self.stdout.write('\n'.join(lines))
+
+
+def _render_fields(comments, viewer) -> list:
+    """Reads what the thread template reads from every comment, and keeps the comments like a page does."""
+    comments = attach_liked_flags(list(comments), viewer)
+    for comment in comments:
+        (comment.id, comment.text, comment.post_date, comment.likes_qty, comment.user_liked,
+         comment.user.username, str(comment.user.profile_picture))
+    return comments
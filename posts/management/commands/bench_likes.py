@@ -0,0 +1,59 @@
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import PostModel
+from users.models import CustomUser
+
+from helpers.posts import toggle_like
+from helpers.write_behind import LikeBuffer
+
+
+class Command(BaseCommand):
+    help = 'Compares like toggles written directly with toggles buffered by the write-behind journal.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--clicks', type=int, default=5, help='Toggles per user, odd counts end liked.')
+
+
+    def handle(self, *args, **options):
+        # Everything is created and measured inside a transaction that is rolled back.
+        with transaction.atomic():
+            author = CustomUser.objects.create(username='bench-author', email='bench-author@bench.test')
+            users = CustomUser.objects.bulk_create(
+                CustomUser(username=f'bench-{i}', email=f'bench-{i}@bench.test') for i in range(options['users'])
+            )
+            direct_post = PostModel.objects.create(user=author)
+            buffered_post = PostModel.objects.create(user=author)
+            clicks = [user for _ in range(options['clicks']) for user in users]
+
+            start = time.perf_counter()
+            for user in clicks:
+                toggle_like(direct_post, user)
+            direct = time.perf_counter() - start
+
+            with tempfile.TemporaryDirectory() as directory:
+                buffer = LikeBuffer(Path(directory) / 'likes.journal')
+                start = time.perf_counter()
+                for user in clicks:
+                    buffer.toggle(buffered_post, user)
+                buffered = time.perf_counter() - start
+                start = time.perf_counter()
+                written = buffer.flush()
+                flush = time.perf_counter() - start
+                buffer.stop()
+
+            direct_post.refresh_from_db()
+            buffered_post.refresh_from_db()
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{len(clicks)} toggles from {len(users)} users\n"
+            f"direct:       {direct * 1000:.1f} ms, {len(clicks) / direct:.0f} toggles/s, {direct_post.like_count} likes\n"
+            f"write-behind: {buffered * 1000:.1f} ms, {len(clicks) / buffered:.0f} toggles/s, "
+            f"flush {flush * 1000:.1f} ms for {written} row(s), {buffered_post.like_count} likes"
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from helpers.counters import fold_like_shards
+
+
+class Command(BaseCommand):
+    help = 'Adds the sharded like counts of hot posts back to their like_count. Meant to run periodically (e.g. from cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+
+    def handle(self, *args, **options):
+        folded = fold_like_shards(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Folded the like shards of {folded} post(s).'))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from helpers.importer import import_comments, read_comment_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports comments and their likes from a .jsonl or .csv file with bulk inserts, '
+        'then recounts the comments of the posts they went to.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File with 'username', 'post', 'text' and optionally 'date' and 'likes' per record.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            stats = import_comments(read_comment_records(options['path']), options['batch_size'])
+        except OSError as err:
+            raise CommandError(f"Could not read {options['path']}: {err}")
+        elapsed = time.perf_counter() - start
+        rows = stats['comments'] + stats['likes']
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats["comments"]} comment(s) and {stats["likes"]} like(s) in {elapsed:.1f} s '
+            f'({rows / elapsed:.0f} rows/s), skipped {stats["skipped"]} record(s).'
+        ))
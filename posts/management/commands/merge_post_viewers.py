@@ -0,0 +1,22 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from posts.models import PostModel
+
+from helpers.viewers import merge_post_viewers
+
+
+class Command(BaseCommand):
+    help = 'Merges the cached unique viewer sketches of every post into the database. Meant to run periodically (e.g. from cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+
+    def handle(self, *args, **options):
+        post_ids = PostModel.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=options['batch_size'])
+        merged = 0
+        while batch := list(islice(post_ids, options['batch_size'])):
+            merged += merge_post_viewers(batch)
+        self.stdout.write(self.style.SUCCESS(f'Merged the viewers of {merged} post(s).'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from helpers.counters import reconcile_post_counts, reconcile_comment_counts, reconcile_user_counts
+
+
+class Command(BaseCommand):
+    help = 'Recounts the like, comment and follow counters of posts, comments and users and fixes the ones that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+
+    def handle(self, *args, **options):
+        posts = reconcile_post_counts(options['batch_size'])
+        comments = reconcile_comment_counts(options['batch_size'])
+        users = reconcile_user_counts(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Fixed the counters of {posts} post(s), {comments} comment(s) and {users} user(s).'))
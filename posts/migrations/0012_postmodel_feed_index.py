@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_commentmodel'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postmodel',
+            index=models.Index(fields=['user', '-date', '-id'], name='post_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_postmodel_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postmodel',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
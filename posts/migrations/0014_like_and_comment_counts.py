@@ -0,0 +1,51 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, field):
+    counts = (queryset
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(qty=Count('*'))
+        .values('qty'))
+    return Coalesce(Subquery(counts), 0)
+
+
+def backfill_counts(apps, schema_editor):
+    PostModel = apps.get_model('posts', 'PostModel')
+    CommentModel = apps.get_model('posts', 'CommentModel')
+    PostModel.objects.update(
+        like_count=_count(PostModel._meta.get_field('likes').remote_field.through.objects, 'postmodel'),
+        comment_count=_count(CommentModel.objects, 'post'),
+    )
+    CommentModel.objects.update(
+        like_count=_count(CommentModel._meta.get_field('likes').remote_field.through.objects, 'commentmodel'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_postmodel_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postmodel',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postmodel',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='commentmodel',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
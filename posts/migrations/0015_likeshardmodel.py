@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_like_and_comment_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeShardModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('delta', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='like_shards', to='posts.postmodel')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='likeshardmodel',
+            constraint=models.UniqueConstraint(fields=('post', 'shard'), name='unique_like_shard'),
+        ),
+    ]
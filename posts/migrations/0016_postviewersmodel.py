@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_likeshardmodel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewersModel',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='viewers', serialize=False, to='posts.postmodel')),
+                ('sketch', models.BinaryField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_postviewersmodel'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commentmodel',
+            index=models.Index(fields=['post', '-fixed', 'post_date', 'id'], name='comment_thread_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:05
+
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, LPad
+import django.db.models.deletion
+
+
+def backfill_paths(apps, schema_editor):
+    # Every existing comment is top level, its path is its own segment.
+    CommentModel = apps.get_model('posts', 'CommentModel')
+    CommentModel.objects.update(path=LPad(Cast('id', output_field=CharField()), 12, Value('0')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_comment_thread_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='commentmodel',
+            name='comment_thread_idx',
+        ),
+        migrations.AddField(
+            model_name='commentmodel',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='commentmodel',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.commentmodel'),
+        ),
+        migrations.AddField(
+            model_name='commentmodel',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='commentmodel',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='commentmodel',
+            index=models.Index(fields=['post', 'depth', '-fixed', 'post_date', 'id'], name='comment_thread_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 
-from users.models import CustomUser
+from users.models import CustomUser, CounterFieldsMixin
 
 
-class PostModel(models.Model):
+class PostModel(CounterFieldsMixin, models.Model):
 
     user = models.ForeignKey(to=CustomUser, on_delete=models.CASCADE, related_name='posts', default=None, null=False, blank=False)
     likes = models.ManyToManyField(to=CustomUser, related_name='likes', default=None, blank=True)
@@ -13,25 +13,104 @@ class PostModel(models.Model):
     description = models.TextField(blank=True, null=True)
     date = models.DateTimeField(default=timezone.now)
     published = models.BooleanField(default=True)
+    version = models.PositiveIntegerField(default=1)
+    # Kept by posts.signals, reconcile_counters fixes any drift.
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    COUNTER_FIELDS = ('like_count', 'comment_count')
+
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-date', '-id'], name='post_feed_idx'),
+        ]
     
 
     def __str__(self):
         return f'{str(self.user)} - post#{self.id} - {self.date}'
+    
+
+    def save(self, *args, **kwargs):
+        # Every edit gets a new version, so cached markup of the post is not reused.
+        if self.pk:
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super(PostModel, self).save(*args, **kwargs)
+
 
+class LikeShardModel(models.Model):
+    """Part of the like count of a hot post, added to PostModel.like_count when folded."""
+    post = models.ForeignKey(to=PostModel, on_delete=models.CASCADE, related_name='like_shards')
+    shard = models.PositiveSmallIntegerField()
+    delta = models.IntegerField(default=0)
+
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'shard'], name='unique_like_shard'),
+        ]
+
+
+    def __str__(self):
+        return f'{str(self.post)} - shard#{self.shard}'
+
+
+class PostViewersModel(models.Model):
+    """HyperLogLog sketch of the users who viewed a post, kept apart so post queries don't load it."""
+    post = models.OneToOneField(to=PostModel, on_delete=models.CASCADE, primary_key=True, related_name='viewers')
+    sketch = models.BinaryField()
+    count = models.PositiveIntegerField(default=0)
+
+
+    def __str__(self):
+        return f'{str(self.post)} - {self.count} viewer(s)'
+
+
+class CommentModel(CounterFieldsMixin, models.Model):
+    # Every comment owns one fixed-width segment of `path`: its id, zero padded. The path of
+    # a reply is the path of its parent plus its own segment, so a subtree is a range of paths.
+    PATH_STEP = 12
 
-class CommentModel(models.Model):
     user = models.ForeignKey(to=CustomUser, on_delete=models.CASCADE, related_name='owner', blank=False, null=False)
     post = models.ForeignKey(to=PostModel, on_delete=models.CASCADE, related_name='comment', blank=False, null=False)
     text = models.TextField()
     likes = models.ManyToManyField(to=CustomUser, symmetrical=False, related_name='comment_likes', default=None, blank=True)
     fixed = models.BooleanField(default=False)
     post_date = models.DateTimeField(default=timezone.now)
+    like_count = models.PositiveIntegerField(default=0)
+    parent = models.ForeignKey(to='self', on_delete=models.CASCADE, related_name='replies', blank=True, null=True)
+    path = models.CharField(max_length=255, db_index=True, blank=True, default='')
+    depth = models.PositiveSmallIntegerField(default=0)
+    reply_count = models.PositiveIntegerField(default=0)
+
+    COUNTER_FIELDS = ('like_count', 'reply_count')
 
 
     class Meta:
         ordering = ['-fixed', 'post_date']
+        indexes = [
+            models.Index(fields=['post', 'depth', '-fixed', 'post_date', 'id'], name='comment_thread_idx'),
+        ]
 
 
     def __str__(self):
         return f'{str(self.user)}-{str(self.post)}'
-    
\ No newline at end of file
+
+
+    def save(self, *args, **kwargs):
+        # post_save updates the comment counter of the post, it must commit with the comment.
+        with transaction.atomic():
+            if self.parent_id and not self.path:
+                self.depth = self.parent.depth + 1
+            super(CommentModel, self).save(*args, **kwargs)
+            if not self.path:
+                # The segment is the id, known only once the row exists.
+                self.path = (self.parent.path if self.parent_id else '') + self.path_segment(self.id)
+                CommentModel.objects.filter(id=self.id).update(path=self.path)
+
+
+    @classmethod
+    def path_segment(cls, comment_id: int) -> str:
+        return str(comment_id).zfill(cls.PATH_STEP)
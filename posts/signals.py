@@ -0,0 +1,80 @@
+from collections import Counter
+
+from django.db.models import F
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from posts.models import PostModel, CommentModel
+from users.models import CustomUser
+
+from helpers.counters import apply_count_deltas, existing_likes
+from helpers.events import Kind, log_events, log_like_events
+from helpers.likers import invalidate_liker_indexes, user_id_key
+from helpers.posts import bump_comments_version
+
+
+# Like changes run inside the transaction of the M2M write, so the counters commit with it.
+@receiver(m2m_changed, sender=PostModel.likes.through)
+@receiver(m2m_changed, sender=CommentModel.likes.through)
+def count_likes(sender, instance, action: str, reverse: bool, model, pk_set: set, **kwargs):
+    # reverse=True means the change came from the user side (user.likes / user.comment_likes).
+    liked_model = model if reverse else type(instance)
+    liked_field = liked_model._meta.model_name
+    if action == 'post_add':
+        likes = [(pk, instance.id) for pk in pk_set] if reverse else [(instance.id, pk) for pk in pk_set]
+        liked, sign = True, 1
+    elif action in ('pre_remove', 'pre_clear'):
+        if reverse:
+            likes = existing_likes(sender, liked_field, user_ids=[instance.id], liked_ids=pk_set)
+        else:
+            likes = existing_likes(sender, liked_field, user_ids=pk_set, liked_ids=[instance.id])
+        liked, sign = False, -1
+    else:
+        return
+    deltas = Counter()
+    for obj_id, _ in likes:
+        deltas[obj_id] += sign
+    apply_count_deltas(liked_model, 'like_count', deltas)
+    invalidate_liker_indexes(liked_model, deltas)
+    log_like_events(liked_model, liked, likes)
+
+
+@receiver(pre_delete, sender=CustomUser)
+def discount_user_likes(sender, instance: CustomUser, **kwargs):
+    # The like rows of a deleted user go away without m2m_changed.
+    for liked_model in (PostModel, CommentModel):
+        through = liked_model.likes.through
+        likes = existing_likes(through, liked_model._meta.model_name, user_ids=[instance.id])
+        apply_count_deltas(liked_model, 'like_count', Counter({obj_id: -1 for obj_id, _ in likes}))
+        invalidate_liker_indexes(liked_model, {obj_id for obj_id, _ in likes})
+        log_like_events(liked_model, False, likes)
+
+
+@receiver(pre_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_user_id(sender, instance: CustomUser, **kwargs):
+    # The username may go to another user, its cached id must not follow it.
+    if instance.pk:
+        usernames = {instance.username, *CustomUser.objects.filter(id=instance.pk).values_list('username', flat=True)}
+        cache.delete_many([user_id_key(username) for username in usernames])
+
+
+@receiver(post_save, sender=CommentModel)
+def count_new_comment(sender, instance: CommentModel, created: bool, **kwargs):
+    if created:
+        PostModel.objects.filter(id=instance.post_id).update(comment_count=F('comment_count') + 1)
+        if instance.parent_id:
+            CommentModel.objects.filter(id=instance.parent_id).update(reply_count=F('reply_count') + 1)
+        log_events(Kind.COMMENT, [(instance.user_id, instance.post_id)])
+        bump_comments_version(instance.post_id)
+
+
+@receiver(post_delete, sender=CommentModel)
+def discount_deleted_comment(sender, instance: CommentModel, **kwargs):
+    PostModel.objects.filter(id=instance.post_id).update(comment_count=F('comment_count') - 1)
+    if instance.parent_id:
+        # A parent deleted with its subtree is already gone, the update then matches nothing.
+        CommentModel.objects.filter(id=instance.parent_id).update(reply_count=F('reply_count') - 1)
+    log_events(Kind.COMMENT_DELETE, [(instance.user_id, instance.post_id)])
+    bump_comments_version(instance.post_id)
@@ -0,0 +1,89 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from home.models import InteractionEventModel
+from posts.models import PostModel, CommentModel
+from factories import factories as f
+
+
+class TestImportComments(TestCase):
+
+    def setUp(self):
+        self.user = f.create_test_user()
+        self.liker = f.create_test_user(username='liker')
+        self.post = f.create_test_post(user=self.user)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+
+    def write(self, name, content):
+        path = self.directory / name
+        path.write_text(content, encoding='utf-8')
+        return path
+
+
+    def import_file(self, path, batch_size=2):
+        out = StringIO()
+        call_command('import_comments', str(path), batch_size=batch_size, stdout=out)
+        return out.getvalue()
+
+
+    def test_import_jsonl_creates_comments_and_likes(self):
+        """Test if a JSONL import creates the comments, their likes, paths and counts"""
+        records = [
+            {'username': self.user.username, 'post': self.post.id, 'text': f'Imported #{i}', 'likes': [self.liker.username, self.user.username]}
+            for i in range(3)
+        ]
+        path = self.write('comments.jsonl', '\n'.join(json.dumps(record) for record in records))
+        out = self.import_file(path)
+
+        self.assertIn('Imported 3 comment(s) and 6 like(s)', out)
+        self.assertIn('rows/s', out)
+        comments = CommentModel.objects.filter(post=self.post)
+        self.assertEqual(3, comments.count())
+        for comment in comments:
+            self.assertEqual(CommentModel.path_segment(comment.id), comment.path)
+            self.assertEqual(2, comment.like_count)
+            self.assertEqual(2, comment.likes.count())
+        self.assertEqual(3, PostModel.objects.get(id=self.post.id).comment_count)
+        self.assertEqual(3, InteractionEventModel.objects.filter(kind=InteractionEventModel.Kind.COMMENT).count())
+
+
+    def test_import_skips_unresolved_and_malformed_records(self):
+        """Test if records of unknown users or posts, and lines that don't parse, are skipped"""
+        lines = [
+            json.dumps({'username': self.user.username, 'post': self.post.id, 'text': 'Kept', 'likes': ['nobody']}),
+            json.dumps({'username': 'nobody', 'post': self.post.id, 'text': 'Unknown user'}),
+            json.dumps({'username': self.user.username, 'post': self.post.id + 100, 'text': 'Unknown post'}),
+            json.dumps({'username': self.user.username, 'post': self.post.id, 'text': ''}),
+            '{not json',
+        ]
+        out = self.import_file(self.write('comments.jsonl', '\n'.join(lines)))
+        self.assertIn('Imported 1 comment(s) and 0 like(s)', out)
+        self.assertIn('skipped 4 record(s)', out)
+        self.assertEqual(['Kept'], list(CommentModel.objects.values_list('text', flat=True)))
+
+
+    def test_import_csv_with_dates(self):
+        """Test if a CSV import keeps the dates and space separated likes of the records"""
+        path = self.write('comments.csv', (
+            'username,post,text,date,likes\n'
+            f'{self.user.username},{self.post.id},Old comment,2020-01-02T03:04:05,{self.liker.username}\n'
+        ))
+        self.import_file(path)
+        comment = CommentModel.objects.get(post=self.post)
+        self.assertEqual((2020, 1, 2), (comment.post_date.year, comment.post_date.month, comment.post_date.day))
+        self.assertEqual([self.liker.id], list(comment.likes.values_list('id', flat=True)))
+
+
+    def test_import_missing_file_fails(self):
+        """Test if importing a file that doesn't exist raises a CommandError"""
+        with self.assertRaises(CommandError):
+            self.import_file(self.directory / 'missing.jsonl')
@@ -0,0 +1,108 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from factories import factories as f
+from helpers.likers import LikerIndex, get_liker_index, liker_index_key, _generation_key
+from helpers.posts import check_user_like, toggle_like
+
+
+@override_settings(LIKER_BLOOM_MIN_SIZE=4)
+class TestLikerIndex(TestCase):
+
+    def test_index_membership(self):
+        """Test if the index finds every id added and none of the others"""
+        index = LikerIndex([5, 3, 9, 3])
+        self.assertEqual(list(index.ids), [3, 5, 9])
+        self.assertIsNone(index.bloom)
+        for user_id in range(1, 50, 2):
+            index.add(user_id)
+        self.assertIsNotNone(index.bloom)
+        index.discard(7)
+        members = set(range(1, 50, 2)) - {7}
+        for user_id in range(100):
+            self.assertEqual(user_id in index, user_id in members)
+
+
+@override_settings(LIKER_INDEX_MIN_LIKES=2)
+class TestLikerMembership(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = f.create_test_user()
+        self.likers = [f.create_test_user(username=f'liker{i}') for i in range(3)]
+        self.post = f.create_test_post(user=self.user)
+        self.post.likes.add(*self.likers)
+        self.post.refresh_from_db()
+
+
+    def test_check_user_like_answers_from_index(self):
+        """Test if liked checks of a post with enough likes do not touch the database once the index is built"""
+        self.assertTrue(check_user_like(self.post, self.likers[0]))
+        self.assertTrue(check_user_like(self.post, self.likers[2].username))
+        with self.assertNumQueries(0):
+            self.assertTrue(check_user_like(self.post, self.likers[1]))
+            self.assertFalse(check_user_like(self.post, self.user))
+            self.assertTrue(check_user_like(self.post, self.likers[2].username))
+
+
+    def test_toggle_like_keeps_index_in_sync(self):
+        """Test if toggles update the cached index after they commit"""
+        get_liker_index(self.post)
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_like(self.post, self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_like(self.post, self.likers[0])
+        self.assertEqual(list(get_liker_index(self.post).ids), sorted([self.user.id, self.likers[1].id, self.likers[2].id]))
+
+
+    def test_m2m_changes_drop_the_index(self):
+        """Test if likes changed through the relation make the index rebuild"""
+        get_liker_index(self.post)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.likes.remove(self.likers[0])
+        self.assertNotIn(self.likers[0].id, get_liker_index(self.post))
+
+
+    def test_build_overlapping_a_toggle_is_not_served(self):
+        """Test if an index built from likes read before a toggle committed is never read after it"""
+        stale_key = liker_index_key(self.post)
+        stale = LikerIndex(self.post.likes.values_list('id', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_like(self.post, self.user)
+        cache.set(stale_key, stale) # The late build lands after the toggle.
+        self.assertTrue(check_user_like(self.post, self.user))
+
+
+    def test_racing_updates_keep_both_changes(self):
+        """Test if an update that lost the race for a generation makes the index rebuild instead of dropping it"""
+        get_liker_index(self.post)
+        other = f.create_test_user(username='other')
+        self.post.likes.through.objects.create(postmodel=self.post, customuser=other)
+        # The update of `other` took a generation but did not write its index yet.
+        cache.incr(_generation_key(type(self.post), self.post.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_like(self.post, self.user)
+        index = get_liker_index(self.post)
+        self.assertIn(other.id, index)
+        self.assertIn(self.user.id, index)
+
+
+    def test_hot_post_is_rendered_without_like_table_queries(self):
+        """Test if the post page, the feed and the like states of a post with enough likes read the liked flag from the index"""
+        f.create_test_comment(self.user, self.post, 'Comment')
+        self.likers[0].following.add(self.user)
+        get_liker_index(self.post)
+        self.client.force_login(self.likers[0])
+        like_table = self.post.likes.through._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            post_page = self.client.get(reverse('posts:post', kwargs={'post_id': self.post.id}))
+            feed = self.client.get(reverse('users:home:feed')).json()
+            states = self.client.get(reverse('posts:like-state'), {'posts': self.post.id}).json()
+        self.assertFalse([q['sql'] for q in queries if like_table in q['sql']])
+        self.assertTrue(post_page.context['post'].user_liked)
+        self.assertTrue(feed['posts'][0]['liked'])
+        self.assertTrue(states['posts'][str(self.post.id)]['liked'])
@@ -1,9 +1,15 @@
-from django.test import TestCase
+from io import StringIO
 
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-from posts.models import PostModel,CommentModel
+
+from posts.models import PostModel, CommentModel, LikeShardModel
 from users.models import CustomUser
 from factories import factories as f
+from helpers.posts import toggle_like, annotate_post_stats, get_total_likes
 
 
 class TestPostModel(TestCase):
@@ -27,4 +33,128 @@ class TestPostModel(TestCase):
         self.assertEqual(
             str(self.post),
             f'{str(self.user)} - post#{self.post.id} - {self.post.date}'
-            )
\ No newline at end of file
+            )
+
+class TestCounters(TestCase):
+
+    def setUp(self):
+        self.user = f.create_test_user()
+        self.others = [f.create_test_user(username=f'liker{i}') for i in range(3)]
+        self.post = f.create_test_post(user=self.user)
+        self.comment = f.create_test_comment(user=self.user, post=self.post, text='Comment')
+
+
+    def counts(self):
+        self.post.refresh_from_db()
+        self.comment.refresh_from_db()
+        return self.post.like_count, self.post.comment_count, self.comment.like_count
+
+
+    def test_like_counters_follow_both_sides_of_the_relation(self):
+        """Test if like_count follows adds, removes and clears from the post and from the user side"""
+        self.post.likes.add(*self.others)
+        self.others[0].likes.add(self.post)
+        self.comment.likes.add(self.others[0])
+        self.assertEqual(self.counts(), (3, 1, 1))
+        self.post.likes.remove(self.others[0], self.user)
+        self.others[1].likes.remove(self.post)
+        self.assertEqual(self.counts(), (1, 1, 1))
+        self.others[0].comment_likes.clear()
+        self.post.likes.clear()
+        self.assertEqual(self.counts(), (0, 1, 0))
+
+
+    def test_comment_counter_follows_creates_and_deletes(self):
+        """Test if comment_count is updated when comments are created and deleted"""
+        f.create_test_comment(user=self.others[0], post=self.post, text='Another')
+        self.assertEqual(self.counts()[1], 2)
+        CommentModel.objects.filter(post=self.post).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+
+    def test_deleted_user_likes_are_discounted(self):
+        """Test if the likes of a deleted user are taken out of the counters"""
+        self.post.likes.add(self.others[0])
+        self.comment.likes.add(self.others[0])
+        self.others[0].delete()
+        self.assertEqual(self.counts(), (0, 1, 0))
+
+
+    def test_save_keeps_counts_changed_since_read(self):
+        """Test if saving a post or comment read before a like does not write back the old counters"""
+        post = PostModel.objects.get(id=self.post.id)
+        comment = CommentModel.objects.get(id=self.comment.id)
+        self.post.likes.add(self.others[0])
+        self.comment.likes.add(self.others[0])
+        f.create_test_comment(user=self.others[0], post=self.post, text='Another')
+        post.description = 'Edited'
+        post.save()
+        comment.text = 'Edited'
+        comment.save()
+        self.assertEqual(self.counts(), (1, 2, 1))
+        self.assertEqual(('Edited', 'Edited'), (self.post.description, self.comment.text))
+
+
+    def test_reconcile_counters_fixes_drift(self):
+        """Test if reconcile_counters recounts the counters that drifted"""
+        self.post.likes.add(*self.others)
+        PostModel.objects.filter(id=self.post.id).update(like_count=10, comment_count=0)
+        CommentModel.objects.filter(id=self.comment.id).update(like_count=5)
+        out = StringIO()
+        call_command('reconcile_counters', batch_size=1, stdout=out)
+        self.assertEqual(self.counts(), (3, 1, 0))
+        self.assertIn('1 post(s), 1 comment(s) and 0 user(s)', out.getvalue())
+
+
+@override_settings(HOT_POST_WRITES_PER_MINUTE=3, LIKE_COUNTER_SHARDS=4)
+class TestShardedCounters(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Hot flags and cached totals would leak into tests that reuse the post ids.
+        self.addCleanup(cache.clear)
+        self.user = f.create_test_user()
+        self.likers = [f.create_test_user(username=f'liker{i}') for i in range(10)]
+        self.post = f.create_test_post(user=self.user)
+
+
+    def test_hot_post_counts_likes_in_shards(self):
+        """Test if likes past the write rate threshold go to shards and reads still see them"""
+        counts = [toggle_like(self.post, liker)[1] for liker in self.likers]
+        self.assertEqual(counts, list(range(1, 11)))
+        self.assertTrue(LikeShardModel.objects.filter(post=self.post).exists())
+        self.post.refresh_from_db()
+        self.assertLess(self.post.like_count, 10)
+        self.assertEqual(get_total_likes(self.post), 10)
+        self.assertEqual(annotate_post_stats(PostModel.objects.all(), self.user).get(id=self.post.id).likes_qty, 10)
+
+
+    def test_profile_counts_likes_in_shards(self):
+        """Test if the profile grid shows the likes of a hot post that are still in shards"""
+        LikeShardModel.objects.create(post=self.post, shard=0, delta=1)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('users:profile', kwargs={'username': self.user.username}))
+        self.assertEqual([1], [post['likes'] for post in response.context['posts']])
+
+
+    def test_fold_like_shards_moves_shards_to_the_post(self):
+        """Test if fold_like_shards adds the shards to like_count and deletes them"""
+        for liker in self.likers:
+            toggle_like(self.post, liker)
+        toggle_like(self.post, self.likers[0])
+        out = StringIO()
+        call_command('fold_like_shards', stdout=out)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 9)
+        self.assertFalse(LikeShardModel.objects.exists())
+        self.assertIn('1 post(s)', out.getvalue())
+
+
+    def test_cold_post_does_not_use_shards(self):
+        """Test if posts under the write rate threshold keep counting in like_count"""
+        toggle_like(self.post, self.likers[0])
+        toggle_like(self.post, self.likers[1])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 2)
+        self.assertFalse(LikeShardModel.objects.exists())
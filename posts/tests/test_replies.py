@@ -0,0 +1,146 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import CommentModel
+from factories import factories as f
+from helpers.comments import get_replies_page, get_thread_page
+
+
+class TestReplies(TestCase):
+
+    def setUp(self):
+        self.user = f.create_test_user()
+        self.post = f.create_test_post(user=self.user)
+        self.client.login(username=f.STD_TEST_USERNAME, password=f.STD_TEST_PASSWORD)
+
+
+    def reply(self, parent, text='Reply'):
+        return CommentModel.objects.create(user=self.user, post=self.post, text=text, parent=parent)
+
+
+    def test_reply_path_extends_parent_path(self):
+        """Test if a reply gets the path of its parent plus its own segment, one level deeper"""
+        comment = f.create_test_comment(self.user, self.post)
+        reply = self.reply(comment)
+        nested = self.reply(reply)
+        self.assertEqual(CommentModel.path_segment(comment.id), comment.path)
+        self.assertEqual(reply.path + CommentModel.path_segment(nested.id), nested.path)
+        self.assertEqual((0, 1, 2), (comment.depth, reply.depth, nested.depth))
+        self.assertEqual(nested.path, CommentModel.objects.get(id=nested.id).path)
+
+
+    def test_reply_counts_are_kept_on_the_parent(self):
+        """Test if creating and deleting replies updates the reply count of their parent only"""
+        comment = f.create_test_comment(self.user, self.post)
+        reply = self.reply(comment)
+        self.reply(comment)
+        self.reply(reply)
+        self.assertEqual(2, CommentModel.objects.get(id=comment.id).reply_count)
+        self.assertEqual(1, CommentModel.objects.get(id=reply.id).reply_count)
+        reply.delete()
+        self.assertEqual(1, CommentModel.objects.get(id=comment.id).reply_count)
+
+
+    def test_reconcile_counters_fixes_reply_counts(self):
+        """Test if reconcile_counters recounts the reply count of comments"""
+        comment = f.create_test_comment(self.user, self.post)
+        self.reply(comment)
+        CommentModel.objects.filter(id=comment.id).update(reply_count=5)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(1, CommentModel.objects.get(id=comment.id).reply_count)
+
+
+    def test_subtree_comes_in_one_query(self):
+        """Test if the whole subtree of a comment is read in one query, depth first, plus one for the liked flags"""
+        comment = f.create_test_comment(self.user, self.post)
+        other = f.create_test_comment(self.user, self.post)
+        first = self.reply(comment)
+        nested = self.reply(first)
+        second = self.reply(comment)
+        self.reply(other)
+        with CaptureQueriesContext(connection) as queries:
+            replies, next_cursor = get_replies_page(comment, self.user)
+        self.assertEqual(2, len(queries))
+        self.assertEqual([first.id, nested.id, second.id], [r.id for r in replies])
+        self.assertIsNone(next_cursor)
+
+
+    def test_replies_page_by_cursor(self):
+        """Test if following the cursors lists the whole subtree once"""
+        comment = f.create_test_comment(self.user, self.post)
+        replies = [self.reply(comment, f'Reply#{i}') for i in range(5)]
+        seen, cursor = [], None
+        while True:
+            page, cursor = get_replies_page(comment, self.user, cursor, page_size=2)
+            seen += [r.id for r in page]
+            if cursor is None:
+                break
+        self.assertEqual([r.id for r in replies], seen)
+
+
+    @override_settings(COMMENT_REPLY_PREVIEWS=2)
+    def test_thread_page_has_first_replies_of_each_comment(self):
+        """Test if a thread page lists top-level comments only, each with its first replies"""
+        comments = [f.create_test_comment(self.user, self.post, f'Comment#{i}') for i in range(2)]
+        replies = [self.reply(comments[0], f'Reply#{i}') for i in range(3)]
+        other_reply = self.reply(comments[1])
+        page, _ = get_thread_page(self.post.id, self.user)
+        self.assertEqual([c.id for c in comments], [c.id for c in page])
+        self.assertEqual([r.id for r in replies[:2]], [r.id for r in page[0].reply_preview])
+        self.assertEqual([other_reply.id], [r.id for r in page[1].reply_preview])
+
+
+    @override_settings(COMMENT_REPLY_PREVIEWS=2)
+    def test_previews_only_hold_direct_replies(self):
+        """Test if the previews of a comment skip nested replies, which its reply count leaves out"""
+        comment = f.create_test_comment(self.user, self.post)
+        first = self.reply(comment)
+        self.reply(first)
+        second = self.reply(comment)
+        page, _ = get_thread_page(self.post.id, self.user)
+        self.assertEqual([first.id, second.id], [r.id for r in page[0].reply_preview])
+        self.assertEqual(2, page[0].reply_count)
+
+
+    @override_settings(COMMENT_MAX_DEPTH=1)
+    def test_replies_past_max_depth_go_to_the_deepest_allowed(self):
+        """Test if replying past COMMENT_MAX_DEPTH adds the reply to the deepest ancestor allowed"""
+        comment = f.create_test_comment(self.user, self.post)
+        reply = self.reply(comment)
+        response = self.client.post(
+            reverse('posts:post', kwargs={'post_id': self.post.id}),
+            data=json.dumps({'text': 'Deep reply', 'parent': reply.id}),
+            content_type='application/json',
+        ).json()
+        self.assertEqual(comment.id, response['comment']['parent'])
+        self.assertEqual(1, response['comment']['depth'])
+
+
+    def test_replies_endpoint_lists_the_subtree(self):
+        """Test if the replies endpoint returns the replies of a comment of the post"""
+        comment = f.create_test_comment(self.user, self.post)
+        reply = self.reply(comment)
+        url = reverse('posts:comment-replies', kwargs={'post_id': self.post.id, 'comment_id': comment.id})
+        data = self.client.get(url).json()
+        self.assertEqual([reply.id], [r['id'] for r in data['replies']])
+        other_post = f.create_test_post(user=self.user)
+        url = reverse('posts:comment-replies', kwargs={'post_id': other_post.id, 'comment_id': comment.id})
+        self.assertEqual(404, self.client.get(url).status_code)
+
+
+    @override_settings(COMMENT_REPLY_PREVIEWS=1)
+    def test_post_view_renders_reply_previews(self):
+        """Test if the post modal shows the first replies and a link to the others"""
+        comment = f.create_test_comment(self.user, self.post)
+        self.reply(comment, 'First reply')
+        self.reply(comment, 'Second reply')
+        response = self.client.get(reverse('posts:post', kwargs={'post_id': self.post.id}))
+        self.assertContains(response, 'First reply')
+        self.assertNotContains(response, 'Second reply')
+        self.assertContains(response, 'Ver respostas (2)')
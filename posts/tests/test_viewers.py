@@ -0,0 +1,94 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import PostViewersModel
+from factories import factories as f
+from helpers.hll import HyperLogLog
+from helpers.viewers import record_post_view, get_unique_viewers, merge_post_viewers, get_worker_slot, viewers_key
+
+
+class TestHyperLogLog(TestCase):
+
+    def test_count_is_close_to_distinct_items(self):
+        """Test if the estimate stays within a few percent of the distinct count, repeats included"""
+        sketch = HyperLogLog()
+        for i in range(50000):
+            sketch.add(i % 20000)
+        self.assertEqual(len(sketch.to_bytes()), 4096)
+        self.assertAlmostEqual(sketch.count(), 20000, delta=20000 * 0.05)
+
+
+    def test_small_counts_are_exact_enough(self):
+        """Test if small sets are counted almost exactly"""
+        sketch = HyperLogLog()
+        for i in range(10):
+            sketch.add(i)
+        self.assertEqual(sketch.count(), 10)
+
+
+    def test_merge_counts_the_union(self):
+        """Test if merging two sketches estimates the size of the union"""
+        first, second = HyperLogLog(), HyperLogLog()
+        for i in range(3000):
+            first.add(i)
+            second.add(i + 1500)
+        first.merge(second)
+        self.assertAlmostEqual(first.count(), 4500, delta=4500 * 0.05)
+        self.assertEqual(HyperLogLog.from_bytes(first.to_bytes()).count(), first.count())
+
+
+class TestPostViewers(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = f.create_test_user()
+        self.post = f.create_test_post(user=self.user)
+
+
+    def test_post_view_counts_unique_viewers(self):
+        """Test if opening a post counts each user once"""
+        viewers = [f.create_test_user(username=f'viewer{i}') for i in range(3)]
+        for viewer in [*viewers, viewers[0], self.user]:
+            self.client.force_login(viewer)
+            response = self.client.get(reverse('posts:post', kwargs={'post_id': self.post.id}))
+        self.assertEqual(response.context['viewers'], 4)
+        self.assertEqual(get_unique_viewers(self.post), 4)
+
+
+    def test_views_are_merged_into_the_database(self):
+        """Test if the cached sketch is merged into the post viewers row and survives the cache"""
+        for viewer_id in range(100):
+            record_post_view(self.post, viewer_id)
+        merge_post_viewers([self.post.id])
+        cache.clear()
+        self.assertAlmostEqual(get_unique_viewers(self.post), 100, delta=5)
+        for viewer_id in range(50, 150):
+            record_post_view(self.post, viewer_id)
+        out = StringIO()
+        call_command('merge_post_viewers', stdout=out)
+        self.assertIn('1 post(s)', out.getvalue())
+        self.assertAlmostEqual(PostViewersModel.objects.get(post=self.post).count, 150, delta=8)
+
+
+    def test_processes_keep_their_own_sketches(self):
+        """Test if processes sharing the cache write their own sketches, so none overwrites the views of another"""
+        with mock.patch.multiple('helpers.viewers', _WORKER='first', _slot=None, _slot_renewed=0.0):
+            for viewer_id in range(100):
+                record_post_view(self.post, viewer_id)
+            first_slot = get_worker_slot()
+        with mock.patch.multiple('helpers.viewers', _WORKER='second', _slot=None, _slot_renewed=0.0):
+            for viewer_id in range(100, 200):
+                record_post_view(self.post, viewer_id)
+            second_slot = get_worker_slot()
+        self.assertNotEqual(first_slot, second_slot)
+        self.assertIsNotNone(cache.get(viewers_key(self.post.id, first_slot)))
+        self.assertIsNotNone(cache.get(viewers_key(self.post.id, second_slot)))
+        self.assertAlmostEqual(get_unique_viewers(self.post), 200, delta=10)
+        merge_post_viewers([self.post.id])
+        self.assertAlmostEqual(PostViewersModel.objects.get(post=self.post).count, 200, delta=10)
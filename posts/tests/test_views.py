@@ -1,13 +1,19 @@
 import json
+from unittest import mock
 
-from django.test import TestCase
+from django.db import connection
+from django.http import Http404
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import PostModel, CommentModel
 from users.models import CustomUser
 
 from factories import factories as f
-from helpers.posts import get_total_likes, get_total_comments
+from helpers.comments import CommentRow, get_thread_page
+from helpers.posts import get_total_likes, get_total_comments, toggle_like
+from posts.views import post_async, post_likes_async
 
 
 class PostViewsBase(TestCase):
@@ -111,6 +117,26 @@ class PostViewTest(PostViewsBase):
         self.assertEqual(len(comments), len(response.context['comments']))
 
 
+    def test_post_view_queries_do_not_grow_with_comments(self):
+        """
+        Test if the post view renders comments with their likes and like state without
+        one query per comment.
+        """
+        test_post = self.posts[0]
+        f.create_test_comment(self.user, test_post, 'First comment')
+        url = reverse('posts:post', kwargs={'post_id': test_post.id})
+        with CaptureQueriesContext(connection) as one_comment:
+            self.client.get(url)
+
+        for i in range(5):
+            comment = f.create_test_comment(self.user, test_post, f'Comment#{i}')
+            comment.likes.add(self.user)
+        with CaptureQueriesContext(connection) as many_comments:
+            response = self.client.get(url)
+        self.assertEqual(len(one_comment), len(many_comments))
+        self.assertEqual(5, sum(c.user_liked for c in response.context['comments']))
+
+
     def test_post_view_add_new_comment(self):
         """
         Test the functionality of comment in a post.
@@ -125,6 +151,38 @@ class PostViewTest(PostViewsBase):
         self.assertEqual(1, get_total_comments(test_post))
 
 
+    def test_new_comment_response_has_only_the_new_comment(self):
+        """
+        Test if commenting returns just the new comment and the thread versions around it.
+        """
+        test_post = self.posts[0]
+        url = reverse('posts:post', kwargs={'post_id': test_post.id})
+        version = self.client.get(url).context['comments_version']
+        response = self.client.post(url, data=json.dumps({'text': 'Test comment'}), content_type="application/json").json()
+        self.assertEqual('Test comment', response['comment']['text'])
+        self.assertEqual(self.user.username, response['comment']['username'])
+        self.assertNotIn('comments', response)
+        self.assertEqual(version, response['previous_version'])
+        self.assertNotEqual(version, response['version'])
+        self.assertEqual(response['version'], self.client.get(url).context['comments_version'])
+
+
+    def test_new_comment_queries_do_not_grow_with_comments(self):
+        """
+        Test if adding a comment costs the same queries however many comments the post has.
+        """
+        test_post = self.posts[0]
+        url = reverse('posts:post', kwargs={'post_id': test_post.id})
+        data = json.dumps({'text': 'Test comment'})
+        with CaptureQueriesContext(connection) as first:
+            self.client.post(url, data=data, content_type="application/json")
+        for i in range(5):
+            f.create_test_comment(self.user, test_post, f'Comment#{i}')
+        with CaptureQueriesContext(connection) as later:
+            self.client.post(url, data=data, content_type="application/json")
+        self.assertEqual(len(first), len(later))
+
+
     def test_post_view_raise_error_if_missing_tag(self):
         """
         Test if the post view raises a ValueError when the tag 'text' isn't passed in 
@@ -248,6 +306,327 @@ class PostLikesViewTest(PostViewsBase):
         )
 
 
+class LikersPageTest(PostViewsBase):
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.posts[0]
+        self.likers = [f.create_test_user(username=f'liker{i}') for i in range(5)]
+        self.post.likes.add(*self.likers)
+        self.url = reverse('posts:likes', kwargs={'post_id': self.post.id})
+
+
+    @override_settings(LIKERS_PAGE_SIZE=2)
+    def test_likers_are_paginated_by_cursor(self):
+        """
+        Test if following the cursors lists every liker once, a page at a time.
+        """
+        seen, cursor = [], None
+        for _ in range(3):
+            response = self.client.get(self.url, {'cursor': cursor} if cursor else {})
+            page = [u.id for u, _ in response.context['user_list']]
+            self.assertLessEqual(len(page), 2)
+            seen += page
+            cursor = response.context['next_cursor']
+        self.assertIsNone(cursor)
+        self.assertEqual(sorted(u.id for u in self.likers), seen)
+
+
+    @override_settings(LIKERS_PAGE_SIZE=2)
+    def test_likers_page_shows_the_next_page_link(self):
+        """
+        Test if a page with more likers after it links to the next page.
+        """
+        response = self.client.get(self.url)
+        self.assertContains(response, f'?cursor={response.context["next_cursor"]}')
+
+
+    def test_likers_page_flags_followed_users(self):
+        """
+        Test if each liker comes with whether the viewer follows them.
+        """
+        self.user.following.add(self.likers[1])
+        response = self.client.get(self.url)
+        flags = {u.id: following for u, following in response.context['user_list']}
+        self.assertEqual({u.id: u == self.likers[1] for u in self.likers}, flags)
+
+
+    @override_settings(LIKERS_PAGE_SIZE=2)
+    def test_likers_page_queries_do_not_grow_with_likes(self):
+        """
+        Test if a page of likers costs the same queries however many likes the post has.
+        """
+        small_post = self.posts[1]
+        small_post.likes.add(*self.likers[:2])
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('posts:likes', kwargs={'post_id': small_post.id}))
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(self.url)
+        self.assertEqual(len(small), len(large))
+
+
+    def test_likers_page_rejects_invalid_cursor(self):
+        """
+        Test if the likes views answer a bad request to an invalid cursor.
+        """
+        self.assertEqual(400, self.client.get(self.url, {'cursor': 'abc'}).status_code)
+        comment = f.create_test_comment(user=self.user, post=self.post)
+        url = reverse('posts:comments', kwargs={'obj_id': comment.id})
+        self.assertEqual(400, self.client.get(url, {'cursor': 'abc'}).status_code)
+
+
+@override_settings(COMMENTS_PAGE_SIZE=2)
+class CommentThreadTest(PostViewsBase):
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.posts[0]
+        self.comments = [f.create_test_comment(self.user, self.post, f'Comment#{i}') for i in range(5)]
+        self.pinned = self.comments[3]
+        self.pinned.fixed = True
+        self.pinned.save()
+        # Pinned comments come first, then the others oldest first.
+        self.thread = [self.pinned.id] + [c.id for c in self.comments if c != self.pinned]
+        self.url = reverse('posts:post-comments', kwargs={'post_id': self.post.id})
+
+
+    def test_post_view_shows_the_first_page_of_comments(self):
+        """
+        Test if the post view renders only the first page of the thread, pinned comments first.
+        """
+        response = self.client.get(reverse('posts:post', kwargs={'post_id': self.post.id}))
+        self.assertEqual(self.thread[:2], [c.id for c in response.context['comments']])
+        self.assertContains(response, response.context['comments_cursor'])
+
+
+    def test_thread_endpoint_pages_through_the_comments(self):
+        """
+        Test if following the cursors of the thread endpoint lists every comment once, in thread order.
+        """
+        cursor = self.client.get(reverse('posts:post', kwargs={'post_id': self.post.id})).context['comments_cursor']
+        seen = self.thread[:2]
+        while cursor:
+            data = self.client.get(self.url, {'cursor': cursor}).json()
+            seen += [c['id'] for c in data['comments']]
+            cursor = data['next_cursor']
+        self.assertEqual(self.thread, seen)
+
+
+    def test_thread_endpoint_serializes_comment_stats(self):
+        """
+        Test if the thread endpoint returns the author, likes and like state of each comment.
+        """
+        self.pinned.likes.add(self.user)
+        comment = self.client.get(self.url).json()['comments'][0]
+        self.assertEqual(self.pinned.id, comment['id'])
+        self.assertEqual(self.user.username, comment['username'])
+        self.assertEqual(1, comment['likes_qty'])
+        self.assertTrue(comment['liked'])
+
+
+    def test_thread_is_read_as_rows_with_their_authors(self):
+        """
+        Test if a thread page comes as slotted rows with their authors, in the same queries for any page size.
+        """
+        with CaptureQueriesContext(connection) as small:
+            get_thread_page(self.post.id, self.user, page_size=1)
+        with CaptureQueriesContext(connection) as large:
+            comments, _ = get_thread_page(self.post.id, self.user, page_size=5)
+        self.assertEqual(len(small), len(large))
+        self.assertIsInstance(comments[0], CommentRow)
+        self.assertFalse(hasattr(comments[0], '__dict__'))
+        self.assertEqual(self.user.username, comments[0].user.username)
+        self.assertEqual(str(self.user.profile_picture), comments[0].user.profile_picture)
+
+
+    def test_thread_endpoint_rejects_invalid_cursor(self):
+        """
+        Test if the thread endpoint answers a bad request to an invalid cursor.
+        """
+        self.assertEqual(400, self.client.get(self.url, {'cursor': 'not a cursor'}).status_code)
+
+
+    def test_thread_endpoint_hides_unpublished_post(self):
+        """
+        Test if the thread endpoint returns 404 for unpublished posts.
+        """
+        self.post.published = False
+        self.post.save()
+        self.assertEqual(404, self.client.get(self.url).status_code)
+
+
+class ToggleLikeTest(PostViewsBase):
+
+    def test_toggle_like_returns_flag_and_count(self):
+        """
+        Test if toggle_like flips the like and returns the new count with it.
+        """
+        other = f.create_test_user(username='other')
+        test_post = self.posts[0]
+        test_post.likes.add(other)
+        self.assertEqual(toggle_like(test_post, self.user), (True, 2))
+        self.assertEqual(toggle_like(test_post, self.user), (False, 1))
+        self.assertEqual(get_total_likes(test_post), 1)
+        self.assertFalse(test_post.likes.filter(id=self.user.id).exists())
+
+
+    def test_toggle_like_works_for_comments(self):
+        """
+        Test if toggle_like also toggles comment likes.
+        """
+        comment = f.create_test_comment(user=self.user, post=self.posts[0], text='Comment')
+        self.assertEqual(toggle_like(comment, self.user), (True, 1))
+        self.assertEqual(toggle_like(comment, self.user), (False, 0))
+
+
+    def test_toggle_like_does_not_count_a_concurrent_like_twice(self):
+        """
+        Test if a toggle that loses the race to insert the like keeps the count unchanged.
+        """
+        test_post = self.posts[0]
+        toggle_like(test_post, self.user)
+        # The like row shows up between the DELETE and the INSERT of this toggle.
+        with mock.patch('django.db.models.query.QuerySet.delete', return_value=(0, {})):
+            self.assertEqual(toggle_like(test_post, self.user), (True, 1))
+        self.assertEqual(get_total_likes(test_post), 1)
+
+
+    def test_like_post_view_does_not_read_or_count_likes(self):
+        """
+        Test if liking and disliking through the view neither check the like row first nor count the likes.
+        """
+        url = reverse('posts:likes', kwargs={'post_id': self.posts[0].id})
+        self.client.post(url)
+        with CaptureQueriesContext(connection) as dislike:
+            self.client.post(url)
+        with CaptureQueriesContext(connection) as like:
+            self.client.post(url)
+        for queries in (like, dislike):
+            sqls = [query['sql'] for query in queries.captured_queries]
+            self.assertFalse([sql for sql in sqls if sql.startswith('SELECT') and 'postmodel_likes' in sql])
+            self.assertFalse([sql for sql in sqls if 'COUNT(' in sql])
+
+
+class LikeStateViewTest(PostViewsBase):
+
+    def setUp(self):
+        super().setUp()
+        self.other = f.create_test_user(username='other')
+        self.comments = [f.create_test_comment(user=self.other, post=self.posts[0], text=f'Comment#{i}') for i in range(2)]
+        self.posts[0].likes.add(self.user, self.other)
+        self.posts[1].likes.add(self.other)
+        self.comments[1].likes.add(self.user)
+
+
+    def test_like_state_view_returns_flags_and_counts(self):
+        """
+        Test if the like state view returns the viewer liked flag and the count of every object.
+        """
+        response = self.client.get(reverse('posts:like-state'), {
+            'posts': ','.join(str(post.id) for post in self.posts),
+            'comments': ','.join(str(comment.id) for comment in self.comments),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'posts': {
+                str(self.posts[0].id): {'liked': True, 'qty': 2},
+                str(self.posts[1].id): {'liked': False, 'qty': 1},
+                str(self.posts[2].id): {'liked': False, 'qty': 0},
+            },
+            'comments': {
+                str(self.comments[0].id): {'liked': False, 'qty': 0},
+                str(self.comments[1].id): {'liked': True, 'qty': 1},
+            },
+        })
+
+
+    def test_like_state_view_uses_one_query_per_kind(self):
+        """
+        Test if the like state view runs the same queries for few and for many objects.
+        """
+        url = reverse('posts:like-state')
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url, {'posts': str(self.posts[0].id), 'comments': str(self.comments[0].id)})
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url, {
+                'posts': ','.join(str(post.id) for post in self.posts),
+                'comments': ','.join(str(comment.id) for comment in self.comments),
+            })
+        self.assertEqual(len(few), len(many))
+
+
+    def test_like_state_view_leaves_out_unpublished_posts(self):
+        """
+        Test if the like state view does not return unpublished posts or their comments.
+        """
+        self.posts[0].published = False
+        self.posts[0].save()
+        response = self.client.get(reverse('posts:like-state'), {
+            'posts': str(self.posts[0].id),
+            'comments': str(self.comments[0].id),
+        })
+        self.assertEqual(response.json(), {'posts': {}, 'comments': {}})
+
+
+    def test_like_state_view_rejects_invalid_ids(self):
+        """
+        Test if the like state view answers 400 for malformed or too many ids.
+        """
+        url = reverse('posts:like-state')
+        self.assertEqual(self.client.get(url, {'posts': '1,a'}).status_code, 400)
+        with self.settings(LIKE_STATE_MAX_IDS=2):
+            self.assertEqual(self.client.get(url, {'comments': '1,2,3'}).status_code, 400)
+
+
+class AsyncPostViewsTest(PostViewsBase):
+
+    def setUp(self):
+        super().setUp()
+        self.factory = AsyncRequestFactory()
+        self.other = f.create_test_user(username='other')
+        self.post = self.posts[0]
+        self.post.likes.add(self.user, self.other)
+        self.comments = [f.create_test_comment(user=self.other, post=self.post, text=f'Comment#{i}') for i in range(3)]
+
+
+    async def test_async_post_view_shows_post_and_comments(self):
+        """
+        Test if the async post view renders the post, its likes and its comments.
+        """
+        request = self.factory.get(reverse('posts:post', kwargs={'post_id': self.post.id}))
+        request.user = self.user
+        response = await post_async(request, self.post.id)
+        self.assertEqual(response.status_code, 200)
+        page = response.content.decode()
+        self.assertIn(self.post.description, page)
+        for comment in self.comments:
+            self.assertIn(comment.text, page)
+
+
+    async def test_async_post_view_hides_unpublished_post(self):
+        """
+        Test if the async post view raises a 404 for unpublished posts.
+        """
+        self.post.published = False
+        await self.post.asave()
+        request = self.factory.get(reverse('posts:post', kwargs={'post_id': self.post.id}))
+        request.user = self.user
+        with self.assertRaises(Http404):
+            await post_async(request, self.post.id)
+
+
+    async def test_async_post_likes_view_lists_likers(self):
+        """
+        Test if the async post likes view lists every liker with the viewer relationship.
+        """
+        await self.user.following.aadd(self.other)
+        request = self.factory.get(reverse('posts:likes', kwargs={'post_id': self.post.id}))
+        request.user = self.user
+        response = await post_likes_async(request, self.post.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.other.username, response.content.decode())
+
+
 class CommentLikesViewTest(PostViewsBase):
 
     def test_comment_like_view_like_comment(self):
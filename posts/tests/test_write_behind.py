@@ -0,0 +1,165 @@
+import fcntl
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import PostModel, CommentModel, LikeShardModel
+from factories import factories as f
+from helpers.posts import toggle_like, get_likes_qty, is_liked_by, get_total_likes
+from helpers.write_behind import LikeBuffer
+
+
+CRASHED_PID = 2 ** 22 + 1 # Above pid_max, never the pid of this process.
+
+
+class TestLikeBuffer(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name) / 'likes.journal'
+        self.buffer = LikeBuffer(self.path)
+        self.addCleanup(lambda: self.buffer and self.buffer.stop())
+        self.user = f.create_test_user()
+        self.others = [f.create_test_user(username=f'liker{i}') for i in range(3)]
+        self.post = f.create_test_post(user=self.user)
+
+
+    def test_buffer_collapses_like_unlike_pairs(self):
+        """Test if only the last state of each like is written"""
+        for _ in range(4):
+            self.buffer.toggle(self.post, self.others[0])
+        self.assertEqual(self.buffer.toggle(self.post, self.others[1]), (True, 1))
+        self.assertEqual(get_total_likes(self.post), 0)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(self.post.likes.values_list('id', flat=True)), [self.others[1].id])
+        self.assertEqual(get_total_likes(self.post), 1)
+
+
+    def test_buffer_count_includes_like_shards(self):
+        """Test if the count a buffered toggle returns includes the likes of a hot post still in shards"""
+        self.post.likes.add(self.others[0])
+        PostModel.objects.filter(id=self.post.id).update(like_count=0)
+        LikeShardModel.objects.create(post=self.post, shard=0, delta=1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.buffer.toggle(self.post, self.others[1]), (True, 2))
+
+
+    def test_buffer_unlikes_existing_like(self):
+        """Test if a buffered unlike removes a like that was already written"""
+        self.post.likes.add(self.others[0])
+        self.post.refresh_from_db()
+        self.assertEqual(self.buffer.toggle(self.post, self.others[0]), (False, 0))
+        self.buffer.flush()
+        self.assertFalse(self.post.likes.exists())
+        self.assertEqual(get_total_likes(self.post), 0)
+
+
+    def test_reads_see_pending_likes(self):
+        """Test if the liked flag and count include the likes still in the buffer"""
+        with override_settings(LIKES_WRITE_BEHIND=True), \
+                mock.patch('helpers.posts.get_like_buffer', return_value=self.buffer):
+            self.assertEqual(toggle_like(self.post, self.others[0]), (True, 1))
+            self.assertTrue(is_liked_by(self.post, self.others[0].username))
+            self.assertFalse(is_liked_by(self.post, self.others[1].username))
+            self.assertEqual(get_likes_qty(self.post), 1)
+
+
+    def test_feed_records_see_pending_likes(self):
+        """Test if the feed endpoint shows the likes still in the buffer, as the like state endpoint does"""
+        self.others[0].following.add(self.user)
+        self.client.force_login(self.others[0])
+        with override_settings(LIKES_WRITE_BEHIND=True), \
+                mock.patch('helpers.posts.get_like_buffer', return_value=self.buffer):
+            toggle_like(self.post, self.others[0])
+            feed = self.client.get(reverse('users:home:feed'), {'fields': 'id,likes,liked'}).json()
+            state = self.client.get(reverse('posts:like-state'), {'posts': self.post.id}).json()
+        self.assertEqual([{'id': self.post.id, 'likes': 1, 'liked': True}], feed['posts'])
+        self.assertEqual({'liked': True, 'qty': 1}, state['posts'][str(self.post.id)])
+
+
+    def _write_journal(self, pid, *likes):
+        journal = self.path.with_name(f'likes.journal.{pid}')
+        with open(journal, 'a', encoding='utf-8') as file:
+            for user, liked in likes:
+                file.write(json.dumps({'m': 'posts.postmodel', 'o': self.post.id, 'u': user.id, 'l': liked}) + '\n')
+        return journal
+
+
+    def test_comment_records_see_pending_likes(self):
+        """Test if the thread and replies endpoints show the comment likes still in the buffer"""
+        comment = f.create_test_comment(self.user, self.post)
+        reply = CommentModel.objects.create(user=self.user, post=self.post, text='Reply', parent=comment)
+        self.client.force_login(self.others[0])
+        with override_settings(LIKES_WRITE_BEHIND=True), \
+                mock.patch('helpers.posts.get_like_buffer', return_value=self.buffer):
+            toggle_like(comment, self.others[0])
+            toggle_like(reply, self.others[0])
+            thread = self.client.get(reverse('posts:post-comments', kwargs={'post_id': self.post.id})).json()
+            replies = self.client.get(reverse(
+                'posts:comment-replies', kwargs={'post_id': self.post.id, 'comment_id': comment.id},
+            )).json()
+        record = thread['comments'][0]
+        self.assertEqual((True, 1), (record['liked'], record['likes_qty']))
+        self.assertEqual((True, 1), (record['replies'][0]['liked'], record['replies'][0]['likes_qty']))
+        self.assertEqual((True, 1), (replies['replies'][0]['liked'], replies['replies'][0]['likes_qty']))
+
+
+    def test_buffer_replays_journal_of_crashed_process(self):
+        """Test if likes left in the journal of a dead process are written when a buffer starts"""
+        journal = self._write_journal(CRASHED_PID, (self.others[0], True), (self.others[1], True), (self.others[1], False))
+        with open(journal, 'a', encoding='utf-8') as file:
+            file.write('{"m": "posts.postmod') # Torn write.
+        restarted = self._restart()
+        self.assertEqual(list(self.post.likes.values_list('id', flat=True)), [self.others[0].id])
+        self.assertEqual(get_total_likes(self.post), 1)
+        self.assertEqual(list(Path(self.directory.name).glob(f'likes.journal.{CRASHED_PID}*')), [])
+        self.assertTrue(restarted.journal_path.exists())
+
+
+    def test_buffer_leaves_journal_of_live_process(self):
+        """Test if the journal of a process that still holds its lock is not replayed"""
+        journal = self._write_journal(CRASHED_PID, (self.others[0], True))
+        with open(self.path.with_name(f'likes.journal.{CRASHED_PID}.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._restart()
+        self.assertTrue(journal.exists())
+        self.assertFalse(self.post.likes.exists())
+
+
+    def test_buffer_refuses_a_journal_in_use(self):
+        """Test if a second buffer of the same process does not share its journal"""
+        with self.assertRaises(RuntimeError):
+            LikeBuffer(self.path)
+
+
+    def test_failed_flush_keeps_later_toggles(self):
+        """Test if a failed flush is retried without undoing the toggles made since"""
+        self.buffer.toggle(self.post, self.others[0])
+        with mock.patch('helpers.write_behind._apply', side_effect=DatabaseError), \
+                self.assertLogs('helpers.write_behind', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.buffer.toggle(self.post, self.others[0]), (False, 0))
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(Path(self.directory.name).glob(f'{self.buffer.journal_path.name}.*[0-9]')), [])
+        restarted = self._restart()
+        self.assertFalse(self.post.likes.exists())
+        self.assertEqual(get_total_likes(self.post), 0)
+        self.assertIsNone(restarted.pending_state(self.post, self.others[0].username))
+
+
+    def _restart(self):
+        """Stops the buffer as if its process crashed and starts a new one."""
+        self.buffer._journal.close()
+        self.buffer._owner_lock.close()
+        self.buffer = None
+        restarted = LikeBuffer(self.path)
+        self.addCleanup(restarted.stop)
+        return restarted
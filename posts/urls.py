@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 
 
@@ -6,9 +7,12 @@ from . import views
 app_name = 'posts'
 
 urlpatterns = [
+    path('likes/state/', views.like_state, name='like-state'),
     path('<int:obj_id>/post/search', views.post_search, name='post-search'),
     path('<int:obj_id>/comments/search', views.comment_search, name='comment-search'),
     path('<int:obj_id>/comments/', views.comment_likes, name='comments'),
-    path('<int:post_id>/likes/', views.post_likes, name='likes'),
-    path('<int:post_id>/', views.post, name='post'),
+    path('<int:post_id>/comments/thread/', views.post_comments, name='post-comments'),
+    path('<int:post_id>/comments/<int:comment_id>/replies/', views.comment_replies, name='comment-replies'),
+    path('<int:post_id>/likes/', views.post_likes_async if settings.ASYNC_VIEWS else views.post_likes, name='likes'),
+    path('<int:post_id>/', views.post_async if settings.ASYNC_VIEWS else views.post, name='post'),
 ]
\ No newline at end of file
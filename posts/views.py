@@ -1,5 +1,7 @@
+import asyncio
 import json
 
+from asgiref.sync import sync_to_async
 from django.http import Http404, JsonResponse, HttpResponseBadRequest, HttpRequest, HttpResponse
 from django.urls import reverse
 from django.shortcuts import render, get_object_or_404
@@ -8,13 +10,20 @@ from django.contrib.auth.decorators import login_required
 from .models import PostModel, CommentModel
 from users.models import CustomUser
 
-from helpers.posts import like_dislike, create_new_comment, is_ajax, get_total_likes
+from helpers.aio import async_login_required, alist
+from helpers.cache import aget_version
+from helpers.posts import toggle_like, create_new_comment, is_ajax, parse_ids, get_like_states, annotate_post_stats, attach_liked_flags, parse_likers_cursor, get_likers_page, get_comments_version, comments_version_key
+from helpers.comments import get_thread_query, get_thread_page, paginate_thread, attach_reply_previews, attach_thread_likes, get_replies_page, serialize_comment
+from helpers.viewers import record_post_view, get_unique_viewers
 from helpers.users import search_user, POST_LIKES, COMMENT_LIKES
 
 
 @login_required
 def post(request: HttpRequest, post_id: int) -> JsonResponse | HttpResponse:
-    post = get_object_or_404(PostModel, id=post_id)
+    post = get_object_or_404(
+        annotate_post_stats(PostModel.objects.select_related('user'), request.user),
+        id=post_id,
+    )
     if not post.published:
         raise Http404('Post not found.')
     
@@ -22,18 +31,57 @@ def post(request: HttpRequest, post_id: int) -> JsonResponse | HttpResponse:
         data = json.loads(request.body)
         if 'text' not in data.keys():
             raise ValueError("Missing 'text' tag in post request.")
-        return JsonResponse(create_new_comment(request.user, post, data['text']))
+        parent = None
+        if data.get('parent'):
+            parent = get_object_or_404(CommentModel, id=data['parent'], post=post)
+        return JsonResponse(create_new_comment(request.user, post, data['text'], parent))
         
+    attach_liked_flags([post], request.user)
+    record_post_view(post, request.user.id)
     context = {
         'logged_user': get_object_or_404(CustomUser, username=request.user.username),
         'post': post,
-        'likes': get_total_likes(post),
-        'comments': CommentModel.objects.filter(post=post).order_by('post_date'),
+        'likes': post.likes_qty,
+        'viewers': get_unique_viewers(post),
+        # Read before the comments, a comment added in between makes the thread reload instead of going missing.
+        'comments_version': get_comments_version(post.id),
     }
+    context['comments'], context['comments_cursor'] = get_thread_page(post.id, request.user)
     template = 'posts/post_view.html' if is_ajax(request) else 'posts/main_view.html'
     return render(request, template, context=context)
 
 
+@login_required
+def post_comments(request: HttpRequest, post_id: int) -> JsonResponse | HttpResponseBadRequest:
+    if request.method != 'GET':
+        return HttpResponseBadRequest('Only GET requests are allowed.')
+    post = get_object_or_404(PostModel.objects.only('id', 'published'), id=post_id)
+    if not post.published:
+        raise Http404('Post not found.')
+    try:
+        comments, next_cursor = get_thread_page(post.id, request.user, request.GET.get('cursor'))
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+    return JsonResponse({
+        'comments': [serialize_comment(comment, request.user.username) for comment in comments],
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+def comment_replies(request: HttpRequest, post_id: int, comment_id: int) -> JsonResponse | HttpResponseBadRequest:
+    if request.method != 'GET':
+        return HttpResponseBadRequest('Only GET requests are allowed.')
+    comment = get_object_or_404(CommentModel.objects.select_related('post'), id=comment_id, post=post_id)
+    if not comment.post.published:
+        raise Http404('Post not found.')
+    replies, next_cursor = get_replies_page(comment, request.user, request.GET.get('cursor'))
+    return JsonResponse({
+        'replies': [serialize_comment(reply, request.user.username) for reply in replies],
+        'next_cursor': next_cursor,
+    })
+
+
 @login_required
 def post_likes(request: HttpRequest, post_id: int) -> JsonResponse | HttpResponse:
     post = get_object_or_404(PostModel, id=post_id)
@@ -41,16 +89,22 @@ def post_likes(request: HttpRequest, post_id: int) -> JsonResponse | HttpRespons
         raise Http404('Post not found.')
     
     if request.method == 'POST':
+        liked, qty = toggle_like(post, request.user)
         response = {
             'post_id': post.id,
-            'liked': like_dislike(post, request.user),
-            'qty': get_total_likes(post),
+            'liked': liked,
+            'qty': qty,
         }
         return JsonResponse(response)
 
+    try:
+        user_list, next_cursor = get_likers_page(post, request.user, parse_likers_cursor(request.GET.get('cursor')))
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
     context = {
         'profile_user': None,
-        'user_list': [(u, request.user.is_following(u.id)) for u in post.likes.all()],
+        'user_list': user_list,
+        'next_cursor': next_cursor,
         'logged_user': request.user,
         'page_title': 'Curtidas',
         'search_url': reverse('posts:post-search', kwargs={'obj_id': post_id}),
@@ -59,6 +113,62 @@ def post_likes(request: HttpRequest, post_id: int) -> JsonResponse | HttpRespons
     return render(request, 'users/users_card.html', context=context)
 
 
+@async_login_required
+async def post_async(request: HttpRequest, post_id: int) -> JsonResponse | HttpResponse:
+    if request.method == 'POST':
+        return await sync_to_async(post)(request, post_id)
+
+    post_query = annotate_post_stats(PostModel.objects.select_related('user'), request.user).filter(id=post_id)
+    comments_query = get_thread_query(post_id, request.user)
+    comments_version = await aget_version(comments_version_key(post_id))
+    # The comments only depend on the id, so they are read while the post is.
+    post_obj, comments = await asyncio.gather(post_query.afirst(), alist(comments_query))
+    if post_obj is None or not post_obj.published:
+        raise Http404('Post not found.')
+
+    await sync_to_async(record_post_view)(post_obj, request.user.id)
+    comments, comments_cursor = paginate_thread(comments)
+    await sync_to_async(attach_reply_previews)(comments, request.user)
+    await sync_to_async(attach_liked_flags)([post_obj], request.user)
+    await sync_to_async(attach_thread_likes)(comments, request.user)
+    context = {
+        'logged_user': request.user,
+        'post': post_obj,
+        'likes': post_obj.likes_qty,
+        'viewers': await sync_to_async(get_unique_viewers)(post_obj),
+        'comments_version': comments_version,
+        'comments': comments,
+        'comments_cursor': comments_cursor,
+    }
+    template = 'posts/post_view.html' if is_ajax(request) else 'posts/main_view.html'
+    return await sync_to_async(render)(request, template, context=context)
+
+
+@async_login_required
+async def post_likes_async(request: HttpRequest, post_id: int) -> JsonResponse | HttpResponse:
+    if request.method == 'POST':
+        return await sync_to_async(post_likes)(request, post_id)
+
+    try:
+        cursor = parse_likers_cursor(request.GET.get('cursor'))
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+    post_obj = await PostModel.objects.filter(id=post_id).afirst()
+    if post_obj is None or not post_obj.published:
+        raise Http404('Post not found.')
+
+    user_list, next_cursor = await sync_to_async(get_likers_page)(post_obj, request.user, cursor)
+    context = {
+        'profile_user': None,
+        'user_list': user_list,
+        'next_cursor': next_cursor,
+        'logged_user': request.user,
+        'page_title': 'Curtidas',
+        'search_url': reverse('posts:post-search', kwargs={'obj_id': post_id}),
+    }
+    return await sync_to_async(render)(request, 'users/users_card.html', context=context)
+
+
 @login_required
 def comment_likes(request: HttpRequest, obj_id: int) -> JsonResponse | HttpResponse:
     if request.method == 'POST':
@@ -67,18 +177,24 @@ def comment_likes(request: HttpRequest, obj_id: int) -> JsonResponse | HttpRespo
         if 'objID' not in data.keys():
             raise ValueError("Missing 'objID' tag in POST request.")
         comment = get_object_or_404(CommentModel, id=data['objID'])
+        liked, qty = toggle_like(comment, request.user)
         response = {
             'post_id': post.id,
             'comment_id': comment.id,
-            'liked': like_dislike(comment, request.user),
-            'qty': get_total_likes(comment),
+            'liked': liked,
+            'qty': qty,
         }
         return JsonResponse(response)
     
     comment = get_object_or_404(CommentModel, id=obj_id)
+    try:
+        user_list, next_cursor = get_likers_page(comment, request.user, parse_likers_cursor(request.GET.get('cursor')))
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
     context = {
         'profile_user': None,
-        'user_list': [(u, request.user.is_following(u.id)) for u in comment.likes.all()],
+        'user_list': user_list,
+        'next_cursor': next_cursor,
         'logged_user': request.user,
         'page_title': 'Curtidas',
         'search_url': reverse('posts:comment-search', kwargs={'obj_id': obj_id}),
@@ -86,6 +202,18 @@ def comment_likes(request: HttpRequest, obj_id: int) -> JsonResponse | HttpRespo
     return render(request, 'users/users_card.html', context=context)
 
 
+@login_required
+def like_state(request: HttpRequest) -> JsonResponse | HttpResponseBadRequest:
+    if request.method != 'GET':
+        return HttpResponseBadRequest('Only GET requests are allowed.')
+    try:
+        post_ids = parse_ids(request.GET.get('posts'))
+        comment_ids = parse_ids(request.GET.get('comments'))
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+    return JsonResponse(get_like_states(request.user, post_ids, comment_ids))
+
+
 @login_required
 def post_search(request: HttpRequest, obj_id: int) -> JsonResponse:
     if request.method == 'GET':
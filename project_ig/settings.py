@@ -136,3 +136,109 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
 
+# Routes home, post, post likes and profile to their async views (run under ASGI).
+ASYNC_VIEWS = False
+
+
+# Cache
+
+# How long concurrent misses wait for the build of the same entry before building it themselves.
+CACHE_BUILD_LOCK_TIMEOUT = 10
+CACHE_BUILD_POLL_INTERVAL = 0.05
+
+
+# Feed
+
+FEED_PAGE_SIZE = 25
+# The first page of each feed is cached. New posts of authors above FEED_FANOUT_FOLLOWER_LIMIT
+# only show up when it expires.
+FEED_CACHE_TIMEOUT = 60
+FEED_COMMENT_PREVIEW_SIZE = 2
+
+# Sends the home page with StreamingHttpResponse, rendering the posts in chunks.
+FEED_STREAMING = False
+FEED_STREAM_CHUNK_SIZE = 5
+
+# Viewer independent markup of feed posts, keyed by post id and version.
+POST_FRAGMENT_TIMEOUT = 60 * 60
+
+# Orders the first page of the home feed by score instead of date (requires numpy).
+FEED_RANKING = False
+FEED_RANKING_WINDOW = 500
+FEED_RANKING_HALF_LIFE_HOURS = 24
+FEED_RANKING_WEIGHTS = {
+    'likes': 1.0,
+    'comments': 0.5,
+    'affinity': 2.0,
+}
+
+# Posts of authors above this follower count are merged at read time instead of fanned out.
+FEED_FANOUT_FOLLOWER_LIMIT = 10000
+
+# Newest posts copied into a timeline when a follow is added or a timeline is rebuilt.
+TIMELINE_BACKFILL_SIZE = 1000
+TIMELINE_BATCH_SIZE = 1000
+
+
+# Likes
+
+# Buffers like toggles in a local journal and writes their net result every LIKES_FLUSH_INTERVAL_MS.
+# Each process only sees its own pending likes until they are flushed, and journals to LIKES_JOURNAL_PATH.<pid>.
+LIKES_WRITE_BEHIND = False
+LIKES_FLUSH_INTERVAL_MS = 200
+LIKES_JOURNAL_PATH = BASE_DIR / 'var' / 'likes.journal'
+
+# Posts and comments with at least LIKER_INDEX_MIN_LIKES likes answer "did this user like it"
+# from a cached sorted array of liker ids, with a Bloom filter in front from LIKER_BLOOM_MIN_SIZE ids.
+LIKER_INDEX_MIN_LIKES = 100
+LIKER_INDEX_TIMEOUT = 60 * 60
+LIKER_BLOOM_MIN_SIZE = 10000
+LIKER_BLOOM_BITS_PER_ID = 10
+LIKER_BLOOM_HASHES = 7
+
+# Most post or comment ids accepted by each list of the like state endpoint.
+LIKE_STATE_MAX_IDS = 200
+
+# Likers listed per page of the post and comment likes views.
+LIKERS_PAGE_SIZE = 50
+
+# Posts liked more than HOT_POST_WRITES_PER_MINUTE times in a minute count their likes in
+# LIKE_COUNTER_SHARDS rows instead of one, until fold_like_shards adds them back (run it periodically).
+HOT_POST_WRITES_PER_MINUTE = 600
+HOT_POST_TIMEOUT = 10 * 60
+LIKE_COUNTER_SHARDS = 16
+LIKE_TOTAL_CACHE_TIMEOUT = 2
+
+
+# Comments
+
+# Comments loaded per page of the thread of a post, the first page comes with the post.
+COMMENTS_PAGE_SIZE = 20
+
+# Replies shown under each top-level comment of a thread page, the rest load from the replies endpoint.
+COMMENT_REPLY_PREVIEWS = 2
+
+# Deepest reply level. The comment path holds 255 // CommentModel.PATH_STEP = 21 segments.
+COMMENT_MAX_DEPTH = 20
+
+
+# Post views
+
+# Unique viewers of each post are counted in a HyperLogLog sketch of 2 ** POST_VIEWERS_PRECISION
+# bytes, kept in the cache and merged into the database every POST_VIEWERS_MERGE_INTERVAL seconds
+# (merge_post_viewers merges the rest, run it periodically).
+POST_VIEWERS_PRECISION = 12
+POST_VIEWERS_MERGE_INTERVAL = 5 * 60
+POST_VIEWERS_TIMEOUT = 24 * 60 * 60
+# Each process keeps its own sketches under one of POST_VIEWERS_WORKER_SLOTS slots, leased for
+# POST_VIEWERS_WORKER_LEASE seconds. Needs at least as many slots as processes sharing the cache.
+POST_VIEWERS_WORKER_SLOTS = 64
+POST_VIEWERS_WORKER_LEASE = 10 * 60
+
+
+# Interaction log
+
+# Likes, follows and comments append an event to InteractionEventModel, in the transaction of
+# the change. replay_events rebuilds counters, likes or timelines from it.
+INTERACTION_LOG = True
+INTERACTION_LOG_BATCH_SIZE = 1000
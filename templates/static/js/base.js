@@ -110,17 +110,91 @@ function sendComment(postID, commentText) {
             console.log('Não achei comentários :(');
             return;
         }
-        var postDescription = document.querySelector('.post-main-view-info-comments .post-desc').cloneNode(true);
-        commentSection.innerHTML = '';
-        commentSection.appendChild(postDescription);
-        for (var k in data.comments) {
-            commentSection.appendChild(createCommentHTML(data.comments[k]));
+        var version = commentSection.querySelector('.comments-version');
+        if (version.value != data.previous_version) {
+            // Someone else commented since the thread was loaded.
+            return reloadComments(postID, commentSection);
         }
+        commentSection.appendChild(createCommentHTML(data.comment));
+        version.value = data.version;
         likeButton();
     })
 }
 
 
+function createRepliesNextHTML(commentsNext, comment) {
+    const repliesNext = document.createElement('div');
+    repliesNext.className = 'replies-next secondary-text pointer-on-hover';
+    const url = commentsNext.querySelector('.comments-url').value.replace(/thread\/$/, comment.id + '/replies/');
+    repliesNext.innerHTML = '<input type="hidden" class="replies-url"><input type="hidden" value="" class="replies-cursor">'
+        + '<p>Ver respostas (' + comment.reply_count + ')</p>';
+    repliesNext.querySelector('.replies-url').value = url;
+    return repliesNext;
+}
+
+
+function createLoadMoreRepliesButtons() {
+    const buttons = document.querySelectorAll('.replies-next');
+    for (var i = 0; i < buttons.length; i++) {
+        if (!buttons[i].hasEventListener) {
+            buttons[i].hasEventListener = true;
+            buttons[i].addEventListener('click', function() {
+                return loadMoreReplies(this);
+            })
+        }
+    }
+}
+
+
+function loadMoreReplies(repliesNext) {
+    const cursor = repliesNext.querySelector('.replies-cursor');
+    const query = new URLSearchParams(cursor.value ? {cursor: cursor.value} : {});
+    const url = repliesNext.querySelector('.replies-url').value + '?' + query.toString();
+    fetch(url)
+    .then((response) => {
+        return response.json();
+    })
+    .then((data) => {
+        const commentSection = repliesNext.parentNode;
+        for (var i = 0; i < data.replies.length; i++) {
+            // The first replies are already shown under the comment.
+            if (commentSection.querySelector('.obj-id[value="' + data.replies[i].id + '"]')) {
+                continue;
+            }
+            commentSection.insertBefore(createCommentHTML(data.replies[i]), repliesNext);
+        }
+        likeButton();
+        if (!data.next_cursor) {
+            repliesNext.remove();
+            return;
+        }
+        cursor.value = data.next_cursor;
+    })
+}
+
+
+function reloadComments(postID, commentSection) {
+    fetch('/post/' + postID + '/', {
+        method: 'GET',
+        headers: {
+            "X-Requested-With": "XMLHttpRequest",
+        },
+    })
+    .then((response) => {
+        return response.text();
+    })
+    .then((html) => {
+        const page = new DOMParser().parseFromString(html, 'text/html');
+        const comments = page.querySelector('.post-main-view-info-comments');
+        commentSection.replaceWith(document.importNode(comments, true));
+        likeButton();
+        createLikesViewButton();
+        createLoadMoreCommentsButton();
+        createLoadMoreRepliesButtons();
+    })
+}
+
+
 function removeFollower(element, username) {
     const csrftoken = getCookie('csrftoken');
     const url = window.location.href;
@@ -168,6 +242,7 @@ function likesView(obj) {
         postCloseButton();
         createFollowButtons();
         createSearchEvent();
+        createLoadMoreUsersButton();
     })
 }
 
@@ -189,6 +264,53 @@ function postViewRequest(url) {
         inputCommentButton();
         likeButton();
         createLikesViewButton();
+        createLoadMoreCommentsButton();
+        createLoadMoreRepliesButtons();
+    })
+}
+
+
+function createLoadMoreCommentsButton() {
+    const commentsNext = document.querySelector('.comments-next');
+    if (commentsNext && !commentsNext.hasEventListener) {
+        commentsNext.hasEventListener = true;
+        commentsNext.addEventListener('click', function() {
+            return loadMoreComments(this);
+        })
+    }
+}
+
+
+function loadMoreComments(commentsNext) {
+    const cursor = commentsNext.querySelector('.comments-cursor');
+    const query = new URLSearchParams({cursor: cursor.value});
+    const url = commentsNext.querySelector('.comments-url').value + '?' + query.toString();
+    fetch(url)
+    .then((response) => {
+        return response.json();
+    })
+    .then((data) => {
+        const commentSection = commentsNext.parentNode;
+        for (var i = 0; i < data.comments.length; i++) {
+            // Comments sent from this page are already shown after the button.
+            if (commentSection.querySelector('.obj-id[value="' + data.comments[i].id + '"]')) {
+                continue;
+            }
+            commentSection.insertBefore(createCommentHTML(data.comments[i]), commentsNext);
+            for (var j = 0; j < data.comments[i].replies.length; j++) {
+                commentSection.insertBefore(createCommentHTML(data.comments[i].replies[j]), commentsNext);
+            }
+            if (data.comments[i].reply_count > data.comments[i].replies.length) {
+                commentSection.insertBefore(createRepliesNextHTML(commentsNext, data.comments[i]), commentsNext);
+            }
+        }
+        likeButton();
+        createLoadMoreRepliesButtons();
+        if (!data.next_cursor) {
+            commentsNext.remove();
+            return;
+        }
+        cursor.value = data.next_cursor;
     })
 }
 
@@ -210,7 +332,48 @@ function relationshipViewRequest(url) {
         createFollowButtons();
         createRemoveFollowerButton();
         createSearchEvent();
+        createLoadMoreUsersButton();
+    })
+}
 
+
+function createLoadMoreUsersButton() {
+    const usersNext = document.querySelector('.users-next');
+    if (usersNext && !usersNext.hasEventListener) {
+        usersNext.hasEventListener = true;
+        usersNext.addEventListener('click', function() {
+            return loadMoreUsers(this);
+        })
+    }
+}
+
+
+function loadMoreUsers(usersNext) {
+    const url = usersNext.querySelector('.users-next-url').value;
+    fetch(url, {
+        method: 'GET',
+        headers: {
+            "X-Requested-With": "XMLHttpRequest",
+        },
+    })
+    .then((response) => {
+        return response.text();
+    })
+    .then((html) => {
+        const page = new DOMParser().parseFromString(html, 'text/html');
+        const userList = usersNext.parentNode.querySelector('.users-list');
+        page.querySelectorAll('.user-item').forEach((item) => {
+            userList.appendChild(document.importNode(item, true));
+        });
+        const next = page.querySelector('.users-next');
+        if (next) {
+            usersNext.replaceWith(document.importNode(next, true));
+        } else {
+            usersNext.remove();
+        }
+        createFollowButtons();
+        createRemoveFollowerButton();
+        createLoadMoreUsersButton();
     })
 }
 
@@ -390,6 +553,10 @@ function postCloseButton() {
 function postDescriptionButton() {
     const moreButtons = document.querySelectorAll('.more-button > p');
     for (var i = 0; i < moreButtons.length; i++) {
+        if (moreButtons[i].hasEventListener) {
+            continue;
+        }
+        moreButtons[i].hasEventListener = true;
         var descriptionText = moreButtons[i].parentNode.parentNode.querySelector('p');
         if (descriptionText.offsetHeight < descriptionText.scrollHeight) {
             moreButtons[i].addEventListener('click', function() {
@@ -412,6 +579,10 @@ function inputCommentButton() {
 
     
     for (var i = 0; i < commentButtonIcons.length; i++) {
+        if (commentButtonIcons[i].hasEventListener) {
+            continue;
+        }
+        commentButtonIcons[i].hasEventListener = true;
         commentButtonIcons[i].addEventListener('click', function (){
             const commentInput = this.parentNode.parentNode.parentNode.querySelector('.input-comment > textarea');
             commentInput.focus();
@@ -419,6 +590,10 @@ function inputCommentButton() {
     }
 
     for (var i = 0; i < commentInputs.length; i++) {
+        if (commentInputs[i].hasInputListener) {
+            continue;
+        }
+        commentInputs[i].hasInputListener = true;
         commentInputs[i].addEventListener('input', function() {
             this.style.height = '';
             this.style.height = this.scrollHeight + 'px';
@@ -487,11 +662,109 @@ function likeButton() {
 function showCommentsButtons() {
     const buttons = document.querySelectorAll('.show-comments');
     for (var i = 0; i < buttons.length; i++) {
-        buttons[i].addEventListener('click', function () {
-            const url = this.querySelector('.post-url').value;
-            return postViewRequest(url);
-        })
+        if (!buttons[i].hasEventListener) {
+            buttons[i].hasEventListener = true;
+            buttons[i].addEventListener('click', function () {
+                const url = this.querySelector('.post-url').value;
+                return postViewRequest(url);
+            })
+        }
+    }
+}
+
+
+function loadMorePosts(feedNext) {
+    const cursor = feedNext.querySelector('.feed-cursor');
+    const query = new URLSearchParams({
+        cursor: cursor.value,
+        fields: 'id,url,author,img,description,likes,comments,liked',
+    });
+    const url = feedNext.querySelector('.feed-url').value + '?' + query.toString();
+    feedNext.loading = true;
+    fetch(url)
+    .then((response) => {
+        return response.json();
+    })
+    .then((data) => {
+        for (var i = 0; i < data.posts.length; i++) {
+            feedNext.parentNode.insertBefore(createPostHTML(data.posts[i]), feedNext);
+        }
+        postDescriptionButton();
+        inputCommentButton();
+        likeButton();
+        showCommentsButtons();
+        createLikesViewButton();
+
+        feedNext.loading = false;
+        if (!data.next_cursor) {
+            feedNext.remove();
+            return;
+        }
+        cursor.value = data.next_cursor;
+        feedNext.querySelector('a').href = '?cursor=' + data.next_cursor;
+        // The observer only fires on changes, so keep loading while the end is still in sight.
+        if (feedNext.getBoundingClientRect().top < window.innerHeight) {
+            loadMorePosts(feedNext);
+        }
+    })
+}
+
+
+function createInfiniteScroll() {
+    const feedNext = document.querySelector('.feed-next');
+    if (!feedNext || !('IntersectionObserver' in window)) {
+        return;
     }
+    feedNext.querySelector('a').classList.add('hide-icon');
+    const observer = new IntersectionObserver((entries) => {
+        if (entries[0].isIntersecting && !feedNext.loading) {
+            loadMorePosts(feedNext);
+        }
+    }, {rootMargin: '0px 0px 600px 0px'});
+    observer.observe(feedNext);
+}
+
+
+function createPostHTML(data) {
+    var template = document.getElementById('post-template');
+    var post = template.content.cloneNode(true);
+
+    post.querySelector('a').href = data.author.profile_url;
+    var userPic = post.querySelector('.post-header img');
+    userPic.src = data.author.user_pic;
+    post.querySelector('.post-header p').textContent = data.author.username;
+    post.querySelector('.post-img img').src = data.img;
+
+    post.querySelector('.like-status').value = data.liked ? 'liked' : 'not-liked';
+    post.querySelector('.obj-id').value = data.id;
+    if (data.liked) {
+        post.querySelector('.post-like-button > svg').classList.add('hide-icon');
+    }
+    else {
+        post.querySelector('.post-like-button > span').classList.add('hide-icon');
+    }
+    post.querySelector('.likes-qty').textContent = data.likes;
+
+    const description = post.querySelector('.post-description');
+    const moreButton = description.querySelector('.more-button');
+    const paragraphs = (data.description || '').split(/\n\s*\n/);
+    for (var i = 0; i < paragraphs.length; i++) {
+        var paragraph = document.createElement('p');
+        paragraph.textContent = paragraphs[i];
+        description.insertBefore(paragraph, moreButton);
+    }
+
+    post.querySelector('.post-url').value = data.url;
+    var commentsText = 'Sem comentários';
+    if (data.comments > 1) {
+        commentsText = 'Ver todos os ' + data.comments + ' comentários';
+    }
+    else if (data.comments == 1) {
+        commentsText = 'Ver comentário';
+    }
+    post.querySelector('.comments-qty').textContent = commentsText;
+
+    return post;
 }
 
 
@@ -499,6 +772,9 @@ function createCommentHTML(data) {
     const dateOptions = {day: 'numeric', month: 'long'};
     var template = document.getElementById('comment-template');
     var comment = template.content.cloneNode(true);
+    if (data.depth) {
+        comment.querySelector('.comment').classList.add('comment-reply');
+    }
 
     var img = comment.querySelector('img');
     img.src = data.user_pic;
@@ -598,6 +874,9 @@ document.addEventListener('DOMContentLoaded', function() {
     createLikesViewButton();
     createNavbarSearchButton();
     createSearchEvent();
+    createInfiniteScroll();
+    createLoadMoreCommentsButton();
+    createLoadMoreRepliesButtons();
     
     document.layer = 0;
     
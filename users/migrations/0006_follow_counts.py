@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:35
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, field):
+    counts = (queryset
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(qty=Count('*'))
+        .values('qty'))
+    return Coalesce(Subquery(counts), 0)
+
+
+def backfill_counts(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    follows = CustomUser._meta.get_field('following').remote_field.through.objects
+    CustomUser.objects.update(
+        followers_count=_count(follows, 'to_customuser'),
+        following_count=_count(follows, 'from_customuser'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_customuser_profile_picture'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -3,13 +3,37 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 
 
-class CustomUser(AbstractUser):
+class CounterFieldsMixin:
+    """
+    COUNTER_FIELDS are only changed with F() updates. save() of a row that already exists
+    leaves them out unless update_fields names them, so it does not write back a stale
+    count over the increments made since the row was read.
+    """
+    COUNTER_FIELDS: tuple[str, ...] = ()
+
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None and not self._state.adding and not args \
+                and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class CustomUser(CounterFieldsMixin, AbstractUser):
 
 
     email = models.EmailField(unique=True, name='email')
     bio = models.TextField(max_length=600, default='', blank=True, name='bio')
     following = models.ManyToManyField(to='self', blank=True, symmetrical=False, default=None, related_name='followers')
     profile_picture = models.ImageField(upload_to='images/profiles/%Y/%d', default='images/profiles/default/default-user-icon.jpg')
+    # Kept by users.signals, reconcile_counters fixes any drift.
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    COUNTER_FIELDS = ('followers_count', 'following_count')
 
 
     def __str__(self):
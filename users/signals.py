@@ -0,0 +1,53 @@
+from collections import Counter
+
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+
+from users.models import CustomUser
+
+from helpers.counters import apply_count_deltas
+from helpers.events import Kind, log_events
+
+
+# Runs inside the transaction of the M2M write, so the counters commit with it.
+@receiver(m2m_changed, sender=CustomUser.following.through)
+def count_follows(sender, instance: CustomUser, action: str, reverse: bool, pk_set: set, **kwargs):
+    # reverse=True means the change came from the 'followers' side of the relation.
+    if action == 'post_add':
+        if reverse:
+            pairs = [(follower_id, instance.id) for follower_id in pk_set]
+        else:
+            pairs = [(instance.id, followed_id) for followed_id in pk_set]
+        kind, sign = Kind.FOLLOW, 1
+    elif action in ('pre_remove', 'pre_clear'):
+        rows = sender.objects.filter(**{'to_customuser' if reverse else 'from_customuser': instance.id})
+        if pk_set is not None:
+            rows = rows.filter(**{'from_customuser__in' if reverse else 'to_customuser__in': pk_set})
+        pairs = list(rows.values_list('from_customuser', 'to_customuser'))
+        kind, sign = Kind.UNFOLLOW, -1
+    else:
+        return
+
+    following, followers = Counter(), Counter()
+    for follower_id, followed_id in pairs:
+        following[follower_id] += sign
+        followers[followed_id] += sign
+    apply_count_deltas(CustomUser, 'following_count', following)
+    apply_count_deltas(CustomUser, 'followers_count', followers)
+    log_events(kind, pairs)
+
+
+@receiver(pre_delete, sender=CustomUser)
+def discount_user_follows(sender, instance: CustomUser, **kwargs):
+    # The follow rows of a deleted user go away without m2m_changed.
+    pairs = list(CustomUser.following.through.objects
+        .filter(Q(from_customuser=instance.id) | Q(to_customuser=instance.id))
+        .values_list('from_customuser', 'to_customuser'))
+    following, followers = Counter(), Counter()
+    for follower_id, followed_id in pairs:
+        following[follower_id] -= 1
+        followers[followed_id] -= 1
+    apply_count_deltas(CustomUser, 'following_count', following)
+    apply_count_deltas(CustomUser, 'followers_count', followers)
+    log_events(Kind.UNFOLLOW, pairs)
@@ -1,3 +1,6 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 from users.models import CustomUser
 
@@ -66,4 +69,58 @@ class TestUserModel(TestCase):
         false must be returned.
         """
         following = self.user.is_following(20)
-        self.assertFalse(following)
\ No newline at end of file
+        self.assertFalse(following)
+
+class TestFollowCounters(TestCase):
+
+    def setUp(self):
+        self.users = [CustomUser.objects.create(username=f'user{i}', email=f'user{i}@test.com') for i in range(4)]
+
+
+    def counts(self):
+        return [
+            (user.followers_count, user.following_count)
+            for user in CustomUser.objects.filter(id__in=[u.id for u in self.users]).order_by('id')
+        ]
+
+
+    def test_counters_follow_both_sides_of_the_relation(self):
+        """Test if the follow counters follow adds, removes and clears from both sides"""
+        first, second, third, fourth = self.users
+        first.following.add(second, third)
+        fourth.followers.add(first, second)
+        self.assertEqual(self.counts(), [(0, 3), (1, 1), (1, 0), (2, 0)])
+        first.following.remove(third, first)
+        fourth.followers.remove(second)
+        self.assertEqual(self.counts(), [(0, 2), (1, 0), (0, 0), (1, 0)])
+        fourth.followers.clear()
+        first.following.clear()
+        self.assertEqual(self.counts(), [(0, 0)] * 4)
+
+
+    def test_deleted_user_follows_are_discounted(self):
+        """Test if the follows of a deleted user are taken out of the counters"""
+        first, second, third, _ = self.users
+        first.following.add(second)
+        third.following.add(first)
+        first.delete()
+        self.users.remove(first)
+        self.assertEqual(self.counts(), [(0, 0)] * 3)
+
+
+    def test_save_keeps_counts_changed_since_read(self):
+        """Test if saving a user read before a follow does not write back the old counters"""
+        first, second, _, _ = self.users
+        first.following.add(second)
+        second.bio = 'Edited'
+        second.save()
+        self.assertEqual(self.counts()[:2], [(0, 1), (1, 0)])
+        self.assertEqual('Edited', CustomUser.objects.get(id=second.id).bio)
+
+
+    def test_reconcile_counters_fixes_follow_counts(self):
+        """Test if reconcile_counters recounts drifted follow counters"""
+        self.users[0].following.add(self.users[1])
+        CustomUser.objects.update(followers_count=7, following_count=7)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.counts(), [(0, 1), (1, 0), (0, 0), (0, 0)])
@@ -1,12 +1,14 @@
 import json
 
-from django.test import TestCase
+from django.http import Http404
+from django.test import AsyncRequestFactory, TestCase
 from django.urls import reverse
 
 from users.models import CustomUser
 from posts.models import PostModel, CommentModel
 
-from factories.factories import create_test_user
+from factories.factories import create_test_user, create_test_post
+from users.views import profile_async
 
 
 class UserViewsBase(TestCase):
@@ -336,6 +338,41 @@ class ProfileViewTests(UserViewsBase):
             self.assertEqual(qty_users, comments)
 
 
+class AsyncProfileViewTests(UserViewsBase):
+
+    def setUp(self):
+        super().setUp()
+        self.factory = AsyncRequestFactory()
+        self.page_user = create_test_user(username='page_user', email='page_user@testemail.com')
+        self.post = create_test_post(user=self.page_user)
+        self.post.likes.add(self.user)
+        self.user.following.add(self.page_user)
+
+
+    async def test_async_profile_view_shows_posts_and_counts(self):
+        """
+        Test if the async profile view renders the posts with their likes and the follow counts.
+        """
+        request = self.factory.get(reverse('users:profile', kwargs={'username': self.page_user.username}))
+        request.user = self.user
+        response = await profile_async(request, self.page_user.username)
+        self.assertEqual(response.status_code, 200)
+        page = response.content.decode()
+        self.assertIn(reverse('posts:post', kwargs={'post_id': self.post.id}), page)
+        self.assertIn('1 seguidores', page)
+        self.assertIn('0 seguindo', page)
+
+
+    async def test_async_profile_view_raise_404_inexistent_user(self):
+        """
+        Test if the async profile view raises a 404 for an invalid username.
+        """
+        request = self.factory.get(reverse('users:profile', kwargs={'username': 'ABCD100'}))
+        request.user = self.user
+        with self.assertRaises(Http404):
+            await profile_async(request, 'ABCD100')
+
+
 class FollowingViewTests(UserViewsBase):
 
     def test_following_view_blocked_for_unauthenticated_user(self):
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 
 from . import views
@@ -14,5 +15,5 @@ urlpatterns = [
     path('<str:username>/followers/search/', views.followers_search, name='followers_search'),
     path('<str:username>/following/', views.following, name='following'),
     path('<str:username>/followers/', views.followers, name='followers'),
-    path('<str:username>/', views.profile, name='profile'),
+    path('<str:username>/', views.profile_async if settings.ASYNC_VIEWS else views.profile, name='profile'),
 ]
\ No newline at end of file
@@ -1,17 +1,21 @@
+import asyncio
 import json
 
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseBadRequest, JsonResponse, HttpRequest, HttpResponse, HttpResponseRedirect
+from django.db.models import F
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, HttpRequest, HttpResponse, HttpResponseRedirect
 
 from .forms import CustomUserCreationForm, LoginForm
 from .models import CustomUser
-from posts.models import PostModel, CommentModel
 
-from helpers.users import follow_or_unfollow_user, remove_follower, get_total_following, get_total_followers, search_user, FOLLOWERS, FOLLOWING
+from helpers.aio import async_login_required, alist
+from helpers.counters import sharded_likes
+from helpers.users import follow_or_unfollow_user, remove_follower, search_user, FOLLOWERS, FOLLOWING
 
 
 def sign_up(request: HttpRequest) -> HttpResponse | HttpResponseRedirect:
@@ -72,13 +76,12 @@ def profile(request: HttpRequest, username: str) -> HttpResponse | JsonResponse:
             ValueError(f"Invalid 'action' key, expected 'remove-follower' or 'follow-unfollow', but {data['action']} was passed.")
     
 
-    posts = page_user.posts.all().values()
+    posts = page_user.posts.annotate(likes_qty=F('like_count') + sharded_likes()).values()
     for post_dict in posts:
-        post_obj = PostModel.objects.get(id=post_dict['id'])
         post_dict.update(
             {
-                'likes': post_obj.likes.all().count(),
-                'comments': CommentModel.objects.filter(post=post_obj).count(),
+                'likes': post_dict['likes_qty'],
+                'comments': post_dict['comment_count'],
             })
     return render(request, 'users/profile.html',
                    {
@@ -86,11 +89,38 @@ def profile(request: HttpRequest, username: str) -> HttpResponse | JsonResponse:
                         'posts': posts,
                         'logged_user': logged_user,
                         'is_following': logged_user.is_following(page_user.id),
-                        'following_qty': get_total_following(page_user),
-                        'followers_qty': get_total_followers(page_user),
+                        'following_qty': page_user.following_count,
+                        'followers_qty': page_user.followers_count,
                     })
     
 
+@async_login_required
+async def profile_async(request: HttpRequest, username: str) -> HttpResponse | JsonResponse:
+    if request.method == 'POST':
+        return await sync_to_async(profile)(request, username)
+
+    page_user = await CustomUser.objects.filter(username=username).afirst()
+    if page_user is None:
+        raise Http404('User not found.')
+    logged_user = request.user
+    posts, is_following = await asyncio.gather(
+        alist(page_user.posts.annotate(likes_qty=F('like_count') + sharded_likes()).values()),
+        logged_user.following.filter(id=page_user.id).aexists(),
+    )
+    for post_dict in posts:
+        post_dict['likes'] = post_dict['likes_qty']
+        post_dict['comments'] = post_dict['comment_count']
+    return await sync_to_async(render)(request, 'users/profile.html',
+                   {
+                        'profile_user': page_user,
+                        'posts': posts,
+                        'logged_user': logged_user,
+                        'is_following': is_following,
+                        'following_qty': page_user.following_count,
+                        'followers_qty': page_user.followers_count,
+                    })
+
+
 @login_required
 def following(request: HttpRequest, username: str) -> HttpResponse:
     if request.method == 'GET': 